@@ -1,16 +1,72 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple, Iterator, AsyncIterator, Literal, Union
 from pydantic import BaseModel
 from langgraph.graph import StateGraph, START, END
+from langgraph.config import get_stream_writer
+from langgraph.types import Command, interrupt
 
 import argparse
+import asyncio
+import contextvars
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 # Import BAML-generated client and types
-from baml_client.sync_client import b  # BAML synchronous client
-from baml_client.types import Clarification, Plan, Critique, ResultItem, RankedResultItem, Answer, ContextItem
+from baml_client.sync_client import b as baml_sync_client  # BAML synchronous client
+from baml_client.async_client import b as baml_async_client  # BAML asynchronous client (used by the async graph)
+from baml_client.types import Clarification, Plan, Critique, ResultItem, RankedResultItem, Answer, ContextItem, Source
 from baml_client.tracing import trace, set_tags, flush, on_log_event
 
 # Import tools
-from tools import web_search, get_current_price
+from tools import web_search, get_current_prices, aweb_search, aget_current_prices, ToolResult, price_results
+from cache import MemoryCache, CachedBamlClient
+from prefilter import prefilter_results
+from fetch import enrich_results
+from evidence import evidence_from_ranked, novel_results, merge_evidence, evidence_results, answer_context
+from metrics import InstrumentedBamlClient, instrument_node, registry as metrics_registry, format_summary
+from router import LLMRouter, RoutedBamlClient
+
+# Cross-question cache for BAML function results, shared by the sync and async clients.
+# Per-function TTLs live in cache.DEFAULT_LLM_CACHE_TTLS; use b.enable()/b.disable() to change them,
+# or replace llm_cache with a cache.SQLiteCache to keep responses across restarts.
+llm_cache = MemoryCache(max_entries=1024)
+# Routes BAML calls across the clients in baml_src/clients.baml by observed latency, errors and cost.
+# Disabled by default (each function uses its static client); set llm_router.enabled = True or pass --route-llm.
+llm_router = LLMRouter()
+# Cache hits never reach the router or the instrumented client, so only real LLM calls are routed and counted.
+b = CachedBamlClient(RoutedBamlClient(InstrumentedBamlClient(baml_sync_client), llm_router), llm_cache)
+async_b = CachedBamlClient(RoutedBamlClient(InstrumentedBamlClient(baml_async_client), llm_router), llm_cache)
+async_b.function_ttls = b.function_ttls  # b.enable()/b.disable() apply to both clients
+
+# Concurrency settings for executing the plan steps in gather_info_node
+GATHER_MAX_CONCURRENCY = 5  # maximum number of plan steps running at the same time
+GATHER_STEP_TIMEOUT = 20.0  # seconds a single plan step may run before its results are dropped
+
+# Default SQLite file for graph checkpoints (used by the CLI when a thread id is given)
+CHECKPOINT_DB_PATH = ".hekmatica_checkpoints.sqlite"
+
+class CritiquePolicy(BaseModel):
+    """Controls when the answer/critique loop runs, so latency-sensitive traffic can trade thoroughness for speed.
+
+    mode:
+      - "always": critique every answer (the default, most thorough)
+      - "confidence": skip the critique when the answer's confidence_score is at least confidence_threshold
+      - "never": return the first answer without critique
+    critique_final_attempt: when False, skip the critique on the last allowed attempt, since its result
+      can no longer trigger another search and only feeds the template note in the output.
+    """
+    mode: Literal["always", "confidence", "never"] = "always"
+    confidence_threshold: float = 0.85
+    critique_final_attempt: bool = True
+
+    def should_critique(self, answer: Optional[Answer], attempt_count: int, max_attempt_count: int) -> bool:
+        if answer is None or self.mode == "never":
+            return False
+        if not self.critique_final_attempt and attempt_count >= max_attempt_count:
+            return False
+        if self.mode == "confidence" and answer.confidence_score >= self.confidence_threshold:
+            return False
+        return True
 
 # Define the shared state for the agent's workflow
 class AgentState(BaseModel):
@@ -19,12 +75,263 @@ class AgentState(BaseModel):
     clarification_answer: Optional[str] = None
     subqueries: List[str] = []
     plan: Optional[Plan] = None
-    raw_results: List[Dict[str, Optional[str]]] = []
+    raw_results: List[Dict[str, Optional[str]]] = []  # free-text search results, ranked by filter_results
+    structured_results: List[ToolResult] = []  # typed tool results (price quotes), pinned into the answer context unranked
+    step_timings: List[Dict[str, Any]] = []  # per-step tool, query, status and latency from gather_info_node
+    prefilter_stats: Dict[str, Any] = {}  # dedup/BM25 prefilter metrics from filter_results_node
     relevant_results: List[Dict[str, Optional[str]]] = []
+    evidence: List[Dict[str, Any]] = []  # scored, bounded store behind relevant_results (see evidence.py)
     answer: Optional[Answer] = None
     critique: Optional[Critique] = None
     template_feedback: Optional[Dict[str, Any]] = None  # Store template-specific feedback
     attempt_count: int = 1  # number of answer attempts made (for loop control)
+    max_attempt_count: int = 2  # answer attempts allowed before the loop ends (set from DeepResearchAgent)
+    critique_policy: CritiquePolicy = CritiquePolicy()
+    interactive: bool = True  # when False, never block on input(); proceed without a clarification answer
+    defer_clarification: bool = False  # pause the run at ask_user (needs a checkpointer) instead of calling input()
+    fetch_full_pages: bool = False  # download the top-ranked pages and add relevant passages before answering
+    structured_fast_path: bool = True  # answer directly from structured results when the plan only uses structured tools
+    stream_answer: bool = False  # stream partial answers to the caller (set by DeepResearchAgent.stream)
+
+# Helpers shared by the synchronous and asynchronous node implementations
+
+def _normalize_subqueries(subqs) -> List[str]:
+    # Ensure we have a list of strings (BAML returns a Python list for string[] output)
+    return list(subqs) if isinstance(subqs, list) else subqs.queries  # .queries if wrapped in a model
+
+def _plan_steps(state: AgentState) -> List[Tuple[str, str]]:
+    """Return the plan as a list of (tool, query) tuples."""
+    steps = []
+    if state.plan:
+        for step in state.plan.steps:
+            tool = step.tool.value if hasattr(step.tool, "value") else str(step.tool)  # handle enum or string
+            steps.append((tool, step.query))
+    return steps
+
+# What a plan step produces: search snippets as {'content', 'link'} dicts, structured tools as ToolResults
+StepOutput = Union[Dict[str, Optional[str]], ToolResult]
+
+def _plan_jobs(steps: List[Tuple[str, str]]) -> List[List[int]]:
+    """Group plan step indices into units of work for gather_info_node.
+
+    Every WebSearch step is its own job, while all PriceLookup steps are collapsed into a single
+    job so they can be answered by one batched price request.
+    """
+    jobs = [[i] for i, (tool, _) in enumerate(steps) if tool == "WebSearch"]
+    price_indices = [i for i, (tool, _) in enumerate(steps) if tool == "PriceLookup"]
+    if price_indices:
+        jobs.append(price_indices)
+    return jobs
+
+def _finish_gather(state: AgentState, step_results: List[List[StepOutput]], timings: List[Dict[str, Any]]):
+    """Flatten per-step results in plan order, log step latencies and update the state.
+
+    Search snippets (dicts) go to raw_results for ranking; ToolResults go to structured_results.
+    """
+    results = [res for per_step in step_results for res in per_step]
+    for t in timings:
+        latency = f"{t['latency_ms']:.0f}ms" if t["latency_ms"] is not None else "n/a"
+        print(f"Step {t['tool']}({t['query']!r}): {t['status']} in {latency}")
+
+    state.raw_results = [res for res in results if not isinstance(res, ToolResult)]
+    state.structured_results = [res for res in results if isinstance(res, ToolResult)]
+    state.step_timings = timings
+    return {"raw_results": state.raw_results, "structured_results": state.structured_results, "step_timings": state.step_timings}
+
+def _answerable_from_structured(state: AgentState) -> bool:
+    """True when every plan step used a structured tool and each of them returned data."""
+    steps = _plan_steps(state)
+    return (
+        bool(steps)
+        and all(tool == "PriceLookup" for tool, _ in steps)
+        and len(state.structured_results) == len(steps)
+        and all(res.payload.get("price") for res in state.structured_results)
+    )
+
+def _structured_answer(state: AgentState) -> Answer:
+    """Build the answer straight from structured results, without an LLM call."""
+    quotes = [f"{res.payload['coin']} {res.payload['price']} [{i}]" for i, res in enumerate(state.structured_results)]
+    retrieved = time.strftime("%Y-%m-%d %H:%M UTC", time.gmtime(min(res.timestamp for res in state.structured_results)))
+    summary = f"Current price{'s' if len(quotes) > 1 else ''} in USD: {'; '.join(quotes)}."
+    return Answer(
+        executive_summary=summary,
+        detailed_explanation=(
+            f"Spot prices in USD from CoinGecko, retrieved at {retrieved}. "
+            "Crypto prices change continuously, so treat these figures as a snapshot."
+        ),
+        key_points=[f"{res.payload['coin']}: {res.payload['price']} (USD)" for res in state.structured_results],
+        cited_answer=summary,
+        references=[Source(index=i, source=res.source, source_type="api")
+                    for i, res in enumerate(state.structured_results) if res.source],
+        confidence_score=1.0,
+    )
+
+def _pinned_context(state: AgentState) -> List[Dict[str, Optional[str]]]:
+    # Structured results are authoritative, so they skip ranking and lead the answer context
+    return [{'content': res.render(), 'link': res.source} for res in state.structured_results]
+
+def _prefilter_for_ranking(state: AgentState) -> List[ResultItem]:
+    """Deduplicate and lexically prefilter raw results, returning the BAML ResultItems to rank."""
+    kept, state.prefilter_stats = prefilter_results(state.raw_results or [], state.question, state.subqueries)
+    print(
+        f"Prefilter kept {len(kept)}/{len(state.raw_results or [])} results "
+        f"(~{state.prefilter_stats['estimated_tokens_saved']} ranking tokens saved)"
+    )
+    # Convert Python dicts to BAML ResultItem instances
+    return [ResultItem(content=d.get('content'), link=d.get('link')) for d in kept]
+
+def _set_evidence(state: AgentState, evidence: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # relevant_results is always the plain {'content', 'link'} view of the scored evidence
+    state.evidence = evidence
+    state.relevant_results = evidence_results(evidence)
+    return {"evidence": state.evidence, "relevant_results": state.relevant_results}
+
+def _ranked_to_evidence(state: AgentState, ranked_results_items: List[RankedResultItem]) -> Dict[str, Any]:
+    # Keep the relevance scores so later searches can be merged into the ranked set
+    update = _set_evidence(state, evidence_from_ranked(ranked_results_items, state.attempt_count))
+    print(f"LLM Filtered Results (Top {len(state.relevant_results)}): {state.relevant_results}") # Add some logging
+    update["prefilter_stats"] = state.prefilter_stats
+    return update
+
+def _enriched_evidence(state: AgentState, enriched: List[Dict[str, Optional[str]]]) -> Dict[str, Any]:
+    # enrich_results keeps the order of its input, so page excerpts map back onto the evidence items
+    return _set_evidence(state, [{**item, 'content': res.get('content')} for item, res in zip(state.evidence, enriched)])
+
+def _build_context_items(relevant_context_dicts: List[Dict[str, Optional[str]]]) -> List[ContextItem]:
+    """Create a list of ContextItem objects from the relevant results."""
+    context_items: List[ContextItem] = []
+    for res_dict in relevant_context_dicts:
+        context_items.append(
+            ContextItem(
+                content=res_dict.get('content', ''),
+                source=res_dict.get('link') # Pass None if 'link' is missing
+            )
+        )
+    return context_items
+
+def _log_answer(answer: Answer):
+    # Add some debug logging for the template structure
+    if hasattr(answer, 'executive_summary'):
+        print(f"Executive Summary: {answer.executive_summary[:100]}...")
+    if hasattr(answer, 'key_points') and answer.key_points:
+        print(f"Generated {len(answer.key_points)} key points")
+    if hasattr(answer, 'confidence_score'):
+        print(f"Answer confidence score: {answer.confidence_score:.2f}")
+
+# Answer fields forwarded to the caller while AnswerQuestion is still generating
+STREAMED_ANSWER_FIELDS = ("executive_summary", "detailed_explanation", "key_points")
+
+def _partial_answer_event(partial, attempt: int, last_event: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Build a partial_answer event from a BAML partial Answer, or None if nothing changed since last_event."""
+    event = {"type": "partial_answer", "attempt": attempt}
+    for field in STREAMED_ANSWER_FIELDS:
+        value = getattr(partial, field, None)
+        event[field] = list(value) if isinstance(value, list) else value
+    if last_event is not None and all(event[f] == last_event[f] for f in STREAMED_ANSWER_FIELDS):
+        return None
+    return event
+
+def _stream_answer(state: AgentState, context_items: List[ContextItem]) -> Answer:
+    """Stream AnswerQuestion, forwarding each partial answer to the graph's custom stream.
+
+    Streaming goes straight to the BAML client, so these calls are not served from llm_cache.
+    """
+    writer = get_stream_writer()
+    stream = b.stream.AnswerQuestion(question=state.question, context=context_items)
+    last_event = None
+    for partial in stream:
+        event = _partial_answer_event(partial, state.attempt_count, last_event)
+        if event:
+            writer(event)
+            last_event = event
+    return stream.get_final_response()
+
+async def _astream_answer(state: AgentState, context_items: List[ContextItem]) -> Answer:
+    """Async version of _stream_answer."""
+    writer = get_stream_writer()
+    stream = async_b.stream.AnswerQuestion(question=state.question, context=context_items)
+    last_event = None
+    async for partial in stream:
+        event = _partial_answer_event(partial, state.attempt_count, last_event)
+        if event:
+            writer(event)
+            last_event = event
+    return await stream.get_final_response()
+
+def _format_answer_for_critique(answer: Optional[Answer]) -> str:
+    """Format the answer to explicitly show template structure."""
+    formatted_answer = ""
+    if answer:
+        # Create a clearly formatted version that shows section headings
+        formatted_answer = (
+            f"## Executive Summary\n{answer.executive_summary}\n\n"
+            f"## Detailed Explanation\n{answer.detailed_explanation}\n\n"
+            f"## Key Points\n"
+        )
+        # Add key points as bullet points
+        if hasattr(answer, 'key_points') and answer.key_points:
+            for point in answer.key_points:
+                formatted_answer += f"- {point}\n"
+
+        formatted_answer += f"\n## Complete Answer\n{answer.cited_answer}"
+    return formatted_answer
+
+def _apply_critique(state: AgentState, critique: Critique):
+    state.critique = critique
+
+    # Store template-specific feedback
+    if state.critique:
+        state.template_feedback = {
+            "followed": state.critique.template_followed,
+            "section_feedback": state.critique.section_feedback,
+            "suggestions": state.critique.improvement_suggestions
+        }
+
+    return {
+        "critique": state.critique,
+        "template_feedback": state.template_feedback
+    }
+
+def _missing_info_query(state: AgentState) -> str:
+    """Work out the follow-up search query from the critique and template feedback."""
+    missing = state.critique.missing_info if state.critique else ""
+    missing = missing.strip()
+
+    # Check if we have template feedback
+    template_issues = False
+    if state.template_feedback:
+        template_followed = state.template_feedback.get("followed", True)
+        template_issues = not template_followed
+
+        # If there are template issues but no specific missing info query,
+        # we should still search to improve the answer content
+        if template_issues and not missing:
+            print("Template structure issues detected but no missing info specified.")
+            # Use the original question as fallback if missing info isn't specific
+            missing = state.question
+
+        # Check for specific citation or source issues in the feedback
+        elif "citation" in missing.lower() or "reference" in missing.lower():
+            print(f"Citation issues detected: {missing}")
+            # For citation issues, we might want to search for authoritative sources
+            missing = f"authoritative sources {state.question}"
+    return missing
+
+def _new_result_items(state: AgentState, new_info_results: List[Dict[str, Optional[str]]]) -> List[ResultItem]:
+    """Drop follow-up results that are already in the evidence; only the remainder gets ranked."""
+    fresh, known = novel_results(state.evidence, new_info_results)
+    print(f"Additional search: {len(fresh)} new results, {known} already known")
+    return [ResultItem(content=d.get('content'), link=d.get('link')) for d in fresh]
+
+def _merge_additional_results(state: AgentState, ranked_new_items: List[RankedResultItem]):
+    # Merge the newly ranked results into the evidence, keeping only the best EVIDENCE_TOP_K overall
+    state.attempt_count += 1
+    new_items = evidence_from_ranked(ranked_new_items, state.attempt_count)
+    update = _set_evidence(state, merge_evidence(state.evidence, new_items))
+    kept = sum(1 for item in state.evidence if item['attempt'] == state.attempt_count)
+    print(f"Evidence: kept {kept}/{len(new_items)} newly ranked results, {len(state.evidence)} items in total")
+    update["attempt_count"] = state.attempt_count
+    return update
 
 @trace
 # Define node functions for each step in the workflow:
@@ -37,9 +344,13 @@ def clarify_node(state: AgentState):
 def ask_user_node(state: AgentState):
     """Ask the user for clarification (if needed) and store the answer."""
     if state.clarification and state.clarification.needed:
-        # Prompt the user and get input (in real usage, this would be interactive)
-        user_input = input(f"Agent: {state.clarification.question} ")  # waiting for user
-        state.clarification_answer = user_input.strip()
+        if state.defer_clarification:
+            # Pause here; the checkpointed run continues once DeepResearchAgent.resume() supplies the answer
+            user_input = interrupt({"question": state.clarification.question})
+        else:
+            # Prompt the user and get input (in real usage, this would be interactive)
+            user_input = input(f"Agent: {state.clarification.question} ")  # waiting for user
+        state.clarification_answer = str(user_input).strip()
         # Optionally, update the question with clarification context (not strictly necessary)
     return {"clarification_answer": state.clarification_answer}
 
@@ -48,8 +359,7 @@ def generate_subqueries_node(state: AgentState):
     """Use LLM to generate multiple search subqueries for the question."""
     clarif_detail = state.clarification_answer or ""
     subqs = b.GenerateSubqueries(question=state.question, clarification_details=clarif_detail)
-    # Ensure we have a list of strings (BAML returns a Python list for string[] output)
-    state.subqueries = list(subqs) if isinstance(subqs, list) else subqs.queries  # .queries if wrapped in a model
+    state.subqueries = _normalize_subqueries(subqs)
     return {"subqueries": state.subqueries}
 
 @trace
@@ -58,38 +368,89 @@ def plan_node(state: AgentState):
     state.plan = b.PlanSteps(question=state.question, subqueries=state.subqueries)
     return {"plan": state.plan}
 
+def _run_plan_job(steps: List[Tuple[str, str]], indices: List[int]) -> List[List[StepOutput]]:
+    """Execute one job from _plan_jobs and return the results for each of its steps."""
+    tool = steps[indices[0]][0]
+    if tool == "WebSearch":
+        # Perform web search for this query - returns list of dicts
+        return [web_search(steps[indices[0]][1], max_results=5)]
+    elif tool == "PriceLookup":
+        queries = [steps[i][1] for i in indices]
+        return [[res] for res in price_results(queries, get_current_prices(queries))]
+    return [[] for _ in indices]
+
 @trace
 def gather_info_node(state: AgentState):
-    """Execute the plan: perform web searches and/or price lookups as specified, gather raw results."""
-    results = []
-    if state.plan:
-        for step in state.plan.steps:
-            tool = step.tool.value if hasattr(step.tool, "value") else str(step.tool)  # handle enum or string
-            query = step.query
-            if tool == "WebSearch":
-                # Perform web search for this query - returns list of dicts
-                search_res = web_search(query, max_results=5)
-                results.extend(search_res) # Extend directly as it's already list of dicts
-            elif tool == "PriceLookup":
-                price_str = get_current_price(query)
-                if price_str:
-                    # Format price result as a dict for consistency
-                    results.append({'content': f"Current {query} price: {price_str}", 'link': None})
-                else:
-                    results.append({'content': f"Current {query} price: (unavailable)", 'link': None})
-    state.raw_results = results
-    return {"raw_results": state.raw_results}
+    """Execute the plan: run all web searches and/or price lookups concurrently, gather raw results in plan order."""
+    steps = _plan_steps(state)
+    step_results: List[List[StepOutput]] = [[] for _ in steps]
+    timings: List[Dict[str, Any]] = [
+        {"tool": tool, "query": query, "status": "skipped", "latency_ms": None} for tool, query in steps
+    ]
+    jobs = _plan_jobs(steps)
+    if not jobs:
+        return _finish_gather(state, step_results, timings)
+
+    started_at: Dict[int, float] = {}
+
+    def run_job(job_index: int):
+        started_at[job_index] = time.perf_counter()
+        return _run_plan_job(steps, jobs[job_index])
+
+    def record(job_index: int, status: str, latency_ms: float):
+        for i in jobs[job_index]:
+            timings[i]["status"] = status
+            timings[i]["latency_ms"] = latency_ms
+
+    # Dispatch every job at once; the pool size bounds how many run at the same time
+    pool = ThreadPoolExecutor(max_workers=max(1, min(GATHER_MAX_CONCURRENCY, len(jobs))))
+    try:
+        # Copy the context so tool and cache metrics are attributed to this node
+        futures = {pool.submit(contextvars.copy_context().run, run_job, j): j for j in range(len(jobs))}
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=0.05, return_when=FIRST_COMPLETED)
+            now = time.perf_counter()
+            for future in done:
+                j = futures[future]
+                latency_ms = round((now - started_at.get(j, now)) * 1000, 1)
+                try:
+                    for i, res in zip(jobs[j], future.result()):
+                        step_results[i] = res or []
+                    record(j, "ok", latency_ms)
+                except Exception as e:
+                    print(f"Plan steps {[steps[i] for i in jobs[j]]} failed: {e}")
+                    record(j, "error", latency_ms)
+            # The timeout counts from when a job actually starts running, not from when it was queued
+            for future in list(pending):
+                j = futures[future]
+                if j in started_at and now - started_at[j] > GATHER_STEP_TIMEOUT:
+                    print(f"Plan steps {[steps[i] for i in jobs[j]]} timed out after {GATHER_STEP_TIMEOUT}s")
+                    record(j, "timeout", round((now - started_at[j]) * 1000, 1))
+                    future.cancel()
+                    pending.discard(future)
+    finally:
+        # Don't block on jobs that timed out; their threads finish in the background
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    return _finish_gather(state, step_results, timings)
+
+@trace
+def structured_answer_node(state: AgentState):
+    """Answer a question whose plan only needed structured tools (e.g. price lookups) without ranking or LLM calls."""
+    state.answer = _structured_answer(state)
+    _log_answer(state.answer)
+    return {"answer": state.answer}
 
 @trace
 def filter_results_node(state: AgentState):
     """Use LLM via BAML to rank raw results and select the most relevant ones."""
     raw_results_dicts: List[Dict[str, Optional[str]]] = state.raw_results or []
     if not raw_results_dicts:
-        state.relevant_results = []
-        return {"relevant_results": state.relevant_results}
+        return {**_set_evidence(state, []), "prefilter_stats": state.prefilter_stats}
 
-    # Convert Python dicts to BAML ResultItem instances
-    raw_results_items = [ResultItem(content=d.get('content'), link=d.get('link')) for d in raw_results_dicts]
+    # Drop duplicates and lexically irrelevant results before paying for the LLM call
+    raw_results_items = _prefilter_for_ranking(state)
 
     # Define how many top results we want
     top_k_to_request = 5
@@ -102,186 +463,445 @@ def filter_results_node(state: AgentState):
         top_k=top_k_to_request
     )
 
-    # Convert the ranked BAML objects back to simple dictionaries for the state
-    # We only keep content and link as defined in AgentState.relevant_results
-    final_relevant_results = [
-        {'content': item.content, 'link': item.link}
-        for item in ranked_results_items
-        # Optionally filter by score client-side too, though the LLM was asked to filter
-        # if item.relevance_score >= 3
-    ]
-
-    state.relevant_results = final_relevant_results
-    print(f"LLM Filtered Results (Top {len(state.relevant_results)}): {state.relevant_results}") # Add some logging
+    return _ranked_to_evidence(state, ranked_results_items)
 
-    return {"relevant_results": state.relevant_results}
+@trace
+def fetch_pages_node(state: AgentState):
+    """Optionally replace short snippets with relevant passages from the full pages behind the ranked results."""
+    if not state.fetch_full_pages or not state.evidence:
+        return {}
+    return _enriched_evidence(state, enrich_results(state.relevant_results, state.question, state.subqueries))
 
 @trace
 def answer_node(state: AgentState):
     """Use LLM to generate a final answer from the question and relevant context."""
-    relevant_context_dicts: List[Dict[str, Optional[str]]] = state.relevant_results or []
-    
-    # Create a list of ContextItem objects from the relevant results
-    context_items: List[ContextItem] = []
-    for res_dict in relevant_context_dicts:
-        context_items.append(
-            ContextItem(
-                content=res_dict.get('content', ''), 
-                source=res_dict.get('link') # Pass None if 'link' is missing
-            )
-        )
-            
+    # On a retry, results found by additional_search are marked so the answer can focus on what changed
+    context_items = _build_context_items(_pinned_context(state) + answer_context(state.evidence, state.attempt_count))
+
     # Call AnswerQuestion with the structured context list
-    state.answer = b.AnswerQuestion(question=state.question, context=context_items)
-    
-    # Add some debug logging for the template structure
-    if hasattr(state.answer, 'executive_summary'):
-        print(f"Executive Summary: {state.answer.executive_summary[:100]}...")
-    if hasattr(state.answer, 'key_points') and state.answer.key_points:
-        print(f"Generated {len(state.answer.key_points)} key points")
-    if hasattr(state.answer, 'confidence_score'):
-        print(f"Answer confidence score: {state.answer.confidence_score:.2f}")
-        
+    if state.stream_answer:
+        state.answer = _stream_answer(state, context_items)
+    else:
+        state.answer = b.AnswerQuestion(question=state.question, context=context_items)
+    _log_answer(state.answer)
+
     return {"answer": state.answer}
 
 @trace
 def critique_node(state: AgentState):
     """Use LLM to critique the answer for completeness/correctness and template compliance."""
-    # Format the answer to explicitly show template structure
-    formatted_answer = ""
-    if state.answer:
-        # Create a clearly formatted version that shows section headings
-        formatted_answer = (
-            f"## Executive Summary\n{state.answer.executive_summary}\n\n"
-            f"## Detailed Explanation\n{state.answer.detailed_explanation}\n\n"
-            f"## Key Points\n"
-        )
-        # Add key points as bullet points
-        if hasattr(state.answer, 'key_points') and state.answer.key_points:
-            for point in state.answer.key_points:
-                formatted_answer += f"- {point}\n"
-        
-        formatted_answer += f"\n## Complete Answer\n{state.answer.cited_answer}"
-    else:
-        # If no structured answer available, use just the cited_answer
-        formatted_answer = state.answer.cited_answer if state.answer else ""
-    
+    formatted_answer = _format_answer_for_critique(state.answer)
+
     # Send the formatted answer to the critique function
-    state.critique = b.CritiqueAnswer(question=state.question, answer=formatted_answer)
-    
-    # Store template-specific feedback
-    if state.critique:
-        state.template_feedback = {
-            "followed": state.critique.template_followed,
-            "section_feedback": state.critique.section_feedback,
-            "suggestions": state.critique.improvement_suggestions
-        }
-    
-    return {
-        "critique": state.critique,
-        "template_feedback": state.template_feedback
-    }
+    critique = b.CritiqueAnswer(question=state.question, answer=formatted_answer)
+    return _apply_critique(state, critique)
 
 @trace
 def additional_search_node(state: AgentState):
     """If the answer was insufficient, search for the missing information identified by critique."""
-    missing = state.critique.missing_info if state.critique else ""
-    missing = missing.strip()
+    missing = _missing_info_query(state)
     new_info_results: List[Dict[str, Optional[str]]] = [] # Expecting list of dicts
-    
-    # Check if we have template feedback
-    template_issues = False
-    if state.template_feedback:
-        template_followed = state.template_feedback.get("followed", True)
-        template_issues = not template_followed
-        
-        # If there are template issues but no specific missing info query,
-        # we should still search to improve the answer content
-        if template_issues and not missing:
-            print("Template structure issues detected but no missing info specified.")
-            # Use the original question as fallback if missing info isn't specific
-            missing = state.question
-            
-        # Check for specific citation or source issues in the feedback
-        elif "citation" in missing.lower() or "reference" in missing.lower():
-            print(f"Citation issues detected: {missing}")
-            # For citation issues, we might want to search for authoritative sources
-            missing = f"authoritative sources {state.question}"
-    
+
     if missing:
         print(f"Searching for additional information: {missing}")
         # Use the missing info string as a new search query
         new_info_results = web_search(missing, max_results=3) # Returns list of dicts
-        
-    # Append new search results (if any) to the relevant results for a second attempt
-    if new_info_results:
-        # Ensure we don't add duplicates (simple check based on link, if available)
-        existing_links = {res.get('link') for res in state.relevant_results if res.get('link')}
-        for new_res in new_info_results:
-            if new_res.get('link') not in existing_links:
-                 state.relevant_results.append(new_res)
-            # Limit total relevant results if needed, e.g., state.relevant_results = state.relevant_results[-10:] 
-
-    # Increment attempt count
-    state.attempt_count += 1
-    return {"relevant_results": state.relevant_results, "attempt_count": state.attempt_count}
+
+    # Rank only the results that aren't already in the evidence, then merge them by score
+    ranked_new_items: List[RankedResultItem] = []
+    new_items = _new_result_items(state, new_info_results)
+    if new_items:
+        ranked_new_items = b.RankResults(
+            question=state.question,
+            subqueries=state.subqueries + [missing],
+            results=new_items,
+            top_k=len(new_items)
+        )
+    return _merge_additional_results(state, ranked_new_items)
+
+# Async node functions, backed by the async BAML client and async tools.
+# They mirror the synchronous nodes above and are used by build_agent_graph(use_async=True).
+
+@trace
+async def aclarify_node(state: AgentState):
+    """Async version of clarify_node."""
+    state.clarification = await async_b.ClarifyQuestion(question=state.question)
+    return {"clarification": state.clarification}
+
+@trace
+async def aask_user_node(state: AgentState):
+    """Async version of ask_user_node; reads the answer off the event loop so other runs keep progressing."""
+    if state.clarification and state.clarification.needed:
+        if state.defer_clarification:
+            user_input = interrupt({"question": state.clarification.question})
+        else:
+            user_input = await asyncio.to_thread(input, f"Agent: {state.clarification.question} ")
+        state.clarification_answer = str(user_input).strip()
+    return {"clarification_answer": state.clarification_answer}
+
+@trace
+async def agenerate_subqueries_node(state: AgentState):
+    """Async version of generate_subqueries_node."""
+    clarif_detail = state.clarification_answer or ""
+    subqs = await async_b.GenerateSubqueries(question=state.question, clarification_details=clarif_detail)
+    state.subqueries = _normalize_subqueries(subqs)
+    return {"subqueries": state.subqueries}
+
+@trace
+async def aplan_node(state: AgentState):
+    """Async version of plan_node."""
+    state.plan = await async_b.PlanSteps(question=state.question, subqueries=state.subqueries)
+    return {"plan": state.plan}
+
+async def _arun_plan_job(steps: List[Tuple[str, str]], indices: List[int]) -> List[List[StepOutput]]:
+    """Async version of _run_plan_job."""
+    tool = steps[indices[0]][0]
+    if tool == "WebSearch":
+        return [await aweb_search(steps[indices[0]][1], max_results=5)]
+    elif tool == "PriceLookup":
+        queries = [steps[i][1] for i in indices]
+        return [[res] for res in price_results(queries, await aget_current_prices(queries))]
+    return [[] for _ in indices]
+
+@trace
+async def agather_info_node(state: AgentState):
+    """Async version of gather_info_node: jobs run as tasks on the event loop, bounded by a semaphore."""
+    steps = _plan_steps(state)
+    step_results: List[List[StepOutput]] = [[] for _ in steps]
+    timings: List[Dict[str, Any]] = [
+        {"tool": tool, "query": query, "status": "skipped", "latency_ms": None} for tool, query in steps
+    ]
+    jobs = _plan_jobs(steps)
+    semaphore = asyncio.Semaphore(max(1, GATHER_MAX_CONCURRENCY))
+
+    async def run_job(indices: List[int]):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                job_results = await asyncio.wait_for(_arun_plan_job(steps, indices), timeout=GATHER_STEP_TIMEOUT)
+                for i, res in zip(indices, job_results):
+                    step_results[i] = res or []
+                status = "ok"
+            except asyncio.TimeoutError:
+                print(f"Plan steps {[steps[i] for i in indices]} timed out after {GATHER_STEP_TIMEOUT}s")
+                status = "timeout"
+            except Exception as e:
+                print(f"Plan steps {[steps[i] for i in indices]} failed: {e}")
+                status = "error"
+            latency_ms = round((time.perf_counter() - start) * 1000, 1)
+            for i in indices:
+                timings[i]["status"] = status
+                timings[i]["latency_ms"] = latency_ms
+
+    await asyncio.gather(*(run_job(indices) for indices in jobs))
+    return _finish_gather(state, step_results, timings)
+
+@trace
+async def astructured_answer_node(state: AgentState):
+    """Async version of structured_answer_node."""
+    state.answer = _structured_answer(state)
+    _log_answer(state.answer)
+    return {"answer": state.answer}
+
+@trace
+async def afilter_results_node(state: AgentState):
+    """Async version of filter_results_node."""
+    raw_results_dicts: List[Dict[str, Optional[str]]] = state.raw_results or []
+    if not raw_results_dicts:
+        return {**_set_evidence(state, []), "prefilter_stats": state.prefilter_stats}
+
+    raw_results_items = _prefilter_for_ranking(state)
+    ranked_results_items: List[RankedResultItem] = await async_b.RankResults(
+        question=state.question,
+        subqueries=state.subqueries,
+        results=raw_results_items,
+        top_k=5
+    )
+
+    return _ranked_to_evidence(state, ranked_results_items)
+
+@trace
+async def afetch_pages_node(state: AgentState):
+    """Async version of fetch_pages_node; page downloads run in a worker thread pool."""
+    if not state.fetch_full_pages or not state.evidence:
+        return {}
+    enriched = await asyncio.to_thread(
+        contextvars.copy_context().run, enrich_results, state.relevant_results, state.question, state.subqueries
+    )
+    return _enriched_evidence(state, enriched)
+
+@trace
+async def aanswer_node(state: AgentState):
+    """Async version of answer_node."""
+    # On a retry, results found by additional_search are marked so the answer can focus on what changed
+    context_items = _build_context_items(_pinned_context(state) + answer_context(state.evidence, state.attempt_count))
+    if state.stream_answer:
+        state.answer = await _astream_answer(state, context_items)
+    else:
+        state.answer = await async_b.AnswerQuestion(question=state.question, context=context_items)
+    _log_answer(state.answer)
+    return {"answer": state.answer}
+
+@trace
+async def acritique_node(state: AgentState):
+    """Async version of critique_node."""
+    formatted_answer = _format_answer_for_critique(state.answer)
+    critique = await async_b.CritiqueAnswer(question=state.question, answer=formatted_answer)
+    return _apply_critique(state, critique)
+
+@trace
+async def aadditional_search_node(state: AgentState):
+    """Async version of additional_search_node."""
+    missing = _missing_info_query(state)
+    new_info_results: List[Dict[str, Optional[str]]] = []
+
+    if missing:
+        print(f"Searching for additional information: {missing}")
+        new_info_results = await aweb_search(missing, max_results=3)
+
+    ranked_new_items: List[RankedResultItem] = []
+    new_items = _new_result_items(state, new_info_results)
+    if new_items:
+        ranked_new_items = await async_b.RankResults(
+            question=state.question,
+            subqueries=state.subqueries + [missing],
+            results=new_items,
+            top_k=len(new_items)
+        )
+    return _merge_additional_results(state, ranked_new_items)
 
 class DeepResearchAgent:
-    def __init__(self, graph: StateGraph, max_attempt_count: int = 2):
+    def __init__(self, graph: StateGraph, max_attempt_count: int = 2, critique_policy: Optional[CritiquePolicy] = None,
+                 print_metrics: bool = True, fetch_pages: bool = False):
         self.graph = graph
         self.max_attempt_count = max_attempt_count
+        self.critique_policy = critique_policy or CritiquePolicy()
+        self.fetch_pages = fetch_pages  # enrich ranked results with passages from the full pages
+        self.print_metrics = print_metrics  # print a per-node summary table after each run
+        self.last_run_metrics = None  # metrics.RunMetrics of the most recent run in this agent
 
-    def run(self, question: str, clarification_answer: str = None) -> str:
+    def _initial_state(self, question: str, clarification_answer: str = None, interactive: bool = True,
+                       defer_clarification: bool = False) -> AgentState:
         # Initialize state with the question and optional pre-provided clarification answer
-        state = AgentState(question=question, clarification_answer=clarification_answer)
+        state = AgentState(
+            question=question,
+            clarification_answer=clarification_answer,
+            max_attempt_count=self.max_attempt_count,
+            critique_policy=self.critique_policy,
+            interactive=interactive,
+            defer_clarification=defer_clarification,
+            fetch_full_pages=self.fetch_pages,
+        )
         if clarification_answer:
             # If clarification answer is given, assume clarification was needed
             state.clarification = Clarification(needed=True, question="")  # dummy Clarification since user provided detail
+        return state
+
+    def _finish_run(self, run_metrics):
+        self.last_run_metrics = run_metrics
+        if self.print_metrics:
+            print(format_summary(run_metrics))
+
+    @staticmethod
+    def _thread_config(thread_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        # Checkpointed graphs key their saved state by thread id
+        return {"configurable": {"thread_id": thread_id}} if thread_id else None
+
+    @staticmethod
+    def _interrupt_question(snapshot) -> Optional[str]:
+        # The clarifying question a paused run is waiting on, if any
+        for task in snapshot.tasks:
+            for pending in task.interrupts:
+                value = pending.value
+                return value.get("question", "") if isinstance(value, dict) else str(value)
+        return None
+
+    def _output_or_pause(self, final_state: Dict[str, Any], thread_id: Optional[str], question: Optional[str]) -> str:
+        if question is not None:
+            return (f"Clarification needed: {question}\n"
+                    f"Resume thread {thread_id!r} with the answer to continue this run.")
+        return self.format_output(final_state)
+
+    def pending_clarification(self, thread_id: str) -> Optional[str]:
+        """Return the clarifying question a checkpointed run is paused on, or None if it is not waiting."""
+        return self._interrupt_question(self.graph.get_state(self._thread_config(thread_id)))
+
+    async def apending_clarification(self, thread_id: str) -> Optional[str]:
+        """Async counterpart of pending_clarification()."""
+        return self._interrupt_question(await self.graph.aget_state(self._thread_config(thread_id)))
+
+    def run(self, question: str, clarification_answer: str = None, thread_id: Optional[str] = None,
+            defer_clarification: bool = False) -> str:
+        """Research the question and return the formatted answer.
+
+        With thread_id (and a graph built with a checkpointer) the run is saved after every node and can
+        be continued with resume(). defer_clarification pauses the run instead of prompting on stdin when
+        a clarifying question is needed; the returned text then contains the question.
+        """
+        state = self._initial_state(question, clarification_answer, defer_clarification=defer_clarification)
         # Execute the graph
-        final_state: AgentState = self.graph.invoke(state)  # Use invoke() instead of run()
-        
+        with metrics_registry.run(question) as run_metrics:
+            final_state: AgentState = self.graph.invoke(state, self._thread_config(thread_id))  # Use invoke() instead of run()
+        self._finish_run(run_metrics)
+        return self._output_or_pause(final_state, thread_id, self.pending_clarification(thread_id) if thread_id else None)
+
+    def resume(self, thread_id: str, clarification_answer: str = None) -> str:
+        """Continue a checkpointed run from its last completed node.
+
+        A run paused for clarification needs clarification_answer; a run that crashed (e.g. an LLM
+        timeout during the critique) re-runs only the node that failed and what follows it.
+        """
+        config = self._thread_config(thread_id)
+        snapshot = self.graph.get_state(config)
+        if not snapshot.values:
+            raise ValueError(f"No checkpoint found for thread {thread_id!r}")
+        if not snapshot.next:
+            return self.format_output(snapshot.values)  # the run already finished
+        graph_input = None  # None continues from the last checkpoint
+        if self._interrupt_question(snapshot) is not None:
+            if clarification_answer is None:
+                raise ValueError(f"Thread {thread_id!r} is waiting for a clarification answer")
+            graph_input = Command(resume=clarification_answer)
+
+        with metrics_registry.run(snapshot.values.get("question", "")) as run_metrics:
+            final_state = self.graph.invoke(graph_input, config)
+        self._finish_run(run_metrics)
+        return self._output_or_pause(final_state, thread_id, self.pending_clarification(thread_id))
+
+    def run_timed(self, question: str, clarification_answer: str = None, interactive: bool = True) -> Tuple[str, List[Dict[str, Any]]]:
+        """Like run(), but also return the metrics of each node execution in run order."""
+        state = self._initial_state(question, clarification_answer, interactive)
+        with metrics_registry.run(question) as run_metrics:
+            final_state = self.graph.invoke(state)
+        self._finish_run(run_metrics)
+        return self.format_output(final_state), [span.to_dict() for span in run_metrics.spans]
+
+    async def arun_timed(self, question: str, clarification_answer: str = None,
+                         interactive: bool = True) -> Tuple[str, List[Dict[str, Any]]]:
+        """Async counterpart of run_timed()."""
+        state = self._initial_state(question, clarification_answer, interactive)
+        with metrics_registry.run(question) as run_metrics:
+            final_state = await self.graph.ainvoke(state)
+        self._finish_run(run_metrics)
+        return self.format_output(final_state), [span.to_dict() for span in run_metrics.spans]
+
+    async def arun(self, question: str, clarification_answer: str = None, thread_id: Optional[str] = None,
+                   defer_clarification: bool = False) -> str:
+        """Async counterpart of run(); use with a graph from build_agent_graph(use_async=True)."""
+        state = self._initial_state(question, clarification_answer, defer_clarification=defer_clarification)
+        with metrics_registry.run(question) as run_metrics:
+            final_state: AgentState = await self.graph.ainvoke(state, self._thread_config(thread_id))
+        self._finish_run(run_metrics)
+        pending = await self.apending_clarification(thread_id) if thread_id else None
+        return self._output_or_pause(final_state, thread_id, pending)
+
+    async def aresume(self, thread_id: str, clarification_answer: str = None) -> str:
+        """Async counterpart of resume()."""
+        config = self._thread_config(thread_id)
+        snapshot = await self.graph.aget_state(config)
+        if not snapshot.values:
+            raise ValueError(f"No checkpoint found for thread {thread_id!r}")
+        if not snapshot.next:
+            return self.format_output(snapshot.values)
+        graph_input = None
+        if self._interrupt_question(snapshot) is not None:
+            if clarification_answer is None:
+                raise ValueError(f"Thread {thread_id!r} is waiting for a clarification answer")
+            graph_input = Command(resume=clarification_answer)
+
+        with metrics_registry.run(snapshot.values.get("question", "")) as run_metrics:
+            final_state = await self.graph.ainvoke(graph_input, config)
+        self._finish_run(run_metrics)
+        return self._output_or_pause(final_state, thread_id, await self.apending_clarification(thread_id))
+
+    # Stream modes requested from LangGraph: node updates for progress, custom events for partial
+    # answers, and full state values so the final answer can be formatted at the end.
+    _STREAM_MODES = ["updates", "custom", "values"]
+
+    def stream(self, question: str, clarification_answer: str = None, interactive: bool = True) -> Iterator[Dict[str, Any]]:
+        """Run the graph and yield events as they happen.
+
+        Yields {"type": "node", "node": ...} after each node finishes, {"type": "partial_answer", ...}
+        snapshots of the executive summary, detailed explanation and key points while the answer is
+        being generated, and finally {"type": "final", "output": ...} with the formatted answer.
+        """
+        state = self._initial_state(question, clarification_answer, interactive)
+        state.stream_answer = True
+        final_state: Dict[str, Any] = {}
+        with metrics_registry.run(question) as run_metrics:
+            for mode, chunk in self.graph.stream(state, stream_mode=self._STREAM_MODES):
+                if mode == "custom":
+                    yield chunk
+                elif mode == "updates":
+                    for node_name in chunk:
+                        yield {"type": "node", "node": node_name}
+                elif mode == "values":
+                    final_state = chunk
+        self._finish_run(run_metrics)
+        yield {"type": "final", "output": self.format_output(final_state)}
+
+    async def astream(self, question: str, clarification_answer: str = None,
+                      interactive: bool = True) -> AsyncIterator[Dict[str, Any]]:
+        """Async counterpart of stream(); use with a graph from build_agent_graph(use_async=True)."""
+        state = self._initial_state(question, clarification_answer, interactive)
+        state.stream_answer = True
+        final_state: Dict[str, Any] = {}
+        with metrics_registry.run(question) as run_metrics:
+            async for mode, chunk in self.graph.astream(state, stream_mode=self._STREAM_MODES):
+                if mode == "custom":
+                    yield chunk
+                elif mode == "updates":
+                    for node_name in chunk:
+                        yield {"type": "node", "node": node_name}
+                elif mode == "values":
+                    final_state = chunk
+        self._finish_run(run_metrics)
+        yield {"type": "final", "output": self.format_output(final_state)}
+
+    @staticmethod
+    def format_output(final_state: Dict[str, Any]) -> str:
         # Format the answer using template structure if available
         output = ""
-        
+
         if final_state.get('answer'):
             answer = final_state['answer']
-            
+
             # Check if we have the template fields
-            has_template = (hasattr(answer, 'executive_summary') and 
-                          hasattr(answer, 'detailed_explanation') and 
+            has_template = (hasattr(answer, 'executive_summary') and
+                          hasattr(answer, 'detailed_explanation') and
                           hasattr(answer, 'key_points'))
-            
+
             if has_template:
                 # Format with template structure
                 output += f"## Executive Summary\n{answer.executive_summary}\n\n"
                 output += f"## Detailed Explanation\n{answer.detailed_explanation}\n\n"
-                
+
                 # Format key points as bullet list
                 output += "## Key Points\n"
                 for point in answer.key_points:
                     output += f"- {point}\n"
                 output += "\n"
-                
+
                 # Add confidence if available
                 if hasattr(answer, 'confidence_score'):
                     output += f"_Answer confidence: {answer.confidence_score:.2f}/1.0_\n\n"
             else:
                 # Fall back to cited_answer if template isn't available
                 output = answer.cited_answer
-            
+
             # Add template feedback note if there are template issues
             template_note = ""
             if final_state.get('template_feedback') and not final_state['template_feedback'].get('followed', True):
                 template_note = "\n\n**Note:** This answer could be improved by following the recommended template structure."
-                
+
                 # If there are specific improvement suggestions, include the first 2
                 if 'suggestions' in final_state['template_feedback'] and final_state['template_feedback']['suggestions']:
                     template_note += "\nSuggested improvements:"
                     for i, suggestion in enumerate(final_state['template_feedback']['suggestions'][:2]):
                         template_note += f"\n- {suggestion}"
-            
+
             output += template_note
-            
+
             # Process and add references if available
             if hasattr(answer, 'references') and answer.references:
                  # Create a list of tuples (index, formatted_string) for sorting
@@ -296,35 +916,67 @@ class DeepResearchAgent:
 
                  # Extract the sorted formatted strings
                  references_list = [item[1] for item in raw_references]
-                 
+
                  # Add references section
                  if references_list:
                      output += "\n\n## References\n" + "\n".join(f"- {ref_source}" for ref_source in references_list)
-            
+
         # If no answer was generated, provide a helpful message
         return output or "No answer could be generated. Please try rephrasing your question."
 
-def build_agent_graph():
+def make_sqlite_checkpointer(path: str = CHECKPOINT_DB_PATH):
+    """Create a SqliteSaver that stores graph checkpoints in a local SQLite file (for the sync graph)."""
+    try:
+        from langgraph.checkpoint.sqlite import SqliteSaver
+    except ImportError as e:
+        raise ImportError("Checkpointing needs the langgraph-checkpoint-sqlite package") from e
+    # LangGraph may run nodes in worker threads, so the connection must not be bound to this thread
+    return SqliteSaver(sqlite3.connect(path, check_same_thread=False))
+
+async def amake_sqlite_checkpointer(path: str = CHECKPOINT_DB_PATH):
+    """Create an AsyncSqliteSaver for the async graph; must be called from inside the running event loop."""
+    try:
+        import aiosqlite
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    except ImportError as e:
+        raise ImportError("Checkpointing needs the langgraph-checkpoint-sqlite package") from e
+    checkpointer = AsyncSqliteSaver(aiosqlite.connect(path))
+    await checkpointer.setup()
+    return checkpointer
+
+def build_agent_graph(use_async: bool = False, checkpointer=None):
+    """Build the research graph.
+
+    With a checkpointer (see make_sqlite_checkpointer), state is saved after every node, so a run that
+    crashes or is paused for clarification can be resumed by its thread id via DeepResearchAgent.resume().
+    """
     # Build the LangGraph state graph
     graph_builder = StateGraph(AgentState)
 
-    # Add nodes to the graph
-    graph_builder.add_node("clarify", clarify_node)
-    graph_builder.add_node("ask_user", ask_user_node)
-    graph_builder.add_node("generate_subqueries", generate_subqueries_node)
-    graph_builder.add_node("generate_plan", plan_node)
-    graph_builder.add_node("gather_info", gather_info_node)
-    graph_builder.add_node("filter_results", filter_results_node)
-    graph_builder.add_node("generate_answer", answer_node)
-    graph_builder.add_node("generate_critique", critique_node)
-    graph_builder.add_node("additional_search", additional_search_node)
+    # Add nodes to the graph (async variants run on the event loop via graph.ainvoke).
+    # Every node is wrapped so its wall time, token usage, tool calls and cache hits are recorded.
+    def add_node(name, sync_node, async_node):
+        graph_builder.add_node(name, instrument_node(name, async_node if use_async else sync_node))
+
+    add_node("clarify", clarify_node, aclarify_node)
+    add_node("ask_user", ask_user_node, aask_user_node)
+    add_node("generate_subqueries", generate_subqueries_node, agenerate_subqueries_node)
+    add_node("generate_plan", plan_node, aplan_node)
+    add_node("gather_info", gather_info_node, agather_info_node)
+    add_node("structured_answer", structured_answer_node, astructured_answer_node)
+    add_node("filter_results", filter_results_node, afilter_results_node)
+    add_node("fetch_pages", fetch_pages_node, afetch_pages_node)
+    add_node("generate_answer", answer_node, aanswer_node)
+    add_node("generate_critique", critique_node, acritique_node)
+    add_node("additional_search", additional_search_node, aadditional_search_node)
 
     # Define edges and conditional edges
     graph_builder.set_entry_point("clarify") # Use set_entry_point instead of add_edge from START
 
     # Conditional edge after clarify: Decide whether to ask user or generate subqueries
     def decide_clarification_path(state: AgentState):
-        if state.clarification and state.clarification.needed and not state.clarification_answer:
+        if (state.clarification and state.clarification.needed and not state.clarification_answer
+                and (state.interactive or state.defer_clarification)):
             return "ask_user"
         else:
             return "generate_subqueries"
@@ -343,15 +995,46 @@ def build_agent_graph():
 
     graph_builder.add_edge("generate_subqueries", "generate_plan")
     graph_builder.add_edge("generate_plan", "gather_info")
-    graph_builder.add_edge("gather_info", "filter_results")
-    graph_builder.add_edge("filter_results", "generate_answer")
-    graph_builder.add_edge("generate_answer", "generate_critique")
+    # Conditional edge after gather_info: questions fully answered by structured tools skip ranking and the LLM
+    def decide_gather_path(state: AgentState):
+        if state.structured_fast_path and _answerable_from_structured(state):
+            print("All plan steps returned structured results; answering without ranking")
+            return "structured_answer"
+        return "filter_results"
+
+    graph_builder.add_conditional_edges(
+        "gather_info",
+        decide_gather_path,
+        {
+            "structured_answer": "structured_answer",
+            "filter_results": "filter_results",
+        }
+    )
+    graph_builder.add_edge("structured_answer", END)
+    graph_builder.add_edge("filter_results", "fetch_pages")
+    graph_builder.add_edge("fetch_pages", "generate_answer")
+    # Conditional edge after answer: the critique policy decides whether the answer is critiqued at all
+    def decide_answer_path(state: AgentState):
+        if state.critique_policy.should_critique(state.answer, state.attempt_count, state.max_attempt_count):
+            return "generate_critique"
+        confidence = f"{state.answer.confidence_score:.2f}" if state.answer else "n/a"
+        print(f"Skipping critique (policy={state.critique_policy.mode}, confidence={confidence}, attempt={state.attempt_count})")
+        return END
+
+    graph_builder.add_conditional_edges(
+        "generate_answer",
+        decide_answer_path,
+        {
+            END: END,
+            "generate_critique": "generate_critique",
+        }
+    )
 
     # Conditional edge after critique: Decide whether to end or do additional search
     def decide_critique_path(state: AgentState):
-        if state.critique and (state.critique.is_good or state.attempt_count >= 2):
+        if state.critique and (state.critique.is_good or state.attempt_count >= state.max_attempt_count):
             return END
-        elif state.critique and not state.critique.is_good and state.attempt_count < 2:
+        elif state.critique and not state.critique.is_good and state.attempt_count < state.max_attempt_count:
             return "additional_search"
         else:
             # Fallback case, should ideally not be reached if critique is always present
@@ -372,22 +1055,135 @@ def build_agent_graph():
     graph_builder.add_edge("additional_search", "generate_answer")
 
     # Build the graph
-    agent_graph = graph_builder.compile()
+    agent_graph = graph_builder.compile(checkpointer=checkpointer)
     return agent_graph
 
+def print_stream(agent: DeepResearchAgent, question: str, use_async: bool = False) -> str:
+    """Print the draft answer as it streams in and return the final formatted output."""
+    printed: Dict[str, Any] = {}
+
+    def show(event: Dict[str, Any]):
+        if event.get("attempt") != printed.get("attempt"):
+            # A new answer attempt starts from scratch
+            printed.clear()
+            printed["attempt"] = event.get("attempt")
+            print(f"\nAgent (drafting, attempt {event.get('attempt')}):")
+        for field in ("executive_summary", "detailed_explanation"):
+            text = event.get(field) or ""
+            shown = printed.get(field, 0)
+            if len(text) > shown:
+                print(text[shown:], end="", flush=True)
+                printed[field] = len(text)
+            if text and field == "executive_summary" and event.get("detailed_explanation") and not printed.get("sep"):
+                print("\n")
+                printed["sep"] = True
+
+    def handle(event: Dict[str, Any]) -> Optional[str]:
+        if event["type"] == "partial_answer":
+            show(event)
+        elif event["type"] == "node" and event["node"] == "generate_answer":
+            print()  # finish the draft line before the node logs continue
+        elif event["type"] == "final":
+            print()
+            return event["output"]
+        return None
+
+    if use_async:
+        async def consume():
+            output = None
+            async for event in agent.astream(question):
+                output = handle(event) or output
+            return output
+        return asyncio.run(consume())
+
+    output = None
+    for event in agent.stream(question):
+        output = handle(event) or output
+    return output
+
+# Compiled graph referenced by langgraph.json ("agent:agent_graph") and shared by server.py.
+# The async nodes let many requests share one event loop; pass {"interactive": false} (or
+# "defer_clarification": true with a checkpointer) in the input so clarification never blocks on input().
+agent_graph = build_agent_graph(use_async=True)
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run the Deep Research Agent")
     parser.add_argument("--question", type=str, help="The question to research")
+    parser.add_argument("--use-async", action="store_true", help="Run the graph with async nodes on an event loop")
+    parser.add_argument("--stream", action="store_true", help="Print the answer as it is being generated")
+    parser.add_argument("--max-attempts", type=int, default=2, help="Maximum number of answer attempts")
+    parser.add_argument("--critique", choices=["always", "confidence", "never"], default="always",
+                        help="When to critique answers (confidence: skip if the answer is confident enough)")
+    parser.add_argument("--confidence-threshold", type=float, default=0.85,
+                        help="Confidence score at which the 'confidence' critique policy skips the critique")
+    parser.add_argument("--fetch-pages", action="store_true",
+                        help="Download the top-ranked pages and add relevant passages to the answer context")
+    parser.add_argument("--metrics-out", type=str,
+                        help="Write collected metrics to this file (Prometheus text if it ends in .prom, JSON otherwise)")
+    parser.add_argument("--route-llm", action="store_true",
+                        help="Route each LLM call to the client with the best observed latency, error rate and cost")
+    parser.add_argument("--hedge-after", type=float,
+                        help="Seconds before a routed call is hedged with a backup client (default: the client's p95)")
+    parser.add_argument("--routing-log", type=str, help="Write the routing decision log to this JSONL file")
+    parser.add_argument("--thread-id", type=str,
+                        help="Checkpoint the run under this id so it can be resumed after a crash or clarification")
+    parser.add_argument("--checkpoint-db", type=str, default=CHECKPOINT_DB_PATH,
+                        help="SQLite file for checkpoints (used with --thread-id)")
+    parser.add_argument("--resume", action="store_true", help="Continue the checkpointed run for --thread-id")
+    parser.add_argument("--clarification", type=str, help="Answer to the agent's clarifying question")
+    parser.add_argument("--defer-clarification", action="store_true",
+                        help="Pause the run instead of prompting when clarification is needed (requires --thread-id)")
     args = parser.parse_args()
+    if (args.resume or args.defer_clarification) and not args.thread_id:
+        parser.error("--resume and --defer-clarification require --thread-id")
+    if args.stream and args.thread_id:
+        parser.error("--stream does not support checkpointed runs")
+    llm_router.enabled = args.route_llm
+    llm_router.hedge_after = args.hedge_after
+
+    def make_agent(checkpointer=None) -> DeepResearchAgent:
+        return DeepResearchAgent(
+            build_agent_graph(use_async=args.use_async, checkpointer=checkpointer),
+            max_attempt_count=args.max_attempts,
+            critique_policy=CritiquePolicy(mode=args.critique, confidence_threshold=args.confidence_threshold),
+            fetch_pages=args.fetch_pages,
+        )
+
+    async def arun_cli(question: str) -> str:
+        # The async checkpointer is bound to the event loop, so it is created inside it
+        checkpointer = await amake_sqlite_checkpointer(args.checkpoint_db) if args.thread_id else None
+        try:
+            agent = make_agent(checkpointer)
+            if args.resume:
+                return await agent.aresume(args.thread_id, args.clarification)
+            return await agent.arun(question, args.clarification, thread_id=args.thread_id,
+                                    defer_clarification=args.defer_clarification)
+        finally:
+            if checkpointer is not None:
+                await checkpointer.conn.close()
 
-    agent_graph = build_agent_graph()
-    agent = DeepResearchAgent(agent_graph)
     user_question = (
         args.question
         or "What were the key factors leading to the fall of the Roman Empire?"
     )
-    print(f"User: {user_question}")
+    if not args.resume:
+        print(f"User: {user_question}")
     # Run the agent (this will ask for clarification interactively if needed)
-    final_output_string = agent.run(user_question) # Returns a string with answer + references
+    if args.stream:
+        final_output_string = print_stream(make_agent(), user_question, args.use_async)
+    elif args.use_async:
+        final_output_string = asyncio.run(arun_cli(user_question))
+    else:
+        agent = make_agent(make_sqlite_checkpointer(args.checkpoint_db) if args.thread_id else None)
+        if args.resume:
+            final_output_string = agent.resume(args.thread_id, args.clarification)
+        else:
+            final_output_string = agent.run(user_question, args.clarification, thread_id=args.thread_id,
+                                            defer_clarification=args.defer_clarification) # Returns a string with answer + references
     # Print the final output string
     print(f"Agent Output:\n{final_output_string}")
+    if args.metrics_out:
+        with open(args.metrics_out, "w", encoding="utf-8") as f:
+            f.write(metrics_registry.export_prometheus() if args.metrics_out.endswith(".prom") else metrics_registry.export_json())
+    if args.routing_log:
+        llm_router.export_decisions(args.routing_log)
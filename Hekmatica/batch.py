@@ -0,0 +1,133 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Set
+
+from agent import DeepResearchAgent, CritiquePolicy, build_agent_graph
+
+
+def _question_id(record: Dict[str, Any]) -> str:
+    # Use the caller's id when present, otherwise derive a stable one from the question text
+    if record.get("id") not in (None, ""):
+        return str(record["id"])
+    return hashlib.sha1(record["question"].strip().encode("utf-8")).hexdigest()[:12]
+
+
+def load_questions(path: str) -> List[Dict[str, Any]]:
+    """Read questions from a JSONL file (one object per line) or a CSV file with a 'question' column.
+
+    Each record may also carry an 'id' and a 'clarification' (answer to a clarifying question).
+    A JSONL line may also be a bare JSON string.
+    """
+    records = []
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                records.append(row)
+    else:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                item = json.loads(line)
+                records.append({"question": item} if isinstance(item, str) else item)
+
+    questions = []
+    for record in records:
+        question = (record.get("question") or "").strip()
+        if not question:
+            continue
+        questions.append({
+            "id": _question_id(record),
+            "question": question,
+            "clarification": record.get("clarification") or None,
+        })
+    return questions
+
+
+def completed_ids(output_path: str) -> Set[str]:
+    """Ids that already have a successful answer in the output file, so a rerun can resume after a crash."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a line cut short by a crash; that question will be run again
+            if record.get("status") == "ok":
+                done.add(record.get("id"))
+    return done
+
+
+def _research_one(agent: DeepResearchAgent, item: Dict[str, Any]) -> Dict[str, Any]:
+    start = time.perf_counter()
+    record = {"id": item["id"], "question": item["question"]}
+    try:
+        # Never block on input(): batch runs proceed without asking clarifying questions
+        answer, node_timings = agent.run_timed(item["question"], item["clarification"], interactive=False)
+        record.update(status="ok", answer=answer, node_timings=node_timings)
+    except Exception as e:
+        record.update(status="error", error=f"{type(e).__name__}: {e}")
+    record["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+    record["finished_at"] = datetime.now(timezone.utc).isoformat()
+    return record
+
+
+def run_batch(agent: DeepResearchAgent, input_path: str, output_path: str, workers: int = 4, resume: bool = True) -> Dict[str, int]:
+    """Research every question in input_path with a bounded worker pool, appending results to output_path.
+
+    Each result is written (and flushed) as soon as its question finishes. With resume=True, questions
+    that already have a successful record in output_path are skipped.
+    """
+    questions = load_questions(input_path)
+    done = completed_ids(output_path) if resume else set()
+    pending = [item for item in questions if item["id"] not in done]
+    print(f"Batch: {len(questions)} questions, {len(questions) - len(pending)} already done, {len(pending)} to run")
+
+    counts = {"ok": 0, "error": 0, "skipped": len(questions) - len(pending)}
+    write_lock = threading.Lock()
+    with open(output_path, "a" if resume else "w", encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(_research_one, agent, item) for item in pending]
+        for future in as_completed(futures):
+            record = future.result()
+            with write_lock:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+            counts[record["status"]] += 1
+            print(f"Batch: [{record['status']}] {record['id']} in {record['elapsed_seconds']:.1f}s "
+                  f"({counts['ok'] + counts['error']}/{len(pending)})")
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the Deep Research Agent over a file of questions")
+    parser.add_argument("--input", required=True, help="JSONL or CSV file with a 'question' field/column")
+    parser.add_argument("--output", required=True, help="JSONL file that answers are appended to")
+    parser.add_argument("--workers", type=int, default=4, help="Number of questions researched concurrently")
+    parser.add_argument("--no-resume", action="store_true", help="Overwrite the output file instead of resuming")
+    parser.add_argument("--max-attempts", type=int, default=2, help="Maximum number of answer attempts")
+    parser.add_argument("--critique", choices=["always", "confidence", "never"], default="always",
+                        help="When to critique answers")
+    parser.add_argument("--fetch-pages", action="store_true",
+                        help="Download the top-ranked pages and add relevant passages to the answer context")
+    args = parser.parse_args()
+
+    agent = DeepResearchAgent(
+        build_agent_graph(),
+        max_attempt_count=args.max_attempts,
+        critique_policy=CritiquePolicy(mode=args.critique),
+        print_metrics=False,  # per-node metrics are written to the output file instead
+        fetch_pages=args.fetch_pages,
+    )
+    counts = run_batch(agent, args.input, args.output, workers=args.workers, resume=not args.no_resume)
+    print(f"Batch finished: {counts['ok']} ok, {counts['error']} errors, {counts['skipped']} skipped")
@@ -0,0 +1,432 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+
+import agent
+import tools
+from agent import DeepResearchAgent, CritiquePolicy, build_agent_graph
+from baml_client import types as baml_types
+from batch import load_questions
+from cache import llm_cache_key
+from metrics import InstrumentedBamlClient, record_tool_call
+
+# Offline benchmark for the research graph. Search results, price quotes and BAML outputs are replayed
+# from a fixture file (recorded once against the live services with --record), so throughput and
+# latency can be compared between revisions without network access or LLM spend.
+#
+# Fixture layout (JSON):
+#   {"meta": {...},  (free-form notes, e.g. {"synthetic": true} for hand-written fixtures)
+#    "questions": [...],
+#    "search": {"<normalized query>|<max_results>": {"seconds": s, "value": [...]}},
+#    "prices": {"<coin name>": {"seconds": s, "value": "$123.45"}},
+#    "llm": {"<llm_cache_key>": {"function": name, "seconds": s, "value": <encoded BAML output>}}}
+# "seconds" is the latency observed while recording; replay sleeps for seconds * latency_scale.
+
+PERCENTILES = (50, 95, 99)
+
+
+class FixtureMissError(KeyError):
+    """A call during replay has no recorded response; the fixtures need to be re-recorded."""
+
+
+def _encode(value: Any) -> Any:
+    # BAML outputs are Pydantic models (or lists of them); keep the class name so they can be rebuilt
+    if isinstance(value, BaseModel):
+        return {"__type__": type(value).__name__, "value": value.model_dump(mode="json")}
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    return value
+
+
+def _decode(data: Any) -> Any:
+    if isinstance(data, dict) and "__type__" in data:
+        return getattr(baml_types, data["__type__"]).model_validate(data["value"])
+    if isinstance(data, list):
+        return [_decode(v) for v in data]
+    return data
+
+
+def _llm_key(name: str, args: tuple, kwargs: dict) -> str:
+    # Collectors and client registries don't change the output, so they are not part of the key
+    return llm_cache_key(name, args, {k: v for k, v in kwargs.items() if k != "baml_options"})
+
+
+class Fixtures:
+    """Recorded responses, loaded from / saved to a fixture file."""
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None):
+        data = data or {}
+        self.questions: List[Dict[str, Any]] = data.get("questions", [])
+        self.search: Dict[str, Any] = data.get("search", {})
+        self.prices: Dict[str, Any] = data.get("prices", {})
+        self.llm: Dict[str, Any] = data.get("llm", {})
+        self.meta: Dict[str, Any] = data.get("meta", {})
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str) -> "Fixtures":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def save(self, path: str):
+        data = {"meta": self.meta, "questions": self.questions, "search": self.search, "prices": self.prices, "llm": self.llm}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1, sort_keys=True)
+
+    def put(self, table: str, key: str, entry: Dict[str, Any]):
+        with self._lock:
+            getattr(self, table)[key] = entry
+
+    def get(self, table: str, key: str) -> Dict[str, Any]:
+        try:
+            return getattr(self, table)[key]
+        except KeyError:
+            raise FixtureMissError(f"No recorded {table} response for {key!r}; re-record the fixtures") from None
+
+
+class ReplayBamlClient:
+    """Stands in for a generated BAML client and returns the recorded output of each function call."""
+
+    def __init__(self, fixtures: Fixtures, latency_scale: float = 1.0, use_async: bool = False):
+        self.fixtures = fixtures
+        self.latency_scale = latency_scale
+        self.use_async = use_async
+
+    def with_options(self, *args, **kwargs) -> "ReplayBamlClient":
+        return self
+
+    def __getattr__(self, name: str):
+        if not name[:1].isupper():
+            raise AttributeError(name)
+
+        if self.use_async:
+            async def async_replay(*args, **kwargs):
+                entry = self.fixtures.get("llm", _llm_key(name, args, kwargs))
+                await asyncio.sleep(entry.get("seconds", 0.0) * self.latency_scale)
+                return _decode(entry["value"])
+            return async_replay
+
+        def replay(*args, **kwargs):
+            entry = self.fixtures.get("llm", _llm_key(name, args, kwargs))
+            time.sleep(entry.get("seconds", 0.0) * self.latency_scale)
+            return _decode(entry["value"])
+        return replay
+
+
+class RecordingBamlClient:
+    """Wraps a live BAML client and stores every function output (and its latency) in the fixtures."""
+
+    def __init__(self, client, fixtures: Fixtures):
+        self._client = client
+        self.fixtures = fixtures
+
+    def with_options(self, *args, **kwargs) -> "RecordingBamlClient":
+        return RecordingBamlClient(self._client.with_options(*args, **kwargs), self.fixtures)
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._client, name)
+        if not callable(attr) or not name[:1].isupper():
+            return attr
+
+        def record(*args, **kwargs):
+            started = time.perf_counter()
+            value = attr(*args, **kwargs)
+            self.fixtures.put("llm", _llm_key(name, args, kwargs), {
+                "function": name, "seconds": round(time.perf_counter() - started, 4), "value": _encode(value),
+            })
+            return value
+        return record
+
+
+def _replay_tools(fixtures: Fixtures, latency_scale: float) -> Dict[str, Any]:
+    """Replacements for the agent's tool functions that serve recorded responses."""
+
+    def web_search(query: str, max_results: int = 5, use_cache: bool = True):
+        record_tool_call("web_search")
+        entry = fixtures.get("search", tools._search_cache_key(query, max_results))
+        time.sleep(entry.get("seconds", 0.0) * latency_scale)
+        return [dict(res) for res in entry["value"]]
+
+    def get_current_prices(coin_names: List[str], use_cache: bool = True):
+        record_tool_call("price_lookup", len(coin_names))
+        entries = {name: fixtures.get("prices", name.lower()) for name in coin_names}
+        # The recorded lookups were batched, so the slowest recorded quote stands for the request
+        time.sleep(max((e.get("seconds", 0.0) for e in entries.values()), default=0.0) * latency_scale)
+        return {name: entry["value"] for name, entry in entries.items()}
+
+    async def aweb_search(query: str, max_results: int = 5, use_cache: bool = True):
+        record_tool_call("web_search")
+        entry = fixtures.get("search", tools._search_cache_key(query, max_results))
+        await asyncio.sleep(entry.get("seconds", 0.0) * latency_scale)
+        return [dict(res) for res in entry["value"]]
+
+    async def aget_current_prices(coin_names: List[str], use_cache: bool = True):
+        record_tool_call("price_lookup", len(coin_names))
+        entries = {name: fixtures.get("prices", name.lower()) for name in coin_names}
+        await asyncio.sleep(max((e.get("seconds", 0.0) for e in entries.values()), default=0.0) * latency_scale)
+        return {name: entry["value"] for name, entry in entries.items()}
+
+    return {"web_search": web_search, "get_current_prices": get_current_prices,
+            "aweb_search": aweb_search, "aget_current_prices": aget_current_prices}
+
+
+def _recording_tools(fixtures: Fixtures) -> Dict[str, Any]:
+    """Wrappers around the live tools that store their responses in the fixtures."""
+
+    def web_search(query: str, max_results: int = 5, use_cache: bool = True):
+        started = time.perf_counter()
+        results = tools.web_search(query, max_results, use_cache=False)
+        fixtures.put("search", tools._search_cache_key(query, max_results),
+                     {"seconds": round(time.perf_counter() - started, 4), "value": results})
+        return results
+
+    def get_current_prices(coin_names: List[str], use_cache: bool = True):
+        started = time.perf_counter()
+        prices = tools.get_current_prices(coin_names, use_cache=False)
+        seconds = round(time.perf_counter() - started, 4)
+        for name, price in prices.items():
+            fixtures.put("prices", name.lower(), {"seconds": seconds, "value": price})
+        return prices
+
+    return {"web_search": web_search, "get_current_prices": get_current_prices}
+
+
+@contextlib.contextmanager
+def _patched_agent(**replacements):
+    """Temporarily swap module-level clients/tools in agent.py; the LLM cache is bypassed meanwhile."""
+    originals = {name: getattr(agent, name) for name in replacements}
+    for name, value in replacements.items():
+        setattr(agent, name, value)
+    try:
+        yield
+    finally:
+        for name, value in originals.items():
+            setattr(agent, name, value)
+
+
+def replay_environment(fixtures: Fixtures, latency_scale: float = 1.0):
+    """Context manager that points the agent's BAML clients and tools at the recorded fixtures."""
+    return _patched_agent(
+        b=InstrumentedBamlClient(ReplayBamlClient(fixtures, latency_scale)),
+        async_b=InstrumentedBamlClient(ReplayBamlClient(fixtures, latency_scale, use_async=True)),
+        **_replay_tools(fixtures, latency_scale),
+    )
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Linearly interpolated percentile (q in 0-100) of the values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * q / 100
+    low, high = math.floor(pos), math.ceil(pos)
+    return ordered[low] + (ordered[high] - ordered[low]) * (pos - low)
+
+
+def _summary(values: List[float]) -> Dict[str, Any]:
+    summary: Dict[str, Any] = {"count": len(values)}
+    for q in PERCENTILES:
+        value = percentile(values, q)
+        summary[f"p{q}_ms"] = round(value * 1000, 2) if value is not None else None
+    summary["mean_ms"] = round(sum(values) / len(values) * 1000, 2) if values else None
+    return summary
+
+
+def _question_list(fixtures: Fixtures, count: int) -> List[Dict[str, Any]]:
+    if not fixtures.questions:
+        raise ValueError("The fixture file has no questions")
+    # Cycle through the recorded questions until there are count of them
+    return [fixtures.questions[i % len(fixtures.questions)] for i in range(count)]
+
+
+def run_benchmark(fixtures: Fixtures, questions: int = 20, concurrency: int = 4, use_async: bool = False,
+                  latency_scale: float = 1.0, max_attempt_count: int = 2, critique: str = "always",
+                  verbose: bool = False) -> Dict[str, Any]:
+    """Run questions through build_agent_graph against the fixtures and report latency percentiles.
+
+    Returns a report with end-to-end and per-node p50/p95/p99 (milliseconds), questions/sec and errors.
+    """
+    items = _question_list(fixtures, questions)
+    bench_agent = DeepResearchAgent(
+        build_agent_graph(use_async=use_async),
+        max_attempt_count=max_attempt_count,
+        critique_policy=CritiquePolicy(mode=critique),
+        print_metrics=False,
+    )
+    end_to_end: List[float] = []
+    node_seconds: Dict[str, List[float]] = {}
+    errors: List[str] = []
+    results_lock = threading.Lock()
+
+    def collect(started: float, spans: Optional[List[Dict[str, Any]]], error: Optional[BaseException]):
+        with results_lock:
+            if error is not None:
+                errors.append(f"{type(error).__name__}: {error}")
+                return
+            end_to_end.append(time.perf_counter() - started)
+            for span in spans:
+                node_seconds.setdefault(span["node"], []).append(span["seconds"])
+
+    def research(item: Dict[str, Any]):
+        started = time.perf_counter()
+        try:
+            _, spans = bench_agent.run_timed(item["question"], item.get("clarification"), interactive=False)
+        except Exception as e:
+            collect(started, None, e)
+        else:
+            collect(started, spans, None)
+
+    async def aresearch_all():
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def aresearch(item: Dict[str, Any]):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    _, spans = await bench_agent.arun_timed(item["question"], item.get("clarification"), interactive=False)
+                except Exception as e:
+                    collect(started, None, e)
+                else:
+                    collect(started, spans, None)
+
+        await asyncio.gather(*(aresearch(item) for item in items))
+
+    # The nodes print their progress; keep the benchmark output readable unless asked otherwise
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with replay_environment(fixtures, latency_scale), output:
+        wall_started = time.perf_counter()
+        if use_async:
+            asyncio.run(aresearch_all())
+        else:
+            with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+                list(pool.map(research, items))
+        wall_seconds = time.perf_counter() - wall_started
+
+    return {
+        "mode": "async" if use_async else "sync",
+        "questions": len(items),
+        "concurrency": concurrency,
+        "latency_scale": latency_scale,
+        "wall_seconds": round(wall_seconds, 3),
+        "questions_per_second": round(len(end_to_end) / wall_seconds, 3) if wall_seconds else None,
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "end_to_end": _summary(end_to_end),
+        "nodes": {node: _summary(values) for node, values in sorted(node_seconds.items())},
+    }
+
+
+def record_fixtures(questions: List[Dict[str, Any]], path: str, max_attempt_count: int = 2, critique: str = "always"):
+    """Run the questions once against the live services and save every response to a fixture file."""
+    fixtures = Fixtures({"questions": [{"question": q["question"], "clarification": q.get("clarification")}
+                                       for q in questions]})
+    live_client = agent.b._client  # below the LLM cache, so every call reaches the model and is recorded
+    with _patched_agent(b=RecordingBamlClient(live_client, fixtures), **_recording_tools(fixtures)):
+        recorder = DeepResearchAgent(build_agent_graph(), max_attempt_count=max_attempt_count,
+                                     critique_policy=CritiquePolicy(mode=critique), print_metrics=False)
+        for item in questions:
+            print(f"Recording: {item['question']}")
+            recorder.run_timed(item["question"], item.get("clarification"), interactive=False)
+    fixtures.save(path)
+    print(f"Saved {len(fixtures.llm)} LLM, {len(fixtures.search)} search and {len(fixtures.prices)} price responses to {path}")
+
+
+def compare_to_baseline(report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """Describe every p95 latency or throughput regression larger than max_regression (a fraction)."""
+    problems = []
+
+    def check_p95(label: str, current: Dict[str, Any], previous: Dict[str, Any]):
+        now, before = current.get("p95_ms"), previous.get("p95_ms")
+        if now is not None and before and now > before * (1 + max_regression):
+            problems.append(f"{label} p95 {before:.1f}ms -> {now:.1f}ms")
+
+    check_p95("end-to-end", report["end_to_end"], baseline.get("end_to_end", {}))
+    for node, summary in report["nodes"].items():
+        check_p95(f"node {node}", summary, baseline.get("nodes", {}).get(node, {}))
+    now, before = report.get("questions_per_second"), baseline.get("questions_per_second")
+    if now is not None and before and now < before * (1 - max_regression):
+        problems.append(f"throughput {before:.2f} -> {now:.2f} questions/sec")
+    return problems
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    header = f"{'stage':<22}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    rows = [header, "-" * len(header)]
+
+    def row(label: str, summary: Dict[str, Any]):
+        cells = [f"{summary[f'p{q}_ms']:>10.1f}" if summary[f"p{q}_ms"] is not None else f"{'-':>10}" for q in PERCENTILES]
+        rows.append(f"{label:<22}{summary['count']:>7}" + "".join(cells))
+
+    for node, summary in report["nodes"].items():
+        row(node, summary)
+    rows.append("-" * len(header))
+    row("END TO END", report["end_to_end"])
+    rows.append(
+        f"{report['questions']} questions ({report['mode']}, concurrency {report['concurrency']}) in "
+        f"{report['wall_seconds']:.2f}s: {report['questions_per_second']} questions/sec, {report['errors']} errors"
+    )
+    return "\n".join(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the research graph against recorded fixtures")
+    parser.add_argument("--fixtures", default="benchmarks/fixtures/synthetic.json", help="Fixture file to replay")
+    parser.add_argument("--questions", type=int, default=20, help="Number of questions to run (fixture questions are cycled)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Questions researched at the same time")
+    parser.add_argument("--use-async", action="store_true", help="Benchmark the async graph on one event loop")
+    parser.add_argument("--latency-scale", type=float, default=1.0,
+                        help="Multiplier for the recorded latencies (0 measures the graph's own overhead)")
+    parser.add_argument("--max-attempts", type=int, default=2, help="Maximum number of answer attempts")
+    parser.add_argument("--critique", choices=["always", "confidence", "never"], default="always",
+                        help="When to critique answers")
+    parser.add_argument("--json-out", type=str, help="Write the report to this JSON file")
+    parser.add_argument("--baseline", type=str, help="Report JSON from an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="Allowed p95/throughput regression against --baseline (fraction)")
+    parser.add_argument("--record", type=str,
+                        help="Record new fixtures to this file by running --input questions against the live services")
+    parser.add_argument("--input", type=str, help="JSONL or CSV file with the questions to record")
+    parser.add_argument("--verbose", action="store_true", help="Show the graph's progress output")
+    args = parser.parse_args()
+
+    if args.record:
+        if not args.input:
+            parser.error("--record requires --input")
+        record_fixtures(load_questions(args.input), args.record, args.max_attempts, args.critique)
+        sys.exit(0)
+
+    fixtures = Fixtures.load(args.fixtures)
+    if fixtures.meta.get("synthetic"):
+        print(f"Note: {args.fixtures} holds synthetic (hand-written) responses and latencies, "
+              "so these numbers only compare the graph's own overhead between revisions.")
+    bench_report = run_benchmark(
+        fixtures,
+        questions=args.questions,
+        concurrency=args.concurrency,
+        use_async=args.use_async,
+        latency_scale=args.latency_scale,
+        max_attempt_count=args.max_attempts,
+        critique=args.critique,
+        verbose=args.verbose,
+    )
+    print(format_report(bench_report))
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(bench_report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare_to_baseline(bench_report, json.load(f), args.max_regression)
+        for problem in regressions:
+            print(f"REGRESSION: {problem}")
+        if regressions:
+            sys.exit(1)
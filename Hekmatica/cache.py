@@ -0,0 +1,234 @@
+import asyncio
+import copy
+import functools
+import hashlib
+import json
+import logging
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from enum import Enum
+from typing import Any, Dict, Optional, Tuple
+
+from pydantic import BaseModel
+
+from metrics import record_cache
+
+logger = logging.getLogger("Cache")
+
+
+class MemoryCache:
+    """In-process LRU cache with per-entry TTL expiry and hit/miss counters."""
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = 3600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl  # default time-to-live in seconds (None means entries never expire)
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[Optional[float], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Return (found, value) for the key; expired entries count as misses and are dropped."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            # Evict the least recently used entries once the cache is full
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+class SQLiteCache:
+    """On-disk cache backed by a single SQLite file, so cached entries survive restarts.
+
+    Values are pickled, so anything the agent produces (dicts, BAML/Pydantic models) can be stored.
+    """
+
+    def __init__(self, path: str, ttl: Optional[float] = 3600.0, table: str = "cache"):
+        self.path = path
+        self.ttl = ttl
+        self.table = table
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, expires_at REAL, value BLOB)"
+            )
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT expires_at, value FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                expires_at, blob = row
+                if expires_at is None or expires_at > time.time():
+                    try:
+                        value = pickle.loads(blob)
+                    except Exception as e:
+                        logger.warning(f"Dropping unreadable cache entry {key!r}: {e}")
+                    else:
+                        self.hits += 1
+                        return True, value
+                with self._conn:
+                    self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self.misses += 1
+            return False, None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl is not None else None
+        blob = pickle.dumps(value)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, expires_at, value) VALUES (?, ?, ?)",
+                (key, expires_at, blob),
+            )
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {self.table}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+            return {"hits": self.hits, "misses": self.misses, "size": size}
+
+
+# Default time-to-live (seconds) per BAML function for CachedBamlClient.
+# Functions that only depend on the question are cached longer than ones that depend on fresh search results.
+DEFAULT_LLM_CACHE_TTLS: Dict[str, Optional[float]] = {
+    "ClarifyQuestion": 24 * 3600,
+    "GenerateSubqueries": 24 * 3600,
+    "PlanSteps": 24 * 3600,
+    "RankResults": 3600,
+    "AnswerQuestion": 3600,
+    "CritiqueAnswer": 3600,
+}
+
+
+def _canonicalize(value: Any) -> Any:
+    """Convert BAML/Pydantic arguments into plain JSON-compatible data with a stable ordering."""
+    if isinstance(value, BaseModel):
+        return _canonicalize(value.model_dump(mode="json"))
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, dict):
+        return {str(k): _canonicalize(v) for k, v in sorted(value.items(), key=lambda item: str(item[0]))}
+    if isinstance(value, (list, tuple)):
+        return [_canonicalize(v) for v in value]
+    return value
+
+
+def llm_cache_key(function_name: str, args: tuple, kwargs: dict) -> str:
+    """Content-addressed key for a BAML call: function name plus a digest of its canonicalized arguments."""
+    payload = json.dumps(
+        {"args": _canonicalize(list(args)), "kwargs": _canonicalize(kwargs)},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return f"{function_name}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+
+class CachedBamlClient:
+    """Wraps a generated BAML client (sync or async) and caches function results across questions.
+
+    Only functions listed in function_ttls are cached; use enable()/disable() to change that per function.
+    Calls that pass baml_options (collectors, client registries, ...) always go to the LLM.
+    """
+
+    def __init__(self, client, cache, function_ttls: Optional[Dict[str, Optional[float]]] = None):
+        self._client = client
+        self.cache = cache
+        self.function_ttls = dict(DEFAULT_LLM_CACHE_TTLS if function_ttls is None else function_ttls)
+        self.hits: Dict[str, int] = defaultdict(int)
+        self.misses: Dict[str, int] = defaultdict(int)
+
+    def enable(self, function_name: str, ttl: Optional[float] = None):
+        """Cache results of the given function (ttl=None uses the cache's default TTL)."""
+        self.function_ttls[function_name] = ttl
+
+    def disable(self, function_name: str):
+        self.function_ttls.pop(function_name, None)
+
+    def with_options(self, *args, **kwargs) -> "CachedBamlClient":
+        wrapped = CachedBamlClient(self._client.with_options(*args, **kwargs), self.cache)
+        # Share settings and counters with the parent client
+        wrapped.function_ttls, wrapped.hits, wrapped.misses = self.function_ttls, self.hits, self.misses
+        return wrapped
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        names = sorted(set(self.hits) | set(self.misses))
+        return {name: {"hits": self.hits[name], "misses": self.misses[name]} for name in names}
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._client, name)
+        if self.cache is None or name not in self.function_ttls or not callable(attr):
+            return attr
+
+        def lookup(args, kwargs):
+            if kwargs.get("baml_options"):
+                return None, False, None
+            key = llm_cache_key(name, args, kwargs)
+            hit, value = self.cache.get(key)
+            record_cache("llm", hit)
+            if hit:
+                self.hits[name] += 1
+                logger.info(f"LLM cache hit for {name}")
+                # Hand out a copy so callers can't mutate the cached response
+                return key, True, copy.deepcopy(value)
+            self.misses[name] += 1
+            return key, False, None
+
+        def store(key, value):
+            if key is not None:
+                self.cache.set(key, copy.deepcopy(value), ttl=self.function_ttls.get(name))
+
+        if asyncio.iscoroutinefunction(attr):
+            @functools.wraps(attr)
+            async def async_wrapper(*args, **kwargs):
+                key, hit, value = lookup(args, kwargs)
+                if hit:
+                    return value
+                value = await attr(*args, **kwargs)
+                store(key, value)
+                return value
+            return async_wrapper
+
+        @functools.wraps(attr)
+        def wrapper(*args, **kwargs):
+            key, hit, value = lookup(args, kwargs)
+            if hit:
+                return value
+            value = attr(*args, **kwargs)
+            store(key, value)
+            return value
+        return wrapper
@@ -0,0 +1,65 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from prefilter import NEAR_DUPLICATE_THRESHOLD, canonicalize_url, dedupe_results, jaccard, shingles
+
+# Incremental evidence store used by the answer/critique loop. Each item is a plain dict
+# {'content', 'link', 'score', 'attempt'} so it can live in AgentState (and in checkpoints):
+# score is the RankResults relevance score (0-10), attempt is the answer attempt that added it.
+
+EVIDENCE_TOP_K = 8  # maximum number of evidence items sent to AnswerQuestion
+NEW_EVIDENCE_PREFIX = "[New since the previous answer] "  # marks the delta in the answer context
+
+
+def evidence_from_ranked(ranked_items, attempt: int) -> List[Dict[str, Any]]:
+    """Turn RankResults output (RankedResultItem objects) into evidence items added in the given attempt."""
+    return [
+        {'content': item.content, 'link': item.link, 'score': item.relevance_score, 'attempt': attempt}
+        for item in ranked_items
+    ]
+
+
+def novel_results(evidence: List[Dict[str, Any]], candidates: List[Dict[str, Optional[str]]],
+                  threshold: float = NEAR_DUPLICATE_THRESHOLD) -> Tuple[List[Dict[str, Optional[str]]], int]:
+    """Keep only candidates that are not already in the evidence (same canonical URL or near-duplicate text).
+
+    Returns the new results and the number of candidates dropped as duplicates.
+    """
+    known_urls = {canonicalize_url(item.get('link')) for item in evidence if item.get('link')}
+    known_shingles = [shingles(item.get('content')) for item in evidence]
+    fresh = []
+    for res in dedupe_results(candidates, threshold):
+        url = canonicalize_url(res.get('link'))
+        if url is not None and url in known_urls:
+            continue
+        res_shingles = shingles(res.get('content'))
+        if any(jaccard(res_shingles, other) >= threshold for other in known_shingles):
+            continue
+        fresh.append(res)
+    return fresh, len(candidates) - len(fresh)
+
+
+def merge_evidence(evidence: List[Dict[str, Any]], new_items: List[Dict[str, Any]],
+                   top_k: int = EVIDENCE_TOP_K) -> List[Dict[str, Any]]:
+    """Merge newly ranked items into the evidence and keep the top_k by score.
+
+    Existing items win ties, so a new result only displaces evidence that scored strictly lower.
+    """
+    combined = list(evidence) + list(new_items)
+    order = sorted(range(len(combined)), key=lambda i: (-(combined[i].get('score') or 0), i))
+    return [combined[i] for i in order[:top_k]]
+
+
+def evidence_results(evidence: List[Dict[str, Any]]) -> List[Dict[str, Optional[str]]]:
+    """The evidence as plain {'content', 'link'} results (the shape of AgentState.relevant_results)."""
+    return [{'content': item.get('content'), 'link': item.get('link')} for item in evidence]
+
+
+def answer_context(evidence: List[Dict[str, Any]], attempt: int) -> List[Dict[str, Optional[str]]]:
+    """Results for the AnswerQuestion context; on a retry, items found for this attempt are marked as new."""
+    results = []
+    for item in evidence:
+        content = item.get('content') or ''
+        if attempt > 1 and item.get('attempt') == attempt:
+            content = NEW_EVIDENCE_PREFIX + content
+        results.append({'content': content, 'link': item.get('link')})
+    return results
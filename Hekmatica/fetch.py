@@ -0,0 +1,176 @@
+import contextvars
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+
+from cache import SQLiteCache
+from metrics import record_cache, record_tool_call
+from prefilter import bm25_scores, tokenize
+from tools import get_http_session
+
+# Optional stage that downloads the pages behind the top-ranked results and adds their most relevant
+# passages to the answer context, so answers are not limited to ~200 character search snippets.
+
+logger = logging.getLogger("FetchTool")
+
+FETCH_TOP_N = 5  # number of ranked results whose pages are fetched
+FETCH_MAX_WORKERS = 5
+FETCH_TIMEOUT = 10  # seconds per page
+MAX_PAGE_BYTES = 2_000_000  # stop reading a response after this many bytes
+CHUNK_WORDS = 150  # words per chunk
+CHUNK_OVERLAP = 30  # words shared between consecutive chunks
+CHUNKS_PER_PAGE = 2  # best chunks added to each result
+MAX_ADDED_CHARS = 2500  # cap on page text added to a single result
+
+PAGE_CACHE_PATH = ".hekmatica_page_cache.sqlite"
+PAGE_CACHE_TTL = 24 * 3600  # seconds
+
+_NOT_CREATED = object()
+page_cache = _NOT_CREATED  # created on first use; replace with set_page_cache()
+
+
+def set_page_cache(cache):
+    """Replace the cache for extracted page text (any object with get/set, or None to disable caching)."""
+    global page_cache
+    page_cache = cache
+
+
+def _get_page_cache():
+    """The page cache, or None when caching was disabled with set_page_cache(None)."""
+    global page_cache
+    if page_cache is _NOT_CREATED:
+        page_cache = SQLiteCache(PAGE_CACHE_PATH, ttl=PAGE_CACHE_TTL, table="pages")
+    return page_cache
+
+
+class _TextExtractor(HTMLParser):
+    """Collect visible text from HTML, skipping scripts, styles and page chrome."""
+
+    SKIP_TAGS = {"script", "style", "noscript", "nav", "header", "footer", "aside", "form", "svg", "template"}
+    BLOCK_TAGS = {"p", "div", "br", "li", "h1", "h2", "h3", "h4", "h5", "h6", "tr", "section", "article"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+
+def html_to_text(html: str) -> str:
+    extractor = _TextExtractor()
+    try:
+        extractor.feed(html)
+        extractor.close()
+    except Exception as e:
+        logger.warning(f"HTML parsing stopped early: {e}")
+    text = "".join(extractor.parts)
+    # Collapse runs of whitespace while keeping paragraph breaks
+    lines = (re.sub(r"[ \t\r\f\v]+", " ", line).strip() for line in text.split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def fetch_page_text(url: str) -> Optional[str]:
+    """Download a page (up to MAX_PAGE_BYTES) and return its visible text, using the page cache when possible."""
+    record_tool_call("fetch_page")
+    cache = _get_page_cache()
+    if cache is not None:
+        hit, cached = cache.get(url)
+        record_cache("page", hit)
+        if hit:
+            return cached
+
+    try:
+        with get_http_session().get(url, timeout=FETCH_TIMEOUT, stream=True,
+                                    headers={"User-Agent": "Mozilla/5.0 (compatible; Hekmatica/0.1)"}) as resp:
+            resp.raise_for_status()
+            content_type = resp.headers.get("Content-Type", "")
+            if "html" not in content_type and "text/plain" not in content_type:
+                logger.info(f"Skipping non-text page {url} ({content_type})")
+                return None
+            body = b""
+            for block in resp.iter_content(chunk_size=65536):
+                body += block
+                if len(body) >= MAX_PAGE_BYTES:
+                    break
+            encoding = resp.encoding or "utf-8"
+    except Exception as e:
+        logger.error(f"Fetching {url} failed: {e}")
+        return None
+
+    raw = body[:MAX_PAGE_BYTES].decode(encoding, errors="replace")
+    text = html_to_text(raw) if "html" in content_type else raw
+    if cache is not None and text:
+        cache.set(url, text)
+    return text
+
+
+def fetch_pages(urls: List[str], max_workers: int = FETCH_MAX_WORKERS) -> Dict[str, str]:
+    """Fetch several pages concurrently; returns url -> text for the pages that could be read."""
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(urls)))) as pool:
+        texts = list(pool.map(lambda url: contextvars.copy_context().run(fetch_page_text, url), urls))
+    return {url: text for url, text in zip(urls, texts) if text}
+
+
+def chunk_text(text: str, size: int = CHUNK_WORDS, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    words = text.split()
+    if not words:
+        return []
+    step = max(1, size - overlap)
+    return [" ".join(words[i:i + size]) for i in range(0, max(1, len(words) - overlap), step)]
+
+
+def select_chunks(pages: Dict[str, str], question: str, subqueries: List[str],
+                  chunks_per_page: int = CHUNKS_PER_PAGE) -> Dict[str, List[str]]:
+    """Pick the chunks of each page that best match the question and subqueries (BM25 over all chunks)."""
+    candidates = [(url, chunk) for url, text in pages.items() for chunk in chunk_text(text)]
+    if not candidates:
+        return {}
+    query_terms = tokenize(" ".join([question] + list(subqueries)))
+    scores = bm25_scores([tokenize(chunk) for _, chunk in candidates], query_terms)
+
+    selected: Dict[str, List[str]] = {}
+    for i in sorted(range(len(candidates)), key=lambda i: (-scores[i], i)):
+        url, chunk = candidates[i]
+        if scores[i] <= 0 or len(selected.setdefault(url, [])) >= chunks_per_page:
+            continue
+        selected[url].append(chunk)
+    return selected
+
+
+def enrich_results(results: List[Dict[str, Optional[str]]], question: str, subqueries: List[str],
+                   top_n: int = FETCH_TOP_N) -> List[Dict[str, Optional[str]]]:
+    """Return a copy of results where the top_n linked results carry relevant page passages after their snippet.
+
+    Results keep their order and links, so citations in the answer still refer to the same sources.
+    """
+    urls = [res['link'] for res in results[:top_n] if res.get('link')]
+    selected = select_chunks(fetch_pages(urls), question, subqueries)
+
+    enriched = []
+    for res in results:
+        chunks = selected.get(res.get('link')) if res.get('link') else None
+        if chunks:
+            extra = "\n...\n".join(chunks)[:MAX_ADDED_CHARS]
+            res = {**res, 'content': f"{res.get('content') or ''}\nPage excerpt: {extra}"}
+        enriched.append(res)
+    return enriched
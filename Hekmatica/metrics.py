@@ -0,0 +1,344 @@
+import asyncio
+import contextvars
+import functools
+import inspect
+import json
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+import baml_py
+
+# In-process metrics for the research graph: per-node wall time, BAML token usage, tool calls and cache events.
+# Node and run context travel through contextvars, so worker threads started with a copied context
+# (asyncio.to_thread, contextvars.copy_context().run) attribute their events to the right node.
+
+_current_run: contextvars.ContextVar[Optional["RunMetrics"]] = contextvars.ContextVar("hekmatica_run", default=None)
+_current_node: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("hekmatica_node", default=None)
+_current_span: contextvars.ContextVar[Optional["NodeSpan"]] = contextvars.ContextVar("hekmatica_span", default=None)
+
+MAX_RECENT_RUNS = 100  # number of finished runs kept for the JSON export
+
+COUNTER_HELP = {
+    "hekmatica_node_runs_total": "Number of times each graph node ran",
+    "hekmatica_node_seconds_total": "Wall-clock seconds spent in each graph node",
+    "hekmatica_llm_calls_total": "BAML function calls that reached an LLM",
+    "hekmatica_llm_seconds_total": "Wall-clock seconds spent in BAML function calls",
+    "hekmatica_llm_tokens_total": "LLM tokens used by BAML function calls",
+    "hekmatica_tool_calls_total": "Tool invocations (web search, price lookup, ...)",
+    "hekmatica_cache_events_total": "Cache lookups by cache and result (hit/miss)",
+    "hekmatica_runs_total": "Research runs started",
+    "hekmatica_server_rejected_total": "Requests the HTTP server turned away because its queue was full",
+}
+
+
+class NodeSpan:
+    """Everything recorded while one node execution was running."""
+
+    def __init__(self, node: str):
+        self.node = node
+        self.seconds = 0.0
+        self.llm_calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.tool_calls: Dict[str, int] = defaultdict(int)
+        self.cache_hits: Dict[str, int] = defaultdict(int)
+        self.cache_misses: Dict[str, int] = defaultdict(int)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "node": self.node,
+            "seconds": round(self.seconds, 3),
+            "llm_calls": self.llm_calls,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "tool_calls": dict(self.tool_calls),
+            "cache_hits": dict(self.cache_hits),
+            "cache_misses": dict(self.cache_misses),
+        }
+
+
+class RunMetrics:
+    """Metrics for a single research question, with one NodeSpan per node execution in run order."""
+
+    def __init__(self, question: str):
+        self.run_id = uuid.uuid4().hex
+        self.question = question
+        self.started_at = time.time()
+        self.seconds = 0.0
+        self.spans: List[NodeSpan] = []
+        self._lock = threading.Lock()
+
+    def open_span(self, node: str) -> NodeSpan:
+        span = NodeSpan(node)
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    def by_node(self) -> Dict[str, Dict[str, Any]]:
+        """Aggregate spans per node name (a node can run more than once, e.g. generate_answer)."""
+        totals: Dict[str, Dict[str, Any]] = {}
+        for span in self.spans:
+            t = totals.setdefault(span.node, {
+                "calls": 0, "seconds": 0.0, "llm_calls": 0, "input_tokens": 0,
+                "output_tokens": 0, "tool_calls": 0, "cache_hits": 0,
+            })
+            t["calls"] += 1
+            t["seconds"] += span.seconds
+            t["llm_calls"] += span.llm_calls
+            t["input_tokens"] += span.input_tokens
+            t["output_tokens"] += span.output_tokens
+            t["tool_calls"] += sum(span.tool_calls.values())
+            t["cache_hits"] += sum(span.cache_hits.values())
+        return totals
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "run_id": self.run_id,
+            "question": self.question,
+            "started_at": self.started_at,
+            "seconds": round(self.seconds, 3),
+            "spans": [span.to_dict() for span in self.spans],
+        }
+
+
+class MetricsRegistry:
+    """Process-wide cumulative counters plus the most recent runs, exportable as Prometheus text or JSON."""
+
+    def __init__(self, max_recent_runs: int = MAX_RECENT_RUNS):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Tuple[Tuple[str, str], ...], float]] = defaultdict(lambda: defaultdict(float))
+        self.recent_runs: deque = deque(maxlen=max_recent_runs)
+
+    def inc(self, name: str, value: float = 1.0, **labels: str):
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            self._counters[name][key] += value
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self.recent_runs.clear()
+
+    @contextmanager
+    def run(self, question: str):
+        """Collect metrics for everything executed inside the block as one run."""
+        run = RunMetrics(question)
+        self.inc("hekmatica_runs_total")
+        token = _current_run.set(run)
+        start = time.perf_counter()
+        try:
+            yield run
+        finally:
+            run.seconds = time.perf_counter() - start
+            _current_run.reset(token)
+            with self._lock:
+                self.recent_runs.append(run)
+
+    def export_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for name in sorted(self._counters):
+                lines.append(f"# HELP {name} {COUNTER_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in sorted(self._counters[name].items()):
+                    label_str = ",".join(f'{k}="{_escape_label(v)}"' for k, v in labels)
+                    lines.append(f"{name}{{{label_str}}} {value:g}" if label_str else f"{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def export_json(self) -> str:
+        with self._lock:
+            counters = {
+                name: [{"labels": dict(labels), "value": value} for labels, value in sorted(series.items())]
+                for name, series in sorted(self._counters.items())
+            }
+            runs = [run.to_dict() for run in self.recent_runs]
+        return json.dumps({"counters": counters, "runs": runs}, indent=2)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = MetricsRegistry()
+
+
+def record_llm_call(function_name: str, seconds: float, input_tokens: Optional[int], output_tokens: Optional[int]):
+    node = _current_node.get() or "none"
+    registry.inc("hekmatica_llm_calls_total", node=node, function=function_name)
+    registry.inc("hekmatica_llm_seconds_total", seconds, node=node, function=function_name)
+    registry.inc("hekmatica_llm_tokens_total", input_tokens or 0, node=node, function=function_name, direction="input")
+    registry.inc("hekmatica_llm_tokens_total", output_tokens or 0, node=node, function=function_name, direction="output")
+    span = _current_span.get()
+    if span is not None:
+        span.llm_calls += 1
+        span.input_tokens += input_tokens or 0
+        span.output_tokens += output_tokens or 0
+
+
+def record_tool_call(tool: str, count: int = 1):
+    registry.inc("hekmatica_tool_calls_total", count, node=_current_node.get() or "none", tool=tool)
+    span = _current_span.get()
+    if span is not None:
+        span.tool_calls[tool] += count
+
+
+def record_cache(cache: str, hit: bool):
+    result = "hit" if hit else "miss"
+    registry.inc("hekmatica_cache_events_total", node=_current_node.get() or "none", cache=cache, result=result)
+    span = _current_span.get()
+    if span is not None:
+        (span.cache_hits if hit else span.cache_misses)[cache] += 1
+
+
+def instrument_node(name: str, func):
+    """Wrap a graph node (sync or async) so its wall time and the events inside it are recorded under name."""
+
+    def start():
+        run = _current_run.get()
+        span = run.open_span(name) if run is not None else NodeSpan(name)
+        return span, _current_node.set(name), _current_span.set(span), time.perf_counter()
+
+    def finish(span, node_token, span_token, started):
+        span.seconds = time.perf_counter() - started
+        _current_span.reset(span_token)
+        _current_node.reset(node_token)
+        registry.inc("hekmatica_node_runs_total", node=name)
+        registry.inc("hekmatica_node_seconds_total", span.seconds, node=name)
+
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            span, *tokens = start()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                finish(span, *tokens)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        span, *tokens = start()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            finish(span, *tokens)
+    return wrapper
+
+
+def _with_collector(kwargs: Dict[str, Any], collector) -> Dict[str, Any]:
+    """Return kwargs with the collector added to baml_options, keeping any collectors the caller passed."""
+    options = dict(kwargs.get("baml_options") or {})
+    existing = options.get("collector")
+    existing = existing if isinstance(existing, list) else [existing] if existing is not None else []
+    options["collector"] = existing + [collector]
+    return {**kwargs, "baml_options": options}
+
+
+def _record_collector(function_name: str, collector, started: float):
+    usage = collector.usage
+    record_llm_call(function_name, time.perf_counter() - started, usage.input_tokens, usage.output_tokens)
+
+
+class InstrumentedBamlClient:
+    """Wraps a generated BAML client (sync or async) and records call time and token usage per function."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def with_options(self, *args, **kwargs) -> "InstrumentedBamlClient":
+        return InstrumentedBamlClient(self._client.with_options(*args, **kwargs))
+
+    @property
+    def stream(self) -> "_InstrumentedStreamClient":
+        return _InstrumentedStreamClient(self._client.stream)
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._client, name)
+        if not callable(attr) or not name[:1].isupper():
+            return attr  # only BAML functions (PascalCase) are instrumented
+
+        if asyncio.iscoroutinefunction(attr):
+            @functools.wraps(attr)
+            async def async_wrapper(*args, **kwargs):
+                collector, started = baml_py.baml_py.Collector(name=name), time.perf_counter()
+                try:
+                    return await attr(*args, **_with_collector(kwargs, collector))
+                finally:
+                    _record_collector(name, collector, started)
+            return async_wrapper
+
+        @functools.wraps(attr)
+        def wrapper(*args, **kwargs):
+            collector, started = baml_py.baml_py.Collector(name=name), time.perf_counter()
+            try:
+                return attr(*args, **_with_collector(kwargs, collector))
+            finally:
+                _record_collector(name, collector, started)
+        return wrapper
+
+
+class _InstrumentedStreamClient:
+    def __init__(self, stream_client):
+        self._stream_client = stream_client
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._stream_client, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def wrapper(*args, **kwargs):
+            collector, started = baml_py.baml_py.Collector(name=name), time.perf_counter()
+            stream = attr(*args, **_with_collector(kwargs, collector))
+            return _RecordingStream(stream, lambda: _record_collector(name, collector, started))
+        return wrapper
+
+
+class _RecordingStream:
+    """Proxy for a BAML stream that records usage once the final response has been produced."""
+
+    def __init__(self, stream, on_done):
+        self._stream = stream
+        self._on_done = on_done
+
+    def __iter__(self):
+        return iter(self._stream)
+
+    def __aiter__(self):
+        return self._stream.__aiter__()
+
+    def get_final_response(self):
+        result = self._stream.get_final_response()
+        if inspect.isawaitable(result):
+            async def finish():
+                try:
+                    return await result
+                finally:
+                    self._on_done()
+            return finish()
+        self._on_done()
+        return result
+
+
+def format_summary(run: RunMetrics) -> str:
+    """Render a per-node summary table for one run."""
+    header = f"{'Node':<20} {'Calls':>5} {'Wall (s)':>9} {'LLM':>4} {'Tok in':>7} {'Tok out':>7} {'Tools':>5} {'Cache hits':>10}"
+    lines = [header, "-" * len(header)]
+    totals = {"calls": 0, "seconds": 0.0, "llm_calls": 0, "input_tokens": 0, "output_tokens": 0, "tool_calls": 0, "cache_hits": 0}
+    for node, t in run.by_node().items():
+        lines.append(
+            f"{node:<20} {t['calls']:>5} {t['seconds']:>9.2f} {t['llm_calls']:>4} {t['input_tokens']:>7} "
+            f"{t['output_tokens']:>7} {t['tool_calls']:>5} {t['cache_hits']:>10}"
+        )
+        for key in totals:
+            totals[key] += t[key]
+    lines.append("-" * len(header))
+    lines.append(
+        f"{'TOTAL':<20} {totals['calls']:>5} {run.seconds:>9.2f} {totals['llm_calls']:>4} {totals['input_tokens']:>7} "
+        f"{totals['output_tokens']:>7} {totals['tool_calls']:>5} {totals['cache_hits']:>10}"
+    )
+    return "\n".join(lines)
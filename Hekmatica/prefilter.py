@@ -0,0 +1,137 @@
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Deterministic filtering applied to raw results before they are sent to the RankResults LLM call
+
+PREFILTER_TOP_N = 12  # maximum number of results passed on to RankResults
+NEAR_DUPLICATE_THRESHOLD = 0.8  # Jaccard similarity of snippet shingles above which two results are duplicates
+SHINGLE_SIZE = 3  # number of words per shingle
+CHARS_PER_TOKEN = 4  # rough estimate used for the token savings metric
+
+# Query parameters that only track the visit and don't change the page
+TRACKING_PARAMS = {"fbclid", "gclid", "yclid", "mc_cid", "mc_eid", "ref", "ref_src"}
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def canonicalize_url(url: Optional[str]) -> Optional[str]:
+    """Normalize a URL so trivially different links to the same page compare equal."""
+    if not url:
+        return None
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    )
+    path = parts.path.rstrip("/") or "/"
+    # Treat http and https as the same page and drop the fragment
+    return urlunsplit(("", host, path, urlencode(query), ""))
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+def shingles(text: Optional[str], size: int = SHINGLE_SIZE) -> set:
+    words = tokenize(text)
+    if len(words) <= size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def dedupe_results(results: List[Dict[str, Optional[str]]], threshold: float = NEAR_DUPLICATE_THRESHOLD) -> List[Dict[str, Optional[str]]]:
+    """Drop results whose canonical URL was already seen or whose snippet nearly duplicates an earlier one.
+
+    The first occurrence is kept, so the original plan ordering decides which copy survives.
+    """
+    kept: List[Dict[str, Optional[str]]] = []
+    kept_shingles: List[set] = []
+    seen_urls = set()
+    for res in results:
+        url = canonicalize_url(res.get('link'))
+        if url is not None and url in seen_urls:
+            continue
+        res_shingles = shingles(res.get('content'))
+        if any(jaccard(res_shingles, other) >= threshold for other in kept_shingles):
+            continue
+        if url is not None:
+            seen_urls.add(url)
+        kept.append(res)
+        kept_shingles.append(res_shingles)
+    return kept
+
+
+def bm25_scores(documents: List[List[str]], query_terms: List[str], k1: float = 1.5, b: float = 0.75) -> List[float]:
+    """Score tokenized documents against the query terms with Okapi BM25."""
+    n_docs = len(documents)
+    if n_docs == 0:
+        return []
+    avg_len = sum(len(doc) for doc in documents) / n_docs or 1.0
+    doc_freq = Counter(term for doc in documents for term in set(doc))
+    query_counts = Counter(query_terms)
+
+    scores = []
+    for doc in documents:
+        term_freq = Counter(doc)
+        score = 0.0
+        for term, q_count in query_counts.items():
+            tf = term_freq.get(term, 0)
+            if not tf:
+                continue
+            idf = math.log((n_docs - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5) + 1.0)
+            score += q_count * idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(doc) / avg_len))
+        scores.append(score)
+    return scores
+
+
+def estimate_tokens(results: List[Dict[str, Optional[str]]]) -> int:
+    """Rough token count of the results as they appear in the RankResults prompt."""
+    chars = sum(len(res.get('content') or '') + len(res.get('link') or '') + 30 for res in results)
+    return chars // CHARS_PER_TOKEN
+
+
+def prefilter_results(
+    results: List[Dict[str, Optional[str]]],
+    question: str,
+    subqueries: List[str],
+    top_n: int = PREFILTER_TOP_N,
+) -> Tuple[List[Dict[str, Optional[str]]], Dict[str, Any]]:
+    """Deduplicate results and keep the top_n by BM25 score against the question and subqueries.
+
+    Returns the kept results (in their original order) and a dict of metrics about what was removed.
+    """
+    unique = dedupe_results(results)
+    if len(unique) > top_n:
+        query_terms = tokenize(" ".join([question] + list(subqueries)))
+        scores = bm25_scores([tokenize(res.get('content')) for res in unique], query_terms)
+        # Stable ordering: highest score first, earlier results win ties
+        ranked = sorted(range(len(unique)), key=lambda i: (-scores[i], i))
+        keep = set(ranked[:top_n])
+        kept = [res for i, res in enumerate(unique) if i in keep]
+    else:
+        kept = unique
+
+    tokens_before = estimate_tokens(results)
+    tokens_after = estimate_tokens(kept)
+    stats = {
+        "input_results": len(results),
+        "duplicates_removed": len(results) - len(unique),
+        "lexically_dropped": len(unique) - len(kept),
+        "kept_results": len(kept),
+        "estimated_tokens_before": tokens_before,
+        "estimated_tokens_after": tokens_after,
+        "estimated_tokens_saved": tokens_before - tokens_after,
+    }
+    return kept, stats
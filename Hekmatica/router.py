@@ -0,0 +1,396 @@
+import asyncio
+import contextvars
+import functools
+import json
+import logging
+import math
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Dict, List, Optional, Tuple
+
+import baml_py
+
+from metrics import _with_collector
+
+# Runtime routing of BAML function calls across the clients defined in baml_src/clients.baml.
+# Each call goes to the client with the best observed latency/error/cost score (via a ClientRegistry
+# whose primary is that client); slow calls are hedged with a backup client after a latency budget.
+
+logger = logging.getLogger("LLMRouter")
+
+# Clients a function may be routed to when no per-function route is configured.
+# The first entry is the static default and is used until the others have been observed.
+DEFAULT_ROUTE_CLIENTS = ["CustomGPT4oMini", "CustomHaiku", "Gemini2FlashClient"]
+
+# USD per million (input, output) tokens, used to estimate the cost of each call
+CLIENT_PRICES: Dict[str, Tuple[float, float]] = {
+    "CustomGPT4o": (2.50, 10.00),
+    "CustomGPT4oMini": (0.15, 0.60),
+    "CustomSonnet": (3.00, 15.00),
+    "CustomHaiku": (0.25, 1.25),
+    "Gemini2FlashClient": (0.10, 0.40),
+}
+
+STATS_WINDOW = 50  # most recent calls per client used for the latency percentiles and error rate
+MIN_SAMPLES = 3  # calls a client needs before its statistics are trusted
+MAX_DECISIONS = 1000  # routing decisions kept for inspection
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+class ClientStats:
+    """Rolling latency, error and cost statistics for one client (or one function/client pair)."""
+
+    def __init__(self, window: int = STATS_WINDOW):
+        self.latencies: "deque[float]" = deque(maxlen=window)  # seconds, successful calls only
+        self.outcomes: "deque[bool]" = deque(maxlen=window)  # True for success
+        self.costs: "deque[float]" = deque(maxlen=window)  # estimated USD per successful call
+
+    def record(self, seconds: float, ok: bool, cost: Optional[float] = None):
+        self.outcomes.append(ok)
+        if ok:
+            self.latencies.append(seconds)
+            if cost is not None:
+                self.costs.append(cost)
+
+    @property
+    def samples(self) -> int:
+        return len(self.outcomes)
+
+    @property
+    def p50(self) -> Optional[float]:
+        return _percentile(list(self.latencies), 0.50)
+
+    @property
+    def p95(self) -> Optional[float]:
+        return _percentile(list(self.latencies), 0.95)
+
+    @property
+    def error_rate(self) -> float:
+        return (self.outcomes.count(False) / len(self.outcomes)) if self.outcomes else 0.0
+
+    @property
+    def avg_cost(self) -> float:
+        return sum(self.costs) / len(self.costs) if self.costs else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "samples": self.samples,
+            "p50_ms": round(self.p50 * 1000, 1) if self.p50 is not None else None,
+            "p95_ms": round(self.p95 * 1000, 1) if self.p95 is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "avg_cost_usd": round(self.avg_cost, 6),
+        }
+
+
+def estimate_cost(client: str, input_tokens: Optional[int], output_tokens: Optional[int]) -> Optional[float]:
+    prices = CLIENT_PRICES.get(client)
+    if prices is None:
+        return None
+    return ((input_tokens or 0) * prices[0] + (output_tokens or 0) * prices[1]) / 1_000_000
+
+
+class LLMRouter:
+    """Chooses a client per BAML function call and keeps the statistics and decision log behind the choice.
+
+    score = latency_weight * p95_seconds / (1 - error_rate) + cost_weight * avg_cost_usd * 1000 + error_weight * error_rate
+    (lower is better). Dividing by the success rate charges failures the retries they cause, and a client whose
+    recent calls all failed scores infinity, so it is tried last. Clients with fewer than MIN_SAMPLES calls for a function are only chosen when
+    exploring (probability explore_rate), so traffic stays on the static default until there is data.
+
+    Hedging: if the chosen client hasn't answered after hedge_after seconds (or, when hedge_after is None,
+    after its observed p95 latency), the same call is sent to the next-best client and the first
+    successful response wins. A failed call also falls over to the next client.
+    """
+
+    def __init__(
+        self,
+        routes: Optional[Dict[str, List[str]]] = None,
+        default_clients: Optional[List[str]] = None,
+        latency_weight: float = 1.0,
+        cost_weight: float = 1.0,
+        error_weight: float = 10.0,
+        explore_rate: float = 0.05,
+        hedge: bool = True,
+        hedge_after: Optional[float] = None,
+        enabled: bool = False,
+    ):
+        self.routes = dict(routes or {})  # function name -> candidate clients in order of preference
+        self.default_clients = list(default_clients or DEFAULT_ROUTE_CLIENTS)
+        self.latency_weight = latency_weight
+        self.cost_weight = cost_weight
+        self.error_weight = error_weight
+        self.explore_rate = explore_rate
+        self.hedge = hedge
+        self.hedge_after = hedge_after
+        self.enabled = enabled  # when False, calls go to each function's static client untouched
+        self._stats: Dict[Tuple[str, str], ClientStats] = {}
+        self._decisions: "deque[Dict[str, Any]]" = deque(maxlen=MAX_DECISIONS)
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def stats(self, function_name: str, client: str) -> ClientStats:
+        with self._lock:
+            return self._stats.setdefault((function_name, client), ClientStats())
+
+    def record(self, function_name: str, client: str, seconds: float, ok: bool, cost: Optional[float] = None):
+        stats = self.stats(function_name, client)
+        with self._lock:
+            stats.record(seconds, ok, cost)
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Current statistics as {function: {client: {...}}}."""
+        with self._lock:
+            result: Dict[str, Dict[str, Dict[str, Any]]] = {}
+            for (function_name, client), stats in sorted(self._stats.items()):
+                result.setdefault(function_name, {})[client] = stats.to_dict()
+            return result
+
+    def candidates(self, function_name: str) -> List[str]:
+        return list(self.routes.get(function_name) or self.default_clients)
+
+    def score(self, function_name: str, client: str) -> Optional[float]:
+        """Routing score of a client for a function, or None if there is not enough data yet."""
+        stats = self.stats(function_name, client)
+        with self._lock:
+            if stats.samples < MIN_SAMPLES:
+                return None
+            error_rate = stats.error_rate
+            if error_rate >= 1.0 or stats.p95 is None:
+                # No successful call in the window: there is no latency to rank it by, only failures
+                return math.inf
+            # Expected time until a successful response, counting a failed attempt as another try
+            latency = stats.p95 / (1.0 - error_rate)
+            return (self.latency_weight * latency
+                    + self.cost_weight * stats.avg_cost * 1000
+                    + self.error_weight * error_rate)
+
+    def rank(self, function_name: str) -> Tuple[List[str], Dict[str, Optional[float]], bool]:
+        """Return (clients in the order they should be tried, their scores, whether this call explores)."""
+        candidates = self.candidates(function_name)
+        scores = {client: self.score(function_name, client) for client in candidates}
+        unknown = [c for c in candidates if scores[c] is None]
+        known = sorted((c for c in candidates if scores[c] is not None), key=lambda c: scores[c])
+        if unknown and (not known or random.random() < self.explore_rate):
+            # Explore: try a client without enough data first (the static default when nothing is known)
+            first = unknown[0] if not known else random.choice(unknown)
+            return [first] + [c for c in known + unknown if c != first], scores, bool(known)
+        return known + unknown, scores, False
+
+    def hedge_budget(self, function_name: str, client: str) -> Optional[float]:
+        """Seconds to wait for the client before hedging, or None to never hedge."""
+        if not self.hedge:
+            return None
+        if self.hedge_after is not None:
+            return self.hedge_after
+        stats = self.stats(function_name, client)
+        with self._lock:
+            return stats.p95 if stats.samples >= MIN_SAMPLES else None
+
+    def log_decision(self, decision: Dict[str, Any]):
+        with self._lock:
+            self._decisions.append(decision)
+        logger.info(
+            f"{decision['function']}: routed to {decision['chosen']}, won by {decision.get('winner')} "
+            f"in {decision.get('latency_ms')}ms{' (hedged)' if decision.get('hedged') else ''}"
+        )
+
+    def decisions(self) -> List[Dict[str, Any]]:
+        """Routing decisions in the order they were made (the most recent MAX_DECISIONS)."""
+        with self._lock:
+            return list(self._decisions)
+
+    def export_decisions(self, path: str):
+        """Write the decision log as JSONL for offline tuning."""
+        with open(path, "w", encoding="utf-8") as f:
+            for decision in self.decisions():
+                f.write(json.dumps(decision, ensure_ascii=False) + "\n")
+
+    def executor(self) -> ThreadPoolExecutor:
+        # Shared pool for sync calls, so a hedged request can run next to the one it backs up
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-router")
+            return self._executor
+
+
+def _registry_for(client: str) -> "baml_py.ClientRegistry":
+    registry = baml_py.ClientRegistry()
+    registry.set_primary(client)  # any client declared in baml_src/clients.baml
+    return registry
+
+
+class RoutedBamlClient:
+    """Wraps a generated BAML client (sync or async) and sends each function call to the router's choice.
+
+    Streaming calls (the .stream namespace) are not routed and use each function's static client.
+    """
+
+    def __init__(self, client, router: LLMRouter):
+        self._client = client
+        self.router = router
+
+    def with_options(self, *args, **kwargs) -> "RoutedBamlClient":
+        return RoutedBamlClient(self._client.with_options(*args, **kwargs), self.router)
+
+    def _routed_kwargs(self, kwargs: Dict[str, Any], client: str, collector) -> Dict[str, Any]:
+        kwargs = _with_collector(kwargs, collector)
+        kwargs["baml_options"]["client_registry"] = _registry_for(client)
+        return kwargs
+
+    def _finish_attempt(self, name: str, client: str, collector, started: float, ok: bool) -> float:
+        seconds = time.perf_counter() - started
+        usage = collector.usage if ok else None
+        cost = estimate_cost(client, usage.input_tokens, usage.output_tokens) if usage else None
+        self.router.record(name, client, seconds, ok, cost)
+        return seconds
+
+    def _new_decision(self, name: str) -> Tuple[List[str], Dict[str, Any]]:
+        order, scores, explored = self.router.rank(name)
+        decision = {
+            "time": time.time(),
+            "function": name,
+            "chosen": order[0],
+            # Infinite scores (nothing but failures) are logged as "inf" so the JSONL export stays valid JSON
+            "scores": {c: (None if s is None else round(s, 4) if math.isfinite(s) else "inf") for c, s in scores.items()},
+            "explored": explored,
+            "hedged": False,
+            "failover": False,
+            "winner": None,
+            "latency_ms": None,
+            "errors": {},
+        }
+        return order, decision
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._client, name)
+        if not callable(attr) or not name[:1].isupper():
+            return attr
+
+        if asyncio.iscoroutinefunction(attr):
+            @functools.wraps(attr)
+            async def async_wrapper(*args, **kwargs):
+                if not self.router.enabled or (kwargs.get("baml_options") or {}).get("client_registry"):
+                    return await attr(*args, **kwargs)
+                return await self._acall(name, attr, args, kwargs)
+            return async_wrapper
+
+        @functools.wraps(attr)
+        def wrapper(*args, **kwargs):
+            if not self.router.enabled or (kwargs.get("baml_options") or {}).get("client_registry"):
+                return attr(*args, **kwargs)
+            return self._call(name, attr, args, kwargs)
+        return wrapper
+
+    def _call(self, name: str, attr, args, kwargs):
+        order, decision = self._new_decision(name)
+        started = time.perf_counter()
+
+        def attempt(client: str):
+            collector, attempt_started = baml_py.baml_py.Collector(name=f"{name}:{client}"), time.perf_counter()
+            try:
+                result = attr(*args, **self._routed_kwargs(kwargs, client, collector))
+            except Exception:
+                self._finish_attempt(name, client, collector, attempt_started, ok=False)
+                raise
+            self._finish_attempt(name, client, collector, attempt_started, ok=True)
+            return result
+
+        pool = self.router.executor()
+        remaining = list(order)
+        pending = {}
+
+        def launch():
+            client = remaining.pop(0)
+            pending[pool.submit(contextvars.copy_context().run, attempt, client)] = client
+
+        launch()
+        budget = self.router.hedge_budget(name, order[0])
+        last_error: Optional[BaseException] = None
+        try:
+            while pending:
+                timeout = budget if (budget is not None and remaining and not decision["hedged"]) else None
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    # The chosen client is slower than its budget: hedge with the next-best client
+                    decision["hedged"] = True
+                    launch()
+                    continue
+                for future in done:
+                    client = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        last_error = e
+                        decision["errors"][client] = f"{type(e).__name__}: {e}"[:200]
+                        continue
+                    decision["winner"] = client
+                    return result  # a slower hedged request keeps running and still feeds the statistics
+                if not pending and remaining:
+                    decision["failover"] = True
+                    launch()
+            raise last_error
+        finally:
+            decision["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            self.router.log_decision(decision)
+
+    async def _acall(self, name: str, attr, args, kwargs):
+        order, decision = self._new_decision(name)
+        started = time.perf_counter()
+
+        async def attempt(client: str):
+            collector, attempt_started = baml_py.baml_py.Collector(name=f"{name}:{client}"), time.perf_counter()
+            try:
+                result = await attr(*args, **self._routed_kwargs(kwargs, client, collector))
+            except asyncio.CancelledError:
+                raise  # the other request won; a cancelled call says nothing about this client
+            except Exception:
+                self._finish_attempt(name, client, collector, attempt_started, ok=False)
+                raise
+            self._finish_attempt(name, client, collector, attempt_started, ok=True)
+            return result
+
+        remaining = list(order)
+        pending: Dict[asyncio.Task, str] = {}
+
+        def launch():
+            client = remaining.pop(0)
+            pending[asyncio.ensure_future(attempt(client))] = client
+
+        launch()
+        budget = self.router.hedge_budget(name, order[0])
+        last_error: Optional[BaseException] = None
+        try:
+            while pending:
+                timeout = budget if (budget is not None and remaining and not decision["hedged"]) else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    decision["hedged"] = True
+                    launch()
+                    continue
+                for task in done:
+                    client = pending.pop(task)
+                    if task.exception() is not None:
+                        last_error = task.exception()
+                        decision["errors"][client] = f"{type(last_error).__name__}: {last_error}"[:200]
+                        continue
+                    decision["winner"] = client
+                    return task.result()
+                if not pending and remaining:
+                    decision["failover"] = True
+                    launch()
+            raise last_error
+        finally:
+            # Cancel the losing request so it doesn't keep spending tokens
+            for task in pending:
+                task.cancel()
+            decision["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            self.router.log_decision(decision)
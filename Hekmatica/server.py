@@ -0,0 +1,228 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from aiohttp import web
+
+from agent import DeepResearchAgent, CritiquePolicy, agent_graph
+from metrics import registry as metrics_registry
+
+# Local HTTP service for the research agent. Every request runs on one event loop against the single
+# compiled async graph from agent.py, so BAML clients, the search tool, the pooled HTTP session and the
+# caches are shared across requests.
+#
+#   POST /research          {"question": ..., "clarification": ...} -> JSON answer when done
+#   POST /research/stream   same body -> Server-Sent Events: node progress, partial answers, final answer
+#   GET  /health            running/queued counts
+#   GET  /metrics           Prometheus text export of metrics.registry
+
+logger = logging.getLogger("ResearchServer")
+
+MAX_CONCURRENCY = 4  # research runs executing at the same time
+MAX_QUEUE = 16  # admitted requests waiting for a free slot; beyond this new requests get 503
+RESEARCH_TIMEOUT = 300.0  # seconds a single run may take, including time spent queued
+RETRY_AFTER = 5  # seconds suggested to rejected clients
+
+
+class Overloaded(Exception):
+    """Raised when the queue is full and a request cannot be admitted."""
+
+
+class ResearchService:
+    """Admission control around a shared DeepResearchAgent.
+
+    At most max_concurrency runs execute at once; up to max_queue more wait for a slot, and any request
+    beyond that is rejected immediately instead of piling up behind slow LLM calls.
+    """
+
+    def __init__(self, research_agent: DeepResearchAgent, max_concurrency: int = MAX_CONCURRENCY,
+                 max_queue: int = MAX_QUEUE, timeout: float = RESEARCH_TIMEOUT):
+        self.agent = research_agent
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.running = 0
+        self.queued = 0
+        self.completed = 0
+        self.rejected = 0
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+    def admit(self):
+        """Reserve a queue position, or raise Overloaded if running and waiting requests are at the limit."""
+        if self.running + self.queued >= self.max_concurrency + self.max_queue:
+            self.rejected += 1
+            metrics_registry.inc("hekmatica_server_rejected_total")
+            raise Overloaded()
+        self.queued += 1
+
+    async def acquire(self):
+        """Wait for a run slot for an admitted request."""
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+        self.running += 1
+
+    def release(self):
+        self.running -= 1
+        self.completed += 1
+        self._slots.release()
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            "status": "ok",
+            "running": self.running,
+            "queued": self.queued,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+        }
+
+
+async def _read_request(request: web.Request) -> Dict[str, Any]:
+    try:
+        body = await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise web.HTTPBadRequest(text=json.dumps({"error": "Body must be JSON"}), content_type="application/json")
+    question = (body.get("question") or "").strip() if isinstance(body, dict) else ""
+    if not question:
+        raise web.HTTPBadRequest(text=json.dumps({"error": "'question' is required"}), content_type="application/json")
+    return {"question": question, "clarification": body.get("clarification") or None}
+
+
+def _overloaded_response() -> web.Response:
+    return web.json_response({"error": "Server is at capacity, retry later"}, status=503,
+                             headers={"Retry-After": str(RETRY_AFTER)})
+
+
+async def handle_research(request: web.Request) -> web.Response:
+    service: ResearchService = request.app["service"]
+    body = await _read_request(request)
+    request_id = uuid.uuid4().hex[:12]
+    try:
+        service.admit()
+    except Overloaded:
+        return _overloaded_response()
+
+    started = time.perf_counter()
+    try:
+        # The timeout covers queueing too, so a backed-up queue fails fast instead of timing out clients
+        async with asyncio.timeout(service.timeout):
+            await service.acquire()
+            try:
+                # Requests never block on input(): a needed clarification is skipped unless one is provided
+                output, node_metrics = await service.agent.arun_timed(body["question"], body["clarification"], interactive=False)
+            finally:
+                service.release()
+    except TimeoutError:
+        return web.json_response({"id": request_id, "error": "Research timed out"}, status=504)
+    except Exception as e:
+        logger.exception(f"Research request {request_id} failed")
+        return web.json_response({"id": request_id, "error": f"{type(e).__name__}: {e}"}, status=500)
+
+    return web.json_response({
+        "id": request_id,
+        "question": body["question"],
+        "output": output,
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+        "node_metrics": node_metrics,
+    })
+
+
+async def _send_event(response: web.StreamResponse, event: str, data: Dict[str, Any]):
+    await response.write(f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8"))
+
+
+async def handle_research_stream(request: web.Request) -> web.StreamResponse:
+    service: ResearchService = request.app["service"]
+    body = await _read_request(request)
+    request_id = uuid.uuid4().hex[:12]
+    try:
+        service.admit()
+    except Overloaded:
+        return _overloaded_response()
+
+    response = web.StreamResponse(headers={
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # keep reverse proxies from buffering the stream
+    })
+    await response.prepare(request)
+    await _send_event(response, "queued", {"id": request_id, "queued": service.queued})
+
+    try:
+        async with asyncio.timeout(service.timeout):
+            await service.acquire()
+            try:
+                await _send_event(response, "started", {"id": request_id})
+                # A client that disconnects makes the write fail, which closes the stream and cancels the run
+                events = service.agent.astream(body["question"], body["clarification"], interactive=False)
+                async with contextlib.aclosing(events):
+                    async for event in events:
+                        await _send_event(response, event["type"], event)
+            finally:
+                service.release()
+    except TimeoutError:
+        await _send_event(response, "error", {"id": request_id, "error": "Research timed out"})
+    except ConnectionResetError:
+        logger.info(f"Client disconnected from stream {request_id}")
+        return response
+    except Exception as e:
+        logger.exception(f"Research stream {request_id} failed")
+        await _send_event(response, "error", {"id": request_id, "error": f"{type(e).__name__}: {e}"})
+    await response.write_eof()
+    return response
+
+
+async def handle_health(request: web.Request) -> web.Response:
+    return web.json_response(request.app["service"].health())
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(text=metrics_registry.export_prometheus(), content_type="text/plain")
+
+
+def create_app(research_agent: Optional[DeepResearchAgent] = None, max_concurrency: int = MAX_CONCURRENCY,
+               max_queue: int = MAX_QUEUE, timeout: float = RESEARCH_TIMEOUT) -> web.Application:
+    """Build the aiohttp application; by default the agent runs the shared agent.agent_graph."""
+    if research_agent is None:
+        research_agent = DeepResearchAgent(agent_graph, print_metrics=False)
+    app = web.Application()
+    app["service"] = ResearchService(research_agent, max_concurrency, max_queue, timeout)
+    app.router.add_post("/research", handle_research)
+    app.router.add_post("/research/stream", handle_research_stream)
+    app.router.add_get("/health", handle_health)
+    app.router.add_get("/metrics", handle_metrics)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the Deep Research Agent over HTTP")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on")
+    parser.add_argument("--max-concurrency", type=int, default=MAX_CONCURRENCY, help="Research runs executing at once")
+    parser.add_argument("--max-queue", type=int, default=MAX_QUEUE, help="Requests allowed to wait for a free slot")
+    parser.add_argument("--timeout", type=float, default=RESEARCH_TIMEOUT, help="Seconds per request, including queueing")
+    parser.add_argument("--max-attempts", type=int, default=2, help="Maximum number of answer attempts")
+    parser.add_argument("--critique", choices=["always", "confidence", "never"], default="always",
+                        help="When to critique answers")
+    parser.add_argument("--fetch-pages", action="store_true",
+                        help="Download the top-ranked pages and add relevant passages to the answer context")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server_agent = DeepResearchAgent(
+        agent_graph,
+        max_attempt_count=args.max_attempts,
+        critique_policy=CritiquePolicy(mode=args.critique),
+        print_metrics=False,
+        fetch_pages=args.fetch_pages,
+    )
+    web.run_app(create_app(server_agent, args.max_concurrency, args.max_queue, args.timeout),
+                host=args.host, port=args.port)
@@ -0,0 +1,57 @@
+"""Local stand-in for the CoinGecko simple/price endpoint, for running price lookups without network access.
+
+    with CoinGeckoStub({"bitcoin": 65000.0}) as stub:
+        tools.COINGECKO_API_URL = stub.url
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+
+class CoinGeckoStub:
+    """Serves /simple/price?ids=...&vs_currencies=usd from a fixed price table and records the requested ids."""
+
+    def __init__(self, prices: Dict[str, float]):
+        self.prices = dict(prices)
+        self.requests: List[List[str]] = []  # ids of every request, in order
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                if parsed.path != "/simple/price":
+                    self.send_error(404)
+                    return
+                query = parse_qs(parsed.query)
+                ids = [coin_id for coin_id in query.get("ids", [""])[0].split(",") if coin_id]
+                stub.requests.append(ids)
+                body = json.dumps(
+                    {coin_id: {"usd": stub.prices[coin_id]} for coin_id in ids if coin_id in stub.prices}
+                ).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "CoinGeckoStub":
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Hekmatica modules import each other as top-level modules (from cache import ...), as when run from the project dir
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
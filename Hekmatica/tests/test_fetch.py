@@ -0,0 +1,45 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import fetch
+
+
+class _PageHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = b"<html><body><p>Bitcoin halving explained</p></body></html>"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def page_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _PageHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/page"
+    server.shutdown()
+    server.server_close()
+
+
+def test_disabled_page_cache_stays_disabled(page_url, tmp_path, monkeypatch):
+    cache_path = tmp_path / "pages.sqlite"
+    monkeypatch.setattr(fetch, "PAGE_CACHE_PATH", str(cache_path))
+    monkeypatch.setattr(fetch, "page_cache", fetch._NOT_CREATED)
+    lookups = []
+    monkeypatch.setattr(fetch, "record_cache", lambda name, hit: lookups.append((name, hit)))
+
+    fetch.set_page_cache(None)
+    assert fetch.fetch_page_text(page_url) == "Bitcoin halving explained"
+    assert fetch.fetch_page_text(page_url) == "Bitcoin halving explained"
+
+    assert fetch.page_cache is None
+    assert lookups == []
+    assert not cache_path.exists()
@@ -0,0 +1,48 @@
+import pytest
+
+import tools
+from coingecko_stub import CoinGeckoStub
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    with CoinGeckoStub({"bitcoin": 65000.0, "ethereum": 3200.5, "solana": 150.0}) as stub:
+        monkeypatch.setattr(tools, "COINGECKO_API_URL", stub.url)
+        tools.price_cache.clear()
+        yield stub
+    tools.price_cache.clear()
+
+
+def test_prices_are_fetched_in_one_request(stub):
+    prices = tools.get_current_prices(["BTC", "ethereum", "eth", "unknowncoin"])
+
+    assert prices == {"BTC": "$65,000.00", "ethereum": "$3,200.50", "eth": "$3,200.50", "unknowncoin": None}
+    assert stub.requests == [["bitcoin", "ethereum", "unknowncoin"]]
+
+
+def test_cached_quotes_are_reused_within_the_staleness_window(stub):
+    tools.get_current_prices(["bitcoin", "ethereum"])
+    prices = tools.get_current_prices(["btc", "solana"])
+
+    assert prices == {"btc": "$65,000.00", "solana": "$150.00"}
+    # Only the coin that was not cached yet is requested again
+    assert stub.requests == [["bitcoin", "ethereum"], ["solana"]]
+
+
+def test_stale_quotes_are_fetched_again(stub, monkeypatch):
+    tools.get_current_prices(["bitcoin"])
+    stub.prices["bitcoin"] = 70000.0
+
+    # The window is read on every call, so changing it applies to entries that are already cached
+    monkeypatch.setattr(tools, "PRICE_CACHE_STALENESS", 0)
+    assert tools.get_current_prices(["bitcoin"]) == {"bitcoin": "$70,000.00"}
+    assert tools.get_current_prices(["bitcoin"], max_age=60) == {"bitcoin": "$70,000.00"}
+    assert stub.requests == [["bitcoin"], ["bitcoin"]]
+
+
+def test_failed_request_returns_none_and_is_not_cached(stub, monkeypatch):
+    monkeypatch.setattr(tools, "COINGECKO_API_URL", stub.url + "/missing")
+    assert tools.get_current_prices(["bitcoin"]) == {"bitcoin": None}
+
+    monkeypatch.setattr(tools, "COINGECKO_API_URL", stub.url)
+    assert tools.get_current_prices(["bitcoin"]) == {"bitcoin": "$65,000.00"}
@@ -0,0 +1,27 @@
+from router import MIN_SAMPLES, LLMRouter
+
+
+def test_failing_client_ranks_behind_slow_healthy_client():
+    router = LLMRouter(routes={"AnswerQuestion": ["Failing", "Slow"]}, explore_rate=0.0)
+    for _ in range(MIN_SAMPLES):
+        router.record("AnswerQuestion", "Failing", 0.05, ok=False)
+        router.record("AnswerQuestion", "Slow", 30.0, ok=True)
+
+    order, scores, explored = router.rank("AnswerQuestion")
+
+    assert order == ["Slow", "Failing"]
+    assert scores["Failing"] == float("inf")
+    assert not explored
+
+
+def test_errors_scale_the_latency_score():
+    router = LLMRouter(routes={"AnswerQuestion": ["Flaky", "Steady"]}, explore_rate=0.0)
+    for i in range(10):
+        # Flaky is faster when it works, but half of its calls fail and have to be retried
+        router.record("AnswerQuestion", "Flaky", 1.0, ok=i % 2 == 0)
+        router.record("AnswerQuestion", "Steady", 1.5, ok=True)
+
+    order, scores, _ = router.rank("AnswerQuestion")
+
+    assert order == ["Steady", "Flaky"]
+    assert scores["Flaky"] == 1.0 / 0.5 + router.error_weight * 0.5
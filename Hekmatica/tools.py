@@ -1,9 +1,19 @@
+import asyncio
 import html
+import json
 import logging
 import requests
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from requests.adapters import HTTPAdapter
 
+from pydantic import BaseModel, Field
 from langchain_community.tools import DuckDuckGoSearchRun, DuckDuckGoSearchResults
 
+from cache import MemoryCache
+from metrics import record_cache, record_tool_call
+
 # Fallback: optionally, implement a simple HTML query to DuckDuckGo if library not installed (not shown for brevity)
 
 logging.basicConfig(level=logging.INFO)
@@ -27,13 +37,53 @@ COIN_ID_MAP = {
     # Add more mappings as needed
 }
 
-def web_search(query: str, max_results: int = 5):
-    """Search the web for the query and return a list of dictionaries, each with 'content' and 'link'."""
+# Cache for web_search results, keyed by normalized query and max_results.
+# Swap in another backend (e.g. cache.SQLiteCache) with set_search_cache(), or pass None to disable caching.
+SEARCH_CACHE_TTL = 6 * 3600  # seconds before a cached search result is considered stale
+search_cache = MemoryCache(max_entries=512, ttl=SEARCH_CACHE_TTL)
+
+_search_list_tool = None
+
+
+def set_search_cache(cache):
+    """Replace the cache used by web_search (any object with get/set, or None to disable caching)."""
+    global search_cache
+    search_cache = cache
+
+
+def _search_cache_key(query: str, max_results: int) -> str:
+    # Case and whitespace differences between subqueries should not cause a re-search
+    normalized = " ".join(query.lower().split())
+    return f"{normalized}|{max_results}"
+
+
+def _get_search_tool():
+    # Reuse one DuckDuckGoSearchResults instance instead of building a new one per call
+    global _search_list_tool
+    if _search_list_tool is None:
+        # Use DuckDuckGoSearchResults with list output format
+        _search_list_tool = DuckDuckGoSearchResults(output_format="list")
+    return _search_list_tool
+
+
+def web_search(query: str, max_results: int = 5, use_cache: bool = True):
+    """Search the web for the query and return a list of dictionaries, each with 'content' and 'link'.
+
+    Results are served from search_cache when available; pass use_cache=False to bypass it.
+    """
+    record_tool_call("web_search")
+    cache = search_cache if use_cache else None
+    cache_key = _search_cache_key(query, max_results)
+    if cache is not None:
+        hit, cached = cache.get(cache_key)
+        record_cache("search", hit)
+        if hit:
+            logger.info(f"Search cache hit for {query!r}")
+            return [dict(res) for res in cached]
+
     results = [] # Now stores list of dicts
     try:
-        # Use DuckDuckGoSearchResults with list output format
-        search_list_tool = DuckDuckGoSearchResults(output_format="list")
-        raw_results = search_list_tool.invoke(query) 
+        raw_results = _get_search_tool().invoke(query)
         
         # Limit results manually
         raw_results = raw_results[:max_results]
@@ -63,35 +113,148 @@ def web_search(query: str, max_results: int = 5):
         
         if content and link: # Only add if both content and link are present
             results.append({'content': content, 'link': link})
-            
+
+    # Failed or empty searches return early above and are never cached
+    if cache is not None and results:
+        cache.set(cache_key, [dict(res) for res in results])
     return results
 
 
-def get_current_price(coin_name: str):
-    """Fetch the current price (USD) of the given cryptocurrency. Returns a string like '$12345.67' or None if not found."""
+# CoinGecko settings for price lookups. Point COINGECKO_API_URL at a local stub server to run without network access.
+COINGECKO_API_URL = "https://api.coingecko.com/api/v3"
+PRICE_REQUEST_TIMEOUT = 5  # seconds
+PRICE_CACHE_STALENESS = 30  # seconds a fetched quote may be reused before it is fetched again
+# Entries are (fetched_at, price) and never expire by themselves: their age is checked against the
+# staleness window on every read, so changing PRICE_CACHE_STALENESS takes effect immediately.
+price_cache = MemoryCache(max_entries=256, ttl=None)
+
+# One pooled HTTP session so repeated price lookups and page fetches reuse connections
+HTTP_POOL_SIZE = 32  # connections kept per host; concurrent runs (batch, server) share the pool
+_http_session = None
+_http_session_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _http_session = session
+    return _http_session
+
+
+def _coin_id(coin_name: str) -> str:
     coin_key = coin_name.strip().lower()
     # Use mapping to find CoinGecko ID
-    coin_id = COIN_ID_MAP.get(coin_key, coin_key)
-    url = f"https://api.coingecko.com/api/v3/simple/price?ids={coin_id}&vs_currencies=usd"
-    try:
-        resp = requests.get(url, timeout=5)
-        resp.raise_for_status()
-    except Exception as e:
-        logger.error(f"Price API request failed for {coin_name}: {e}")
-        return None
-    data = resp.json()
-    if coin_id in data and "usd" in data[coin_id]:
-        price = data[coin_id]["usd"]
-        # Format the price with comma and two decimals
-        price_str = f"${price:,.2f}"
-        return price_str
-    else:
-        logger.info(f"Price for {coin_name} not found in API response.")
-        return None
+    return COIN_ID_MAP.get(coin_key, coin_key)
+
+
+def get_current_prices(
+    coin_names: List[str], use_cache: bool = True, max_age: Optional[float] = None
+) -> Dict[str, Optional[str]]:
+    """Fetch the current USD prices of several cryptocurrencies with a single API request.
+
+    Returns a dict mapping each requested name to a string like '$12345.67', or None if not found.
+    Quotes fetched less than max_age seconds ago (default PRICE_CACHE_STALENESS) are served from price_cache.
+    """
+    record_tool_call("price_lookup", len(coin_names))
+    prices: Dict[str, Optional[str]] = {}
+    coin_ids = {name: _coin_id(name) for name in coin_names}
+    max_age = PRICE_CACHE_STALENESS if max_age is None else max_age
+
+    to_fetch = []
+    for coin_id in dict.fromkeys(coin_ids.values()):
+        fresh = False
+        if use_cache:
+            hit, entry = price_cache.get(coin_id)
+            fresh = hit and time.time() - entry[0] < max_age
+            record_cache("price", fresh)
+        if fresh:
+            prices[coin_id] = entry[1]
+        else:
+            to_fetch.append(coin_id)
+
+    if to_fetch:
+        # The simple/price endpoint accepts a comma-separated list of ids
+        url = f"{COINGECKO_API_URL}/simple/price"
+        params = {"ids": ",".join(to_fetch), "vs_currencies": "usd"}
+        data = None
+        try:
+            resp = get_http_session().get(url, params=params, timeout=PRICE_REQUEST_TIMEOUT)
+            resp.raise_for_status()
+            data = resp.json()
+        except Exception as e:
+            logger.error(f"Price API request failed for {', '.join(to_fetch)}: {e}")
+
+        for coin_id in to_fetch:
+            if data is None:
+                prices[coin_id] = None
+            elif coin_id in data and "usd" in data[coin_id]:
+                # Format the price with comma and two decimals
+                prices[coin_id] = f"${data[coin_id]['usd']:,.2f}"
+                price_cache.set(coin_id, (time.time(), prices[coin_id]))
+            else:
+                logger.info(f"Price for {coin_id} not found in API response.")
+                prices[coin_id] = None
+
+    return {name: prices[coin_id] for name, coin_id in coin_ids.items()}
+
+
+class ToolResult(BaseModel):
+    """Typed output of a structured tool, kept apart from free-text search snippets.
+
+    kind says how to read the payload (currently "price": coin, coin_id, price, currency);
+    source is a link that can be cited and timestamp is when the data was retrieved (epoch seconds).
+    """
+    kind: str
+    payload: Dict[str, Any]
+    source: Optional[str] = None
+    timestamp: float = Field(default_factory=time.time)
+
+    def render(self) -> str:
+        """Text of the result as it appears in the answer context."""
+        if self.kind == "price":
+            price = self.payload.get("price") or "(unavailable)"
+            return f"Current {self.payload['coin']} price: {price} ({self.payload.get('currency', 'usd').upper()}, CoinGecko)"
+        return f"{self.kind}: {json.dumps(self.payload, ensure_ascii=False, sort_keys=True)}"
+
+
+def price_results(coin_names: List[str], prices: Dict[str, Optional[str]]) -> List[ToolResult]:
+    """Wrap the output of get_current_prices as one price ToolResult per requested name."""
+    retrieved_at = time.time()
+    return [
+        ToolResult(
+            kind="price",
+            payload={"coin": name, "coin_id": _coin_id(name), "price": prices.get(name), "currency": "usd"},
+            source=f"https://www.coingecko.com/en/coins/{_coin_id(name)}",
+            timestamp=retrieved_at,
+        )
+        for name in coin_names
+    ]
+
+
+def get_current_price(coin_name: str):
+    """Fetch the current price (USD) of the given cryptocurrency. Returns a string like '$12345.67' or None if not found."""
+    return get_current_prices([coin_name]).get(coin_name)
+
+async def aweb_search(query: str, max_results: int = 5, use_cache: bool = True):
+    """Async version of web_search; runs the blocking search in a worker thread so the event loop stays free."""
+    return await asyncio.to_thread(web_search, query, max_results, use_cache)
+
+
+async def aget_current_price(coin_name: str):
+    """Async version of get_current_price; runs the blocking request in a worker thread."""
+    return await asyncio.to_thread(get_current_price, coin_name)
+
+
+async def aget_current_prices(
+    coin_names: List[str], use_cache: bool = True, max_age: Optional[float] = None
+) -> Dict[str, Optional[str]]:
+    """Async version of get_current_prices."""
+    return await asyncio.to_thread(get_current_prices, coin_names, use_cache, max_age)
 
 if __name__ == "__main__":
-    print(get_current_price("bitcoin"))
-    print(get_current_price("ethereum"))
-    print(get_current_price("litecoin"))
-    print(get_current_price("solana"))
-    print(get_current_price("dogecoin"))
\ No newline at end of file
+    print(get_current_prices(["bitcoin", "ethereum", "litecoin", "solana", "dogecoin"]))
\ No newline at end of file
@@ -122,6 +122,12 @@ Interactive elements from top layer of the current page inside the viewport:
 					error = result.error.split('\n')[-1]
 					state_description += f'\nAction error {i + 1}/{len(self.result)}: ...{error}'
 
+		if self.state.screenshot_unchanged and use_vision is True:
+			state_description += (
+				'\nNo screenshot this step: the page looks nearly the same as when the last screenshot was sent. '
+				'That screenshot is no longer available, so rely on the interactive elements above.'
+			)
+
 		if self.state.screenshot and use_vision is True:
 			# Format message for vision model
 			return HumanMessage(
@@ -129,7 +135,9 @@ Interactive elements from top layer of the current page inside the viewport:
 					{'type': 'text', 'text': state_description},
 					{
 						'type': 'image_url',
-						'image_url': {'url': f'data:image/png;base64,{self.state.screenshot}'},  # , 'detail': 'low'
+						'image_url': {
+							'url': f'data:image/{self.state.screenshot_format};base64,{self.state.screenshot}'
+						},  # , 'detail': 'low'
 					},
 				]
 			)
@@ -881,7 +881,10 @@ class Agent(Generic[Context]):
 					results.append(ActionResult(extracted_content=msg, include_in_memory=True))
 					break
 
-				new_path_hashes = set(e.hash.branch_path_hash for e in new_selector_map.values())
+				if new_state.hash_index is not None:
+					new_path_hashes = new_state.hash_index.branch_path_hashes
+				else:
+					new_path_hashes = set(e.hash.branch_path_hash for e in new_selector_map.values())
 				if check_for_new_elements and not new_path_hashes.issubset(cached_path_hashes):
 					# next action requires index but there are new elements on the page
 					msg = f'Something new appeared after action {i} / {len(actions)}'
@@ -1074,7 +1077,9 @@ class Agent(Generic[Context]):
 		if not historical_element or not current_state.element_tree:
 			return action
 
-		current_element = HistoryTreeProcessor.find_history_element_in_tree(historical_element, current_state.element_tree)
+		current_element = HistoryTreeProcessor.find_history_element_in_tree(
+			historical_element, current_state.element_tree, current_state.hash_index
+		)
 
 		if not current_element or current_element.highlight_index is None:
 			return None
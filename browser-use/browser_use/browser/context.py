@@ -11,8 +11,10 @@ import os
 import re
 import time
 import uuid
+import weakref
+from collections import Counter
 from dataclasses import dataclass
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Literal, Optional
 
 from playwright._impl._errors import TimeoutError
 from playwright.async_api import Browser as PlaywrightBrowser
@@ -23,17 +25,21 @@ from playwright.async_api import (
 	ElementHandle,
 	FrameLocator,
 	Page,
+	Request,
+	Response,
 )
 from pydantic import BaseModel, ConfigDict, Field
 
+from browser_use.browser.utils.screenshot import fingerprints_match, screenshot_fingerprint
 from browser_use.browser.views import (
 	BrowserError,
 	BrowserState,
+	NetworkIdleStats,
 	TabInfo,
 	URLNotAllowedError,
 )
 from browser_use.dom.service import DomService
-from browser_use.dom.views import DOMElementNode, SelectorMap
+from browser_use.dom.views import DOMElementNode, DOMSnapshot, SelectorMap
 from browser_use.utils import time_execution_async, time_execution_sync
 
 if TYPE_CHECKING:
@@ -41,6 +47,59 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+# Requests that count as page load activity in _wait_for_stable_network
+RELEVANT_RESOURCE_TYPES = frozenset({'document', 'stylesheet', 'image', 'font', 'script', 'iframe'})
+
+RELEVANT_CONTENT_TYPES = ('text/html', 'text/css', 'application/javascript', 'image/', 'font/', 'application/json')
+
+# Streaming or real-time responses never make the page more complete
+IGNORED_CONTENT_TYPES = ('streaming', 'video', 'audio', 'webm', 'mp4', 'event-stream', 'websocket', 'protobuf')
+
+# Additional patterns to filter out
+IGNORED_URL_PATTERNS = (
+	# Analytics and tracking
+	'analytics',
+	'tracking',
+	'telemetry',
+	'beacon',
+	'metrics',
+	# Ad-related
+	'doubleclick',
+	'adsystem',
+	'adserver',
+	'advertising',
+	# Social media widgets
+	'facebook.com/plugins',
+	'platform.twitter',
+	'linkedin.com/embed',
+	# Live chat and support
+	'livechat',
+	'zendesk',
+	'intercom',
+	'crisp.chat',
+	'hotjar',
+	# Push notifications
+	'push-notifications',
+	'onesignal',
+	'pushwoosh',
+	# Background sync/heartbeat
+	'heartbeat',
+	'ping',
+	'alive',
+	# WebRTC and streaming
+	'webrtc',
+	'rtmp://',
+	'wss://',
+	# Common CDNs for dynamic content
+	'cloudfront.net',
+	'fastly.net',
+)
+# One scan per URL instead of one substring search per pattern
+IGNORED_URL_REGEX = re.compile('|'.join(map(re.escape, IGNORED_URL_PATTERNS)))
+
+# Number of URLs kept in NetworkIdleStats.delaying_requests
+MAX_DELAYING_REQUESTS = 100
+
 
 class BrowserContextWindowSize(BaseModel):
 	"""Window size configuration for browser context"""
@@ -113,6 +172,24 @@ class BrowserContextConfig(BaseModel):
 	    viewport_expansion: 0
 	        Viewport expansion in pixels. This amount will increase the number of elements which are included in the state what the LLM will see. If set to -1, all elements will be included (this leads to high token usage). If set to 0, only the elements which are visible in the viewport will be included.
 
+	    incremental_dom: False
+	        Track DOM mutations between states and only rebuild the subtrees that changed, patching the previous element tree. Falls back to a full rebuild after scrolling, on pages with iframes or shadow roots, after changes outside <body> such as stylesheets or classes on <html>, and when too much changed.
+	        Changes that cause no mutation, such as menus opened by :hover or :focus styles, are not seen: the previous tree is kept as unchanged.
+
+	    screenshot_format: 'png'
+	        Image format of the screenshots sent to the LLM: 'png', 'jpeg' or 'webp'. WebP needs Chromium, other browsers fall back to JPEG.
+
+	    screenshot_quality: 80
+	        Compression quality (1-100) for JPEG and WebP screenshots.
+
+	    screenshot_max_width: None
+	    screenshot_max_height: None
+	        Downscale screenshots to fit within these dimensions in pixels. Exact on Chromium, elsewhere only the device pixel ratio is dropped.
+
+	    screenshot_skip_unchanged: False
+	        Leave out the screenshot of a step when it is nearly identical to the last screenshot that was sent: with Pillow installed no cell of a 128x128 grayscale thumbnail may differ by more than a few gray levels, otherwise the frames must be byte-identical.
+	        Earlier screenshots are not kept in the agent's message history, so on a skipped step the LLM sees no image at all and works from the element list.
+
 	    allowed_domains: None
 	        List of allowed domains that can be accessed. If None, all domains are allowed.
 	        Example: ['example.com', 'api.example.com']
@@ -173,6 +250,12 @@ class BrowserContextConfig(BaseModel):
 
 	highlight_elements: bool = True
 	viewport_expansion: int = 0
+	incremental_dom: bool = False
+	screenshot_format: Literal['png', 'jpeg', 'webp'] = 'png'
+	screenshot_quality: int = Field(default=80, ge=1, le=100)
+	screenshot_max_width: int | None = None
+	screenshot_max_height: int | None = None
+	screenshot_skip_unchanged: bool = False
 	allowed_domains: list[str] | None = None
 	include_dynamic_attributes: bool = True
 	http_credentials: dict[str, str] | None = None
@@ -234,6 +317,12 @@ class BrowserSession:
 		self.active_tab = None
 		self.context = context
 		self.cached_state = cached_state
+		# Last incremental DOM build per page, see BrowserContextConfig.incremental_dom
+		self.dom_snapshots: weakref.WeakKeyDictionary[Page, DOMSnapshot] = weakref.WeakKeyDictionary()
+		# Fingerprint of the last screenshot sent per page, see BrowserContextConfig.screenshot_skip_unchanged
+		self.screenshot_fingerprints: weakref.WeakKeyDictionary[Page, bytes] = weakref.WeakKeyDictionary()
+		# Network idle waits per page, see BrowserContext.get_network_stats
+		self.network_stats: weakref.WeakKeyDictionary[Page, NetworkIdleStats] = weakref.WeakKeyDictionary()
 		self.context.on('page', lambda page: page.add_init_script(init_script))
 
 
@@ -510,173 +599,122 @@ class BrowserContext:
 		return context
 
 	async def _wait_for_stable_network(self):
+		"""
+		Waits until no relevant request has been pending for wait_for_network_idle_page_load_time seconds,
+		or maximum_wait_page_load_time has passed. Wakes up on request events instead of polling.
+		"""
 		page = await self.get_current_page()
+		session = await self.get_session()
+		stats = session.network_stats.setdefault(page, NetworkIdleStats())
 
-		pending_requests = set()
-		last_activity = asyncio.get_event_loop().time()
-
-		# Define relevant resource types and content types
-		RELEVANT_RESOURCE_TYPES = {
-			'document',
-			'stylesheet',
-			'image',
-			'font',
-			'script',
-			'iframe',
-		}
-
-		RELEVANT_CONTENT_TYPES = {
-			'text/html',
-			'text/css',
-			'application/javascript',
-			'image/',
-			'font/',
-			'application/json',
-		}
-
-		# Additional patterns to filter out
-		IGNORED_URL_PATTERNS = {
-			# Analytics and tracking
-			'analytics',
-			'tracking',
-			'telemetry',
-			'beacon',
-			'metrics',
-			# Ad-related
-			'doubleclick',
-			'adsystem',
-			'adserver',
-			'advertising',
-			# Social media widgets
-			'facebook.com/plugins',
-			'platform.twitter',
-			'linkedin.com/embed',
-			# Live chat and support
-			'livechat',
-			'zendesk',
-			'intercom',
-			'crisp.chat',
-			'hotjar',
-			# Push notifications
-			'push-notifications',
-			'onesignal',
-			'pushwoosh',
-			# Background sync/heartbeat
-			'heartbeat',
-			'ping',
-			'alive',
-			# WebRTC and streaming
-			'webrtc',
-			'rtmp://',
-			'wss://',
-			# Common CDNs for dynamic content
-			'cloudfront.net',
-			'fastly.net',
-		}
+		loop = asyncio.get_running_loop()
+		pending_requests: dict[Request, float] = {}  # request -> start time
+		activity = asyncio.Event()
+		last_activity = loop.time()
 
-		async def on_request(request):
-			# Filter by resource type
+		def on_request(request: Request):
+			# Filter by resource type, this also drops websocket, media, eventsource, manifest and other requests
 			if request.resource_type not in RELEVANT_RESOURCE_TYPES:
 				return
 
-			# Filter out streaming, websocket, and other real-time requests
-			if request.resource_type in {
-				'websocket',
-				'media',
-				'eventsource',
-				'manifest',
-				'other',
-			}:
-				return
-
-			# Filter out by URL patterns
+			# Filter out data URLs, blob URLs and by URL patterns
 			url = request.url.lower()
-			if any(pattern in url for pattern in IGNORED_URL_PATTERNS):
-				return
-
-			# Filter out data URLs and blob URLs
-			if url.startswith(('data:', 'blob:')):
+			if url.startswith(('data:', 'blob:')) or IGNORED_URL_REGEX.search(url):
 				return
 
 			# Filter out requests with certain headers
 			headers = request.headers
-			if headers.get('purpose') == 'prefetch' or headers.get('sec-fetch-dest') in [
-				'video',
-				'audio',
-			]:
+			if headers.get('purpose') == 'prefetch' or headers.get('sec-fetch-dest') in ('video', 'audio'):
 				return
 
 			nonlocal last_activity
-			pending_requests.add(request)
-			last_activity = asyncio.get_event_loop().time()
-			# logger.debug(f'Request started: {request.url} ({request.resource_type})')
+			last_activity = loop.time()
+			pending_requests[request] = last_activity
+			activity.set()
 
-		async def on_response(response):
+		def finish(request: Request, counts_as_activity: bool):
+			nonlocal last_activity
+			now = loop.time()
+			stats.delaying_requests[request.url] += now - pending_requests.pop(request)
+			if counts_as_activity:
+				last_activity = now
+			activity.set()
+
+		def on_response(response: Response):
 			request = response.request
 			if request not in pending_requests:
 				return
 
-			# Filter by content type if available
 			content_type = response.headers.get('content-type', '').lower()
 
-			# Skip if content type indicates streaming or real-time data
-			if any(
-				t in content_type
-				for t in [
-					'streaming',
-					'video',
-					'audio',
-					'webm',
-					'mp4',
-					'event-stream',
-					'websocket',
-					'protobuf',
-				]
+			# Skip if content type indicates streaming or real-time data, or is not relevant for the page
+			if any(t in content_type for t in IGNORED_CONTENT_TYPES) or not any(
+				ct in content_type for ct in RELEVANT_CONTENT_TYPES
 			):
-				pending_requests.remove(request)
-				return
-
-			# Only process relevant content types
-			if not any(ct in content_type for ct in RELEVANT_CONTENT_TYPES):
-				pending_requests.remove(request)
+				finish(request, counts_as_activity=False)
 				return
 
 			# Skip if response is too large (likely not essential for page load)
 			content_length = response.headers.get('content-length')
-			if content_length and int(content_length) > 5 * 1024 * 1024:  # 5MB
-				pending_requests.remove(request)
+			if content_length and content_length.isdigit() and int(content_length) > 5 * 1024 * 1024:  # 5MB
+				finish(request, counts_as_activity=False)
 				return
 
-			nonlocal last_activity
-			pending_requests.remove(request)
-			last_activity = asyncio.get_event_loop().time()
-			# logger.debug(f'Request resolved: {request.url} ({content_type})')
+			finish(request, counts_as_activity=True)
+
+		def on_request_failed(request: Request):
+			# Failed requests never get a response and would otherwise hold the wait until the timeout
+			if request in pending_requests:
+				finish(request, counts_as_activity=True)
 
 		# Attach event listeners
 		page.on('request', on_request)
 		page.on('response', on_response)
+		page.on('requestfailed', on_request_failed)
 
+		start_time = loop.time()
+		deadline = start_time + self.config.maximum_wait_page_load_time
+		timed_out = False
 		try:
-			# Wait for idle time
-			start_time = asyncio.get_event_loop().time()
 			while True:
-				await asyncio.sleep(0.1)
-				now = asyncio.get_event_loop().time()
-				if len(pending_requests) == 0 and (now - last_activity) >= self.config.wait_for_network_idle_page_load_time:
-					break
-				if now - start_time > self.config.maximum_wait_page_load_time:
-					logger.debug(
-						f'Network timeout after {self.config.maximum_wait_page_load_time}s with {len(pending_requests)} '
-						f'pending requests: {[r.url for r in pending_requests]}'
-					)
+				activity.clear()
+				now = loop.time()
+				if now >= deadline:
+					timed_out = True
 					break
-
+				if pending_requests:
+					timeout = deadline - now
+				else:
+					idle_remaining = last_activity + self.config.wait_for_network_idle_page_load_time - now
+					if idle_remaining <= 0:
+						break
+					timeout = min(idle_remaining, deadline - now)
+				try:
+					await asyncio.wait_for(activity.wait(), timeout)
+				except asyncio.TimeoutError:
+					pass
 		finally:
 			# Clean up event listeners
 			page.remove_listener('request', on_request)
 			page.remove_listener('response', on_response)
-
-		logger.debug(f'⚖️  Network stabilized for {self.config.wait_for_network_idle_page_load_time} seconds')
+			page.remove_listener('requestfailed', on_request_failed)
+
+			now = loop.time()
+			for request, started in pending_requests.items():
+				stats.delaying_requests[request.url] += now - started
+			if len(stats.delaying_requests) > 2 * MAX_DELAYING_REQUESTS:
+				stats.delaying_requests = Counter(dict(stats.delaying_requests.most_common(MAX_DELAYING_REQUESTS)))
+			stats.waits += 1
+			stats.timeouts += timed_out
+			stats.total_wait_time += now - start_time
+
+		if timed_out:
+			logger.debug(
+				f'Network timeout after {self.config.maximum_wait_page_load_time}s with {len(pending_requests)} '
+				f'pending requests: {[r.url for r in pending_requests]}'
+			)
+		else:
+			logger.debug(f'⚖️  Network stabilized for {self.config.wait_for_network_idle_page_load_time} seconds')
 
 	async def _wait_for_page_and_frames_load(self, timeout_overwrite: float | None = None):
 		"""
@@ -890,6 +928,12 @@ class BrowserContext:
 
 		return session.cached_state
 
+	async def get_network_stats(self) -> NetworkIdleStats:
+		"""Network idle waits of the current page, including the requests that delayed them the most"""
+		session = await self.get_session()
+		page = await self.get_current_page()
+		return session.network_stats.get(page) or NetworkIdleStats()
+
 	async def _update_state(self, focus_element: int = -1) -> BrowserState:
 		"""Update and return state."""
 		session = await self.get_session()
@@ -911,48 +955,98 @@ class BrowserContext:
 				raise BrowserError('Browser closed: no valid pages available')
 
 		try:
-			await self.remove_highlights()
-			dom_service = DomService(page)
-			content = await dom_service.get_clickable_elements(
-				focus_element=focus_element,
-				viewport_expansion=self.config.viewport_expansion,
-				highlight_elements=self.config.highlight_elements,
-			)
+			timings: dict[str, float] = {}
+			capture_start = time.perf_counter()
+
+			async def timed(phase: str, awaitable):
+				start = time.perf_counter()
+				try:
+					return await awaitable
+				finally:
+					timings[phase] = time.perf_counter() - start
+
+			# Tab titles do not depend on the DOM, so fetch them while it is extracted
+			async def get_tabs_info() -> list[TabInfo]:
+				# Builds the coroutines inside the task, so cancelling it before it starts leaves none unawaited
+				return await timed('tabs', self.get_tabs_info())
+
+			tabs_task = asyncio.create_task(get_tabs_info())
+
+			try:
+				# buildDomTree.js also removes the previous highlights and returns the title and scroll position
+				dom_service = DomService(page, snapshot=session.dom_snapshots.get(page) if self.config.incremental_dom else None)
+				content = await timed(
+					'dom',
+					dom_service.get_clickable_elements(
+						focus_element=focus_element,
+						viewport_expansion=self.config.viewport_expansion,
+						highlight_elements=self.config.highlight_elements,
+						incremental=self.config.incremental_dom,
+					),
+				)
+				if dom_service.snapshot is not None:
+					session.dom_snapshots[page] = dom_service.snapshot
+				else:
+					session.dom_snapshots.pop(page, None)
+
+				# Get all cross-origin iframes within the page and open them in new tabs
+				# mark the titles of the new tabs so the LLM knows to check them for additional content
+				# unfortunately too buggy for now, too many sites use invisible cross-origin iframes for ads, tracking, youtube videos, social media, etc.
+				# and it distracts the bot by opening a lot of new tabs
+				# iframe_urls = await dom_service.get_cross_origin_iframes()
+				# for url in iframe_urls:
+				# 	if url in [tab.url for tab in tabs_info]:
+				# 		continue  # skip if the iframe if we already have it open in a tab
+				# 	new_page_id = tabs_info[-1].page_id + 1
+				# 	logger.debug(f'Opening cross-origin iframe in new tab #{new_page_id}: {url}')
+				# 	await self.create_new_tab(url)
+				# 	tabs_info.append(
+				# 		TabInfo(
+				# 			page_id=new_page_id,
+				# 			url=url,
+				# 			title=f'iFrame opened as new tab, treat as if embedded inside page #{self.state.target_id}: {page.url}',
+				# 			parent_page_id=self.state.target_id,
+				# 		)
+				# 	)
+
+				# The screenshot has to wait for the highlights drawn during DOM extraction
+				screenshot_b64, screenshot_format, screenshot_unchanged = await timed(
+					'screenshot', self._take_state_screenshot(session, page)
+				)
+				tabs_info = await tabs_task
+			finally:
+				# If anything above failed, stop the tabs task and retrieve its result so it is not left dangling
+				if not tabs_task.done():
+					tabs_task.cancel()
+				await asyncio.gather(tabs_task, return_exceptions=True)
+
+			page_info = dom_service.page_info
+			if page_info:
+				title = page_info['title']
+				pixels_above = page_info['scrollY']
+				pixels_below = page_info['scrollHeight'] - (page_info['scrollY'] + page_info['viewportHeight'])
+			else:
+				# about:blank skips buildDomTree.js
+				title, (pixels_above, pixels_below) = await timed(
+					'page_info', asyncio.gather(page.title(), self.get_scroll_info(page))
+				)
 
-			tabs_info = await self.get_tabs_info()
-
-			# Get all cross-origin iframes within the page and open them in new tabs
-			# mark the titles of the new tabs so the LLM knows to check them for additional content
-			# unfortunately too buggy for now, too many sites use invisible cross-origin iframes for ads, tracking, youtube videos, social media, etc.
-			# and it distracts the bot by opening a lot of new tabs
-			# iframe_urls = await dom_service.get_cross_origin_iframes()
-			# for url in iframe_urls:
-			# 	if url in [tab.url for tab in tabs_info]:
-			# 		continue  # skip if the iframe if we already have it open in a tab
-			# 	new_page_id = tabs_info[-1].page_id + 1
-			# 	logger.debug(f'Opening cross-origin iframe in new tab #{new_page_id}: {url}')
-			# 	await self.create_new_tab(url)
-			# 	tabs_info.append(
-			# 		TabInfo(
-			# 			page_id=new_page_id,
-			# 			url=url,
-			# 			title=f'iFrame opened as new tab, treat as if embedded inside page #{self.state.target_id}: {page.url}',
-			# 			parent_page_id=self.state.target_id,
-			# 		)
-			# 	)
-
-			screenshot_b64 = await self.take_screenshot()
-			pixels_above, pixels_below = await self.get_scroll_info(page)
+			timings['total'] = time.perf_counter() - capture_start
+			logger.debug('State capture: ' + ', '.join(f'{phase} {seconds:.3f}s' for phase, seconds in timings.items()))
 
 			self.current_state = BrowserState(
 				element_tree=content.element_tree,
 				selector_map=content.selector_map,
+				hash_index=content.hash_index,
 				url=page.url,
-				title=await page.title(),
+				title=title,
 				tabs=tabs_info,
 				screenshot=screenshot_b64,
+				screenshot_format=screenshot_format,
+				screenshot_unchanged=screenshot_unchanged,
 				pixels_above=pixels_above,
 				pixels_below=pixels_below,
+				timings=timings,
 			)
 
 			return self.current_state
@@ -963,27 +1057,104 @@ class BrowserContext:
 				return self.current_state
 			raise
 
+	async def _take_state_screenshot(self, session: BrowserSession, page: Page) -> tuple[str | None, str, bool]:
+		"""
+		Screenshot for the browser state: (base64 data, image format, unchanged).
+		With screenshot_skip_unchanged, the data is None when the page looks the same as in the last screenshot that was sent.
+		"""
+		screenshot, image_format = await self._capture_screenshot(page)
+
+		if self.config.screenshot_skip_unchanged:
+			fingerprint = screenshot_fingerprint(screenshot)
+			# Compared with the last frame that was sent, not the previous one, so slow drift adds up to a change
+			sent = session.screenshot_fingerprints.get(page)
+			if sent is not None and fingerprints_match(sent, fingerprint):
+				logger.debug('Page looks the same as in the last screenshot sent, leaving out the screenshot')
+				return None, image_format, True
+			session.screenshot_fingerprints[page] = fingerprint
+
+		return base64.b64encode(screenshot).decode('utf-8'), image_format, False
+
 	# region - Browser Actions
 	@time_execution_async('--take_screenshot')
 	async def take_screenshot(self, full_page: bool = False) -> str:
 		"""
-		Returns a base64 encoded screenshot of the current page.
+		Returns a base64 encoded screenshot of the current page, in the format and size set in the config.
 		"""
 		page = await self.get_current_page()
 
+		screenshot, _ = await self._capture_screenshot(page, full_page=full_page)
+		screenshot_b64 = base64.b64encode(screenshot).decode('utf-8')
+
+		# await self.remove_highlights()
+
+		return screenshot_b64
+
+	async def _capture_screenshot(self, page: Page, full_page: bool = False) -> tuple[bytes, str]:
+		"""Returns the encoded screenshot and its image format"""
 		await page.bring_to_front()
 		await page.wait_for_load_state()
 
+		image_format = self.config.screenshot_format
+		downscale = bool(self.config.screenshot_max_width or self.config.screenshot_max_height)
+
+		# Playwright can neither encode WebP nor resize, Chromium does both while capturing
+		if image_format == 'webp' or downscale:
+			try:
+				return await self._capture_screenshot_cdp(page, full_page), image_format
+			except Exception as e:
+				logger.debug(f'CDP screenshot failed, falling back to Playwright: {type(e).__name__}: {e}')
+			if image_format == 'webp':
+				image_format = 'jpeg'
+
 		screenshot = await page.screenshot(
 			full_page=full_page,
 			animations='disabled',
+			type=image_format,
+			quality=self.config.screenshot_quality if image_format == 'jpeg' else None,
+			# Without CDP the closest we get to downscaling is dropping the device pixel ratio
+			scale='css' if downscale else 'device',
+		)
+		return screenshot, image_format
+
+	async def _capture_screenshot_cdp(self, page: Page, full_page: bool) -> bytes:
+		"""Captures with Page.captureScreenshot, scaled to fit screenshot_max_width/height (Chromium only)"""
+		area = await page.evaluate(
+			"""(fullPage) => {
+				const viewport = window.visualViewport;
+				const root = document.documentElement;
+				return {
+					x: fullPage ? 0 : viewport.pageLeft,
+					y: fullPage ? 0 : viewport.pageTop,
+					width: fullPage ? Math.max(root.scrollWidth, viewport.width) : viewport.width,
+					height: fullPage ? Math.max(root.scrollHeight, viewport.height) : viewport.height,
+					devicePixelRatio: window.devicePixelRatio || 1,
+				};
+			}""",
+			full_page,
 		)
 
-		screenshot_b64 = base64.b64encode(screenshot).decode('utf-8')
-
-		# await self.remove_highlights()
+		# The captured image is clip size * scale * device pixel ratio
+		scale = 1.0
+		if self.config.screenshot_max_width:
+			scale = min(scale, self.config.screenshot_max_width / (area['width'] * area['devicePixelRatio']))
+		if self.config.screenshot_max_height:
+			scale = min(scale, self.config.screenshot_max_height / (area['height'] * area['devicePixelRatio']))
+
+		params = {
+			'format': self.config.screenshot_format,
+			'clip': {'x': area['x'], 'y': area['y'], 'width': area['width'], 'height': area['height'], 'scale': scale},
+			'captureBeyondViewport': full_page,
+		}
+		if self.config.screenshot_format != 'png':
+			params['quality'] = self.config.screenshot_quality
 
-		return screenshot_b64
+		cdp_session = await page.context.new_cdp_session(page)
+		try:
+			result = await cdp_session.send('Page.captureScreenshot', params)
+		finally:
+			await cdp_session.detach()
+		return base64.b64decode(result['data'])
 
 	@time_execution_async('--remove_highlights')
 	async def remove_highlights(self):
@@ -1419,18 +1590,17 @@ class BrowserContext:
 		"""Get information about all tabs"""
 		session = await self.get_session()
 
-		tabs_info = []
-		for page_id, page in enumerate(session.context.pages):
+		async def get_tab_info(page_id: int, page: Page) -> TabInfo:
 			try:
-				tab_info = TabInfo(page_id=page_id, url=page.url, title=await asyncio.wait_for(page.title(), timeout=1))
+				return TabInfo(page_id=page_id, url=page.url, title=await asyncio.wait_for(page.title(), timeout=1))
 			except asyncio.TimeoutError:
 				# page.title() can hang forever on tabs that are crashed/disappeared/about:blank
 				# we dont want to try automating those tabs because they will hang the whole script
 				logger.debug('⚠  Failed to get tab info for tab #%s: %s (ignoring)', page_id, page.url)
-				tab_info = TabInfo(page_id=page_id, url='about:blank', title='ignore this tab and do not use it')
-			tabs_info.append(tab_info)
+				return TabInfo(page_id=page_id, url='about:blank', title='ignore this tab and do not use it')
 
-		return tabs_info
+		# Titles are fetched concurrently, so a hanging tab costs at most one timeout in total
+		return list(await asyncio.gather(*(get_tab_info(page_id, page) for page_id, page in enumerate(session.context.pages))))
 
 	@time_execution_async('--switch_to_tab')
 	async def switch_to_tab(self, page_id: int) -> None:
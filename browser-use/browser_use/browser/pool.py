@@ -0,0 +1,430 @@
+"""
+Pool of warm browsers and contexts shared by concurrently running agents.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator
+from urllib.parse import urlparse
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from browser_use.browser.browser import Browser, BrowserConfig
+from browser_use.browser.context import BrowserContext, BrowserContextConfig
+from browser_use.utils import time_execution_async
+
+logger = logging.getLogger(__name__)
+
+
+class BrowserPoolConfig(BaseModel):
+	"""
+	Configuration for the BrowserPool.
+
+	Default values:
+	    browsers: 1
+	        Number of browser processes launched by start()
+
+	    contexts_per_browser: 2
+	        Number of contexts opened on each browser by start(). New contexts always go to the browser with the fewest open contexts.
+
+	    max_concurrency: None
+	        Maximum number of contexts leased at the same time, further leases wait. Defaults to browsers * contexts_per_browser.
+
+	    max_tasks_per_context: 1
+	        Close a context and open a fresh one after it has been leased this many times, so by default every task gets a new context.
+	        Set it higher to reuse contexts: between leases their tabs are replaced by a blank one and cookies, permissions, the HTTP cache
+	        and the storage of every visited origin are cleared. Clearing storage needs the Chrome DevTools Protocol, so on other browsers
+	        a context is still closed after every lease.
+
+	    health_check_timeout: 5.0
+	        Seconds a leased context gets to answer the health check before it is replaced
+
+	    browser_config: BrowserConfig()
+	        Configuration of every browser in the pool
+
+	    context_config: None
+	        Configuration of every context in the pool. Defaults to browser_config.new_context_config.
+	"""
+
+	model_config = ConfigDict(
+		arbitrary_types_allowed=True,
+		extra='ignore',
+		populate_by_name=True,
+		from_attributes=True,
+		validate_assignment=True,
+	)
+
+	browsers: int = Field(default=1, ge=1)
+	contexts_per_browser: int = Field(default=2, ge=1)
+	max_concurrency: int | None = Field(default=None, ge=1)
+	max_tasks_per_context: int = Field(default=1, ge=1)
+	health_check_timeout: float = 5.0
+
+	browser_config: BrowserConfig = Field(default_factory=BrowserConfig)
+	context_config: BrowserContextConfig | None = None
+
+
+@dataclass
+class BrowserPoolMetrics:
+	"""Utilization of a BrowserPool, see BrowserPool.get_metrics"""
+
+	browsers: int
+	contexts: int
+	idle: int
+	leased: int
+	waiting: int
+	max_concurrency: int
+	utilization: float  # leased / max_concurrency
+	peak_leased: int
+	leases: int
+	cold_starts: int  # contexts opened while a lease was waiting for one
+	recycled: int
+	unhealthy: int
+	browser_restarts: int
+	average_wait_time: float  # seconds a lease waited for a context
+
+
+@dataclass
+class _PooledBrowser:
+	browser: Browser
+	contexts: int = 0
+	restart_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+@dataclass
+class _PooledContext:
+	context: BrowserContext
+	slot: _PooledBrowser
+	tasks: int = 0
+	origins: set[str] = field(default_factory=set)  # origins navigated to since the last reset, whose storage the reset clears
+
+
+class BrowserPool:
+	"""
+	Keeps browser processes and contexts warm and leases them to agents, so a task does not pay for launching a browser.
+
+	Usage:
+	    async with BrowserPool(BrowserPoolConfig(browsers=2, contexts_per_browser=4)) as pool:
+	        async with pool.lease() as context:
+	            agent = Agent(task=task, llm=llm, browser=context.browser, browser_context=context)
+	            await agent.run()
+
+	Pass the context's browser to the agent too, otherwise the agent creates and closes a browser of its own.
+	"""
+
+	def __init__(self, config: BrowserPoolConfig | None = None):
+		self.config = config or BrowserPoolConfig()
+		self.context_config = self.config.context_config or self.config.browser_config.new_context_config
+		self.max_concurrency = self.config.max_concurrency or self.config.browsers * self.config.contexts_per_browser
+
+		self._slots = [_PooledBrowser(Browser(config=self.config.browser_config)) for _ in range(self.config.browsers)]
+		self._idle: deque[_PooledContext] = deque()
+		self._leased: dict[BrowserContext, _PooledContext] = {}
+		self._semaphore = asyncio.Semaphore(self.max_concurrency)
+		self._background_tasks: set[asyncio.Task] = set()
+		self._opening = 0  # contexts waiting for their browser to be relaunched, not counted on a slot yet
+		self._closed = False
+
+		self._waiting = 0
+		self._peak_leased = 0
+		self._leases = 0
+		self._cold_starts = 0
+		self._recycled = 0
+		self._unhealthy = 0
+		self._browser_restarts = 0
+		self._total_wait_time = 0.0
+
+	async def __aenter__(self):
+		await self.start()
+		return self
+
+	async def __aexit__(self, exc_type, exc_val, exc_tb):
+		await self.close()
+
+	@property
+	def contexts(self) -> int:
+		return sum(slot.contexts for slot in self._slots)
+
+	@time_execution_async('--start (browser pool)')
+	async def start(self) -> None:
+		"""Launch the browsers and open contexts_per_browser contexts on each"""
+		await asyncio.gather(*(slot.browser.get_playwright_browser() for slot in self._slots))
+		missing = self.config.browsers * self.config.contexts_per_browser - self.contexts
+		contexts = await asyncio.gather(*(self._open_context() for _ in range(missing)), return_exceptions=True)
+		for pooled in contexts:
+			if isinstance(pooled, BaseException):
+				logger.warning(f'Failed to pre-warm browser context: {type(pooled).__name__}: {pooled}')
+			else:
+				self._idle.append(pooled)
+		logger.debug(f'🏊 Browser pool started with {len(self._slots)} browsers and {len(self._idle)} contexts')
+
+	async def acquire(self) -> BrowserContext:
+		"""Lease a healthy context, waiting while max_concurrency contexts are leased. Hand it back with release()."""
+		if self._closed:
+			raise RuntimeError('Browser pool is closed')
+
+		start_time = time.perf_counter()
+		self._waiting += 1
+		try:
+			await self._semaphore.acquire()
+		finally:
+			self._waiting -= 1
+		# The pool may have been closed while this lease was waiting
+		if self._closed:
+			self._semaphore.release()
+			raise RuntimeError('Browser pool is closed')
+
+		try:
+			pooled = None
+			while self._idle and pooled is None:
+				candidate = self._idle.popleft()
+				try:
+					healthy = await self._is_healthy(candidate)
+				except BaseException:
+					self._idle.appendleft(candidate)
+					raise
+				if healthy:
+					pooled = candidate
+				else:
+					self._unhealthy += 1
+					await self._close_context(candidate)
+					self._replace_in_background()
+			if pooled is None:
+				self._cold_starts += 1
+				pooled = await self._open_context()
+		except BaseException:
+			self._semaphore.release()
+			raise
+
+		self._leased[pooled.context] = pooled
+		self._leases += 1
+		self._peak_leased = max(self._peak_leased, len(self._leased))
+		self._total_wait_time += time.perf_counter() - start_time
+		return pooled.context
+
+	async def release(self, context: BrowserContext) -> None:
+		"""Return a leased context. It is reset for the next lease, or replaced once it ran max_tasks_per_context tasks."""
+		pooled = self._leased.pop(context)
+		pooled.tasks += 1
+		reused = False
+		try:
+			if self._closed:
+				pass  # closed below, without a replacement
+			elif pooled.tasks >= self.config.max_tasks_per_context:
+				self._recycled += 1
+			elif await self._reset_context(pooled):
+				self._idle.append(pooled)
+				reused = True
+			else:
+				self._unhealthy += 1
+		finally:
+			# Also reached when the release is cancelled halfway through the reset: a context that was not reset is closed,
+			# shielded so that a second cancellation cannot lose it with its slot still counted
+			try:
+				if not reused:
+					try:
+						await asyncio.shield(self._close_context(pooled))
+					finally:
+						if not self._closed:
+							self._replace_in_background()
+			finally:
+				self._semaphore.release()
+
+	@asynccontextmanager
+	async def lease(self) -> AsyncIterator[BrowserContext]:
+		"""Lease a context for the duration of the block"""
+		context = await self.acquire()
+		try:
+			yield context
+		finally:
+			await self.release(context)
+
+	def get_metrics(self) -> BrowserPoolMetrics:
+		"""Current utilization and lifetime counters of the pool"""
+		return BrowserPoolMetrics(
+			browsers=len(self._slots),
+			contexts=self.contexts,
+			idle=len(self._idle),
+			leased=len(self._leased),
+			waiting=self._waiting,
+			max_concurrency=self.max_concurrency,
+			utilization=len(self._leased) / self.max_concurrency,
+			peak_leased=self._peak_leased,
+			leases=self._leases,
+			cold_starts=self._cold_starts,
+			recycled=self._recycled,
+			unhealthy=self._unhealthy,
+			browser_restarts=self._browser_restarts,
+			average_wait_time=self._total_wait_time / self._leases if self._leases else 0.0,
+		)
+
+	async def close(self) -> None:
+		"""Close all idle contexts and browsers. Contexts still leased are closed when they are released."""
+		self._closed = True
+		for task in list(self._background_tasks):
+			task.cancel()
+		await asyncio.gather(*self._background_tasks, return_exceptions=True)
+
+		idle, self._idle = list(self._idle), deque()
+		await asyncio.gather(*(self._close_context(pooled) for pooled in idle))
+		await asyncio.gather(*(self._stop_browser(slot.browser) for slot in self._slots))
+
+	async def _open_context(self) -> _PooledContext:
+		"""Open a context on the browser with the fewest contexts, relaunching it if it died"""
+		# A stopped browser would be launched again by get_session(), and nothing would stop it
+		if self._closed:
+			raise RuntimeError('Browser pool is closed')
+		slot = min(self._slots, key=lambda slot: slot.contexts)
+		self._opening += 1
+		try:
+			async with slot.restart_lock:
+				playwright_browser = slot.browser.playwright_browser
+				if playwright_browser is not None and not playwright_browser.is_connected():
+					await self._restart_browser(slot)
+		finally:
+			self._opening -= 1
+		if self._closed:
+			# Closed while the browser was being relaunched: stop it again, close() may have missed the new one
+			await self._stop_browser(slot.browser)
+			raise RuntimeError('Browser pool is closed')
+
+		slot.contexts += 1
+		context = BrowserContext(browser=slot.browser, config=self.context_config)
+		pooled = _PooledContext(context=context, slot=slot)
+
+		def record_origin(request):
+			url = urlparse(request.url)
+			if request.is_navigation_request() and url.scheme in ('http', 'https'):
+				pooled.origins.add(f'{url.scheme}://{url.netloc}')
+
+		try:
+			session = await context.get_session()
+			session.context.on('request', record_origin)
+		except BaseException:
+			slot.contexts -= 1
+			raise
+		if self._closed:
+			# get_session() may have launched the browser again after close() stopped it
+			await self._close_context(pooled)
+			await self._stop_browser(slot.browser)
+			raise RuntimeError('Browser pool is closed')
+		return pooled
+
+	async def _close_context(self, pooled: _PooledContext) -> None:
+		# Contexts of a browser that was restarted are already gone and were not counted on the new one
+		if pooled.context.browser is pooled.slot.browser:
+			pooled.slot.contexts -= 1
+		try:
+			await pooled.context.close()
+		except Exception as e:
+			logger.debug(f'Failed to close pooled browser context: {type(e).__name__}: {e}')
+
+	async def _is_healthy(self, pooled: _PooledContext) -> bool:
+		context = pooled.context
+		playwright_browser = context.browser.playwright_browser
+		if context.browser is not pooled.slot.browser or playwright_browser is None or not playwright_browser.is_connected():
+			return False
+		if context.session is None:
+			return False
+
+		try:
+			page = await asyncio.wait_for(context.get_current_page(), self.config.health_check_timeout)
+			await asyncio.wait_for(page.evaluate('1'), self.config.health_check_timeout)
+		except Exception as e:
+			logger.debug(f'Pooled browser context failed the health check: {type(e).__name__}: {e}')
+			return False
+		return True
+
+	async def _reset_context(self, pooled: _PooledContext) -> bool:
+		"""
+		Replace all tabs by a blank one and clear cookies, permissions, the HTTP cache and the storage of every origin
+		the context visited. Returns False if the context is broken or cannot be cleared, and then has to be closed.
+		"""
+		if not await self._is_healthy(pooled):
+			return False
+
+		session = pooled.context.session
+		assert session is not None
+		# With a cookies file the cookies are meant to be shared, and closing the context saves them
+		storage_types = 'all'
+		if self.context_config.cookies_file:
+			storage_types = 'file_systems,indexeddb,local_storage,service_workers,cache_storage'
+		try:
+			# A new tab, because session storage and the history of the old ones survive navigating them away
+			old_pages = session.context.pages
+			page = await session.context.new_page()
+			for old_page in old_pages:
+				await old_page.close()
+
+			cdp_session = await session.context.new_cdp_session(page)
+			try:
+				for origin in pooled.origins:
+					await cdp_session.send('Storage.clearDataForOrigin', {'origin': origin, 'storageTypes': storage_types})
+				await cdp_session.send('Network.clearBrowserCache')
+			finally:
+				await cdp_session.detach()
+			if not self.context_config.cookies_file:
+				await session.context.clear_cookies()
+			await session.context.clear_permissions()
+		except Exception as e:
+			logger.debug(f'Failed to reset pooled browser context: {type(e).__name__}: {e}')
+			return False
+
+		pooled.origins.clear()
+		session.cached_state = None
+		pooled.context.state.target_id = None
+		pooled.context.active_tab = page
+		return True
+
+	def _replace_in_background(self) -> None:
+		"""Open a context to take the place of a closed one, so the next lease finds it warm"""
+
+		async def replace():
+			# A lease may have opened one in the meantime
+			if self._closed or self.contexts + self._opening >= self.config.browsers * self.config.contexts_per_browser:
+				return
+			try:
+				self._idle.append(await self._open_context())
+			except Exception as e:
+				logger.warning(f'Failed to open replacement browser context: {type(e).__name__}: {e}')
+
+		task = asyncio.create_task(replace())
+		self._background_tasks.add(task)
+		task.add_done_callback(self._background_tasks.discard)
+
+	async def _restart_browser(self, slot: _PooledBrowser) -> None:
+		logger.warning('🏊 Pooled browser disconnected, launching a new one')
+		self._browser_restarts += 1
+		await self._stop_browser(slot.browser)
+		slot.browser = Browser(config=self.config.browser_config)
+		slot.contexts = 0
+		await slot.browser.get_playwright_browser()
+
+	@staticmethod
+	async def _stop_browser(browser: Browser) -> None:
+		# Not Browser.close(): it also closes every httpx client in the process, including those of agents that are still running
+		try:
+			if browser.playwright_browser:
+				await browser.playwright_browser.close()
+			if browser.playwright:
+				await browser.playwright.stop()
+		except Exception as e:
+			logger.debug(f'Failed to stop pooled browser: {type(e).__name__}: {e}')
+		finally:
+			browser.playwright_browser = None
+			browser.playwright = None
+
+		if chrome_proc := getattr(browser, '_chrome_subprocess', None):
+			try:
+				# Kill the children too, otherwise chrome leaves a bunch of zombie processes
+				for proc in chrome_proc.children(recursive=True):
+					proc.kill()
+				chrome_proc.kill()
+			except Exception as e:
+				logger.debug(f'Failed to terminate pooled chrome subprocess: {type(e).__name__}: {e}')
+			finally:
+				browser._chrome_subprocess = None
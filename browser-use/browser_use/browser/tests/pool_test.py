@@ -0,0 +1,198 @@
+import asyncio
+
+import pytest
+
+from browser_use.browser.browser import BrowserConfig
+from browser_use.browser.pool import BrowserPool, BrowserPoolConfig
+
+
+async def test_pool_caps_concurrency_and_recycles_contexts():
+	config = BrowserPoolConfig(
+		browsers=1,
+		contexts_per_browser=2,
+		max_tasks_per_context=2,
+		browser_config=BrowserConfig(headless=True),
+	)
+	running = 0
+	max_running = 0
+
+	async with BrowserPool(config) as pool:
+		assert pool.get_metrics().idle == 2
+
+		async def task(i: int):
+			nonlocal running, max_running
+			async with pool.lease() as context:
+				running += 1
+				max_running = max(max_running, running)
+				page = await context.get_current_page()
+				await page.goto(f'data:text/html,<title>task {i}</title>')
+				assert await page.title() == f'task {i}'
+				await asyncio.sleep(0.2)
+				running -= 1
+
+		await asyncio.gather(*(task(i) for i in range(6)))
+		# Let replacement contexts finish opening
+		await asyncio.sleep(1)
+
+		metrics = pool.get_metrics()
+		assert max_running == 2
+		assert metrics.peak_leased == 2
+		assert metrics.leases == 6
+		assert metrics.recycled == 3
+		assert metrics.leased == 0
+		assert metrics.browsers == 1
+
+		# A released context is reset before the next lease
+		async with pool.lease() as context:
+			page = await context.get_current_page()
+			assert page.url == 'about:blank'
+
+
+async def serve_test_origin(context):
+	"""Serve an empty page for https://pool.test, so the test has an origin with cookies and storage"""
+	session = await context.get_session()
+	await session.context.route(
+		'https://pool.test/**', lambda route: route.fulfill(body='<html><body></body></html>', content_type='text/html')
+	)
+	return session
+
+
+async def test_pool_gives_every_lease_a_new_context_by_default():
+	config = BrowserPoolConfig(browsers=1, contexts_per_browser=1, browser_config=BrowserConfig(headless=True))
+
+	async with BrowserPool(config) as pool:
+		async with pool.lease() as first:
+			session = await serve_test_origin(first)
+			page = await first.get_current_page()
+			await page.goto('https://pool.test/')
+			await page.evaluate("localStorage.setItem('secret', '1')")
+			await session.context.add_cookies([{'name': 'secret', 'value': '1', 'url': 'https://pool.test'}])
+
+		async with pool.lease() as second:
+			assert second is not first
+			session = await serve_test_origin(second)
+			assert await session.context.cookies() == []
+			page = await second.get_current_page()
+			await page.goto('https://pool.test/')
+			assert await page.evaluate("localStorage.getItem('secret')") is None
+
+		assert pool.get_metrics().recycled == 2
+
+
+async def test_reused_context_is_cleared_between_leases():
+	config = BrowserPoolConfig(
+		browsers=1,
+		contexts_per_browser=1,
+		max_tasks_per_context=2,
+		browser_config=BrowserConfig(headless=True),
+	)
+
+	async with BrowserPool(config) as pool:
+		async with pool.lease() as first:
+			session = await serve_test_origin(first)
+			page = await first.get_current_page()
+			await page.goto('https://pool.test/')
+			await page.evaluate("localStorage.setItem('secret', '1'); sessionStorage.setItem('secret', '1')")
+			await session.context.add_cookies([{'name': 'secret', 'value': '1', 'url': 'https://pool.test'}])
+			await session.context.new_page()
+
+		async with pool.lease() as second:
+			assert second is first
+			assert len(session.context.pages) == 1
+			assert session.context.pages[0].url == 'about:blank'
+			assert await session.context.cookies() == []
+			page = await second.get_current_page()
+			await page.goto('https://pool.test/')
+			assert await page.evaluate("localStorage.getItem('secret')") is None
+			assert await page.evaluate("sessionStorage.getItem('secret')") is None
+
+		metrics = pool.get_metrics()
+		assert metrics.recycled == 1
+		assert metrics.unhealthy == 0
+
+
+async def test_unhealthy_context_is_replaced():
+	config = BrowserPoolConfig(
+		browsers=1,
+		contexts_per_browser=1,
+		max_tasks_per_context=2,
+		health_check_timeout=1.0,
+		browser_config=BrowserConfig(headless=True),
+	)
+
+	async with BrowserPool(config) as pool:
+		async with pool.lease() as first:
+			page = await first.get_current_page()
+			# The page stops answering, so the health check on release times out
+			hung = asyncio.create_task(page.evaluate('while (true) {}'))
+			await asyncio.sleep(0.5)
+
+		await asyncio.gather(hung, return_exceptions=True)
+		assert pool.get_metrics().unhealthy == 1
+
+		async with pool.lease() as second:
+			assert second is not first
+			page = await second.get_current_page()
+			await page.goto('data:text/html,<title>replacement</title>')
+			assert await page.title() == 'replacement'
+
+		metrics = pool.get_metrics()
+		assert metrics.contexts == 1
+		assert metrics.leased == 0
+
+
+async def test_disconnected_browser_is_relaunched():
+	config = BrowserPoolConfig(browsers=1, contexts_per_browser=1, browser_config=BrowserConfig(headless=True))
+
+	async with BrowserPool(config) as pool:
+		async with pool.lease() as first:
+			await first.browser.playwright_browser.close()
+
+		async with pool.lease() as second:
+			assert second.browser is not first.browser
+			assert second.browser.playwright_browser.is_connected()
+			page = await second.get_current_page()
+			await page.goto('data:text/html,<title>relaunched</title>')
+			assert await page.title() == 'relaunched'
+
+		metrics = pool.get_metrics()
+		assert metrics.browser_restarts == 1
+		assert metrics.browsers == 1
+		assert metrics.contexts == 1
+
+
+async def test_close_with_contexts_still_leased():
+	config = BrowserPoolConfig(
+		browsers=1,
+		contexts_per_browser=2,
+		max_concurrency=1,
+		browser_config=BrowserConfig(headless=True),
+	)
+	pool = BrowserPool(config)
+	await pool.start()
+
+	context = await pool.acquire()
+	waiter = asyncio.create_task(pool.acquire())
+	await asyncio.sleep(0.1)
+	assert pool.get_metrics().waiting == 1
+
+	await pool.close()
+	assert context.browser.playwright_browser is None
+	with pytest.raises(RuntimeError):
+		await pool.acquire()
+
+	# The leased context is closed on release instead of going back to the pool
+	await pool.release(context)
+	assert context.session is None
+	# The lease that was waiting fails instead of launching the stopped browser again
+	with pytest.raises(RuntimeError):
+		await waiter
+	assert context.browser.playwright_browser is None
+	metrics = pool.get_metrics()
+	assert metrics.contexts == 0
+	assert metrics.idle == 0
+	assert metrics.leased == 0
+
+
+if __name__ == '__main__':
+	asyncio.run(test_pool_caps_concurrency_and_recycles_contexts())
@@ -1,9 +1,14 @@
 import asyncio
 import base64
+import io
+import weakref
+from types import SimpleNamespace
 
 import pytest
 
 from browser_use.browser.browser import Browser, BrowserConfig
+from browser_use.browser.context import BrowserContext, BrowserContextConfig
+from browser_use.browser.utils.screenshot import fingerprints_match, screenshot_fingerprint
 
 
 async def test_take_full_page_screenshot():
@@ -32,5 +37,105 @@ async def test_take_full_page_screenshot():
 		await browser.close()
 
 
+async def test_screenshot_format_size_and_skip_unchanged():
+	browser = Browser(config=BrowserConfig(headless=True))
+	config = BrowserContextConfig(
+		screenshot_format='jpeg',
+		screenshot_quality=60,
+		screenshot_max_width=640,
+		screenshot_skip_unchanged=True,
+	)
+	try:
+		async with await browser.new_context(config=config) as context:
+			page = await context.get_current_page()
+			await page.goto('https://example.com')
+			await page.evaluate("document.body.insertAdjacentHTML('beforeend', '<input id=\"q\">')")
+
+			first = await context.get_state()
+			assert first.screenshot_format == 'jpeg'
+			assert not first.screenshot_unchanged
+			data = base64.b64decode(first.screenshot)
+			assert data.startswith(b'\xff\xd8')  # JPEG magic bytes
+
+			# Nothing changed on the page, so the next state leaves the screenshot out
+			second = await context.get_state()
+			assert second.screenshot is None
+			assert second.screenshot_unchanged
+
+			# A single typed character is a small change, but a change
+			await page.fill('#q', 'a')
+			third = await context.get_state()
+			assert third.screenshot is not None
+			assert not third.screenshot_unchanged
+	finally:
+		await browser.close()
+
+
+def render_form(text: str = '', checked: bool = False, image_format: str = 'PNG', quality: int = 80) -> bytes:
+	"""A 1280x1100 form with a text input and a checkbox, encoded like a screenshot"""
+	Image = pytest.importorskip('PIL.Image')
+	ImageDraw = pytest.importorskip('PIL.ImageDraw')
+
+	image = Image.new('RGB', (1280, 1100), 'white')
+	draw = ImageDraw.Draw(image)
+	draw.text((100, 80), 'Sign in to continue', fill='black')
+	draw.rectangle((100, 120, 400, 150), outline='gray')
+	draw.text((108, 130), text, fill='black')
+	draw.rectangle((100, 180, 113, 193), outline='gray')
+	if checked:
+		draw.line((102, 187, 106, 191, 111, 182), fill='black', width=2)
+
+	buffer = io.BytesIO()
+	image.save(buffer, format=image_format, **({'quality': quality} if image_format == 'JPEG' else {}))
+	return buffer.getvalue()
+
+
+def test_fingerprint_ignores_encoding_noise():
+	assert fingerprints_match(screenshot_fingerprint(render_form()), screenshot_fingerprint(render_form()))
+	assert fingerprints_match(
+		screenshot_fingerprint(render_form(image_format='JPEG', quality=80)),
+		screenshot_fingerprint(render_form(image_format='JPEG', quality=70)),
+	)
+
+
+def test_fingerprint_sees_small_changes():
+	blank = screenshot_fingerprint(render_form())
+	# A typed character or a ticked checkbox is a tiny part of the viewport, but must not count as unchanged
+	assert not fingerprints_match(blank, screenshot_fingerprint(render_form(text='a')))
+	assert not fingerprints_match(blank, screenshot_fingerprint(render_form(checked=True)))
+	assert not fingerprints_match(
+		screenshot_fingerprint(render_form(text='abc', image_format='JPEG')),
+		screenshot_fingerprint(render_form(text='abe', image_format='JPEG')),
+	)
+
+
 if __name__ == '__main__':
 	asyncio.run(test_take_full_page_screenshot())
+
+
+class FakePage:
+	"""Stands in for a Page as a key of the per-page fingerprints"""
+
+
+async def test_skip_unchanged_compares_with_last_sent_screenshot():
+	Image = pytest.importorskip('PIL.Image')
+
+	def frame(gray: int) -> bytes:
+		buffer = io.BytesIO()
+		Image.new('RGB', (1280, 1100), (gray, gray, gray)).save(buffer, format='PNG')
+		return buffer.getvalue()
+
+	# Each frame is 3 gray levels darker than the one before: too little per step, 6 after two steps
+	frames = [frame(250), frame(247), frame(244), frame(241)]
+
+	async def capture_screenshot(page, full_page=False):
+		return frames.pop(0), 'png'
+
+	context = BrowserContext(browser=Browser(), config=BrowserContextConfig(screenshot_skip_unchanged=True))
+	context._capture_screenshot = capture_screenshot
+	session = SimpleNamespace(screenshot_fingerprints=weakref.WeakKeyDictionary())
+	page = FakePage()
+
+	results = [await context._take_state_screenshot(session, page) for _ in range(4)]
+	assert [unchanged for _, _, unchanged in results] == [False, True, False, True]
+	assert results[2][0] is not None
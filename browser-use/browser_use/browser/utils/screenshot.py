@@ -0,0 +1,34 @@
+import hashlib
+import io
+
+# Frames are compared as THUMBNAIL_SIZE x THUMBNAIL_SIZE grayscale block averages. On a 1280x1100 viewport
+# a cell is 10x9 pixels, so a single changed character, a toggled checkbox or a line of error text moves
+# its cell by more than MAX_CELL_DIFFERENCE, while JPEG/WebP compression noise mostly averages out.
+THUMBNAIL_SIZE = 128
+MAX_CELL_DIFFERENCE = 4  # gray levels (0-255)
+
+
+def screenshot_fingerprint(data: bytes) -> bytes:
+	"""
+	Fingerprint of an encoded screenshot, to compare with the next one using fingerprints_match.
+
+	A grayscale thumbnail when Pillow is installed, otherwise a digest of the encoded bytes,
+	which only matches identical frames.
+	"""
+	try:
+		from PIL import Image
+	except ImportError:
+		return b'sha1:' + hashlib.sha1(data).digest()
+
+	with Image.open(io.BytesIO(data)) as image:
+		thumbnail = image.convert('L').resize((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.Resampling.BOX)
+		return b'gray:' + thumbnail.tobytes()
+
+
+def fingerprints_match(previous: bytes, current: bytes) -> bool:
+	"""Whether two screenshot fingerprints show the same page: no thumbnail cell differs by more than MAX_CELL_DIFFERENCE"""
+	if previous[:5] != current[:5] or len(previous) != len(current):
+		return False
+	if current.startswith(b'sha1:'):
+		return previous == current
+	return max(abs(a - b) for a, b in zip(previous[5:], current[5:])) <= MAX_CELL_DIFFERENCE
@@ -1,3 +1,4 @@
+from collections import Counter
 from dataclasses import dataclass, field
 from typing import Any, Optional
 
@@ -33,9 +34,23 @@ class BrowserState(DOMState):
 	title: str
 	tabs: list[TabInfo]
 	screenshot: Optional[str] = None
+	screenshot_format: str = 'png'
+	screenshot_unchanged: bool = False  # screenshot left out because the page looks the same as in the last screenshot sent
 	pixels_above: int = 0
 	pixels_below: int = 0
 	browser_errors: list[str] = field(default_factory=list)
+	timings: dict[str, float] = field(default_factory=dict)  # seconds per state capture phase, see BrowserContext._update_state
+
+
+@dataclass
+class NetworkIdleStats:
+	"""Network idle waits of one page, see BrowserContext._wait_for_stable_network"""
+
+	waits: int = 0
+	timeouts: int = 0
+	total_wait_time: float = 0.0
+	# Seconds each URL was pending while the page was waited on, the largest ones delayed readiness the most
+	delaying_requests: Counter[str] = field(default_factory=Counter)
 
 
 @dataclass
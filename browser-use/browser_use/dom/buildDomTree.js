@@ -6,7 +6,7 @@
     debugMode: false,
   }
 ) => {
-  const { doHighlightElements, focusHighlightIndex, viewportExpansion, debugMode } = args;
+  const { doHighlightElements, focusHighlightIndex, viewportExpansion, debugMode, incremental = false, sinceGeneration = null } = args;
   let highlightIndex = 0; // Reset highlight index
 
   // Add timing stack to handle recursion
@@ -186,6 +186,186 @@
   const ID = { current: 0 };
 
   const HIGHLIGHT_CONTAINER_ID = "playwright-highlight-container";
+  const HIGHLIGHT_ATTRIBUTE = "browser-user-highlight-id";
+
+  /**
+   * Incremental snapshots (args.incremental).
+   *
+   * State survives between calls on window.__browserUseDomSnapshot: persistent node ids, the elements
+   * included in the last snapshot, their highlight indices and a MutationObserver that collects the
+   * nodes changed since then. When args.sinceGeneration matches the stored generation only the changed
+   * subtrees are rebuilt and returned as patches; anything that cannot be patched safely (scrolling,
+   * iframes or shadow roots, changes to body itself or too many changes) falls back to a full build.
+   */
+  const SNAPSHOT_KEY = "__browserUseDomSnapshot";
+  const MAX_DIRTY_NODES = 1000; // mutated nodes tracked before giving up and rebuilding everything
+  const MAX_PATCH_ROOTS = 50; // changed subtrees rebuilt separately
+  const MAX_PATCH_RATIO = 0.3; // share of the page's elements a patch may cover before a full build is cheaper
+
+  let snapshot = null; // window[SNAPSHOT_KEY] while building incrementally
+
+  function currentViewport() {
+    return { scrollX: window.scrollX, scrollY: window.scrollY, width: window.innerWidth, height: window.innerHeight };
+  }
+
+  function isOwnMutation(record) {
+    // Highlights are removed and redrawn around every snapshot and must not mark the page as changed
+    if (record.type === "attributes" && record.attributeName === HIGHLIGHT_ATTRIBUTE) return true;
+    const element = record.target.nodeType === Node.ELEMENT_NODE ? record.target : record.target.parentElement;
+    if (element && element.closest(`#${HIGHLIGHT_CONTAINER_ID}`)) return true;
+    if (record.type === "childList") {
+      const changed = [...record.addedNodes, ...record.removedNodes];
+      return changed.length > 0 && changed.every(node => node.id === HIGHLIGHT_CONTAINER_ID);
+    }
+    return false;
+  }
+
+  function collectMutations(state, records) {
+    for (const record of records) {
+      if (state.overflow) return;
+      if (isOwnMutation(record)) continue;
+      state.dirty.add(record.target);
+      if (state.dirty.size > MAX_DIRTY_NODES) {
+        state.overflow = true;
+        state.dirty.clear();
+      }
+    }
+  }
+
+  function createSnapshotState() {
+    const state = {
+      token: Math.random().toString(36).slice(2),
+      sequence: 0,
+      nextId: 0,
+      ids: new WeakMap(), // node -> persistent id, kept across builds
+      dirty: new Set(),
+      overflow: false,
+      viewportChanged: false,
+    };
+    resetSnapshotState(state);
+    state.observer = new MutationObserver(records => collectMutations(state, records));
+    state.observer.observe(document, { childList: true, subtree: true, attributes: true, characterData: true });
+    // Scrolling changes viewport-dependent flags without any mutation
+    const markViewportChanged = () => { state.viewportChanged = true; };
+    window.addEventListener("scroll", markViewportChanged, { capture: true, passive: true });
+    window.addEventListener("resize", markViewportChanged, { passive: true });
+    return state;
+  }
+
+  function resetSnapshotState(state) {
+    state.included = new WeakSet(); // nodes present in the last snapshot
+    state.highlightIndexes = new WeakMap(); // element -> highlight index, reused when a patch rebuilds it
+    state.highlighted = new Map(); // highlight index -> [element, parentIframe]
+    state.nextHighlightIndex = 0;
+    state.opaque = false; // the tree contains iframes or shadow roots, which the observer cannot see into
+    state.viewportExpansion = viewportExpansion;
+    state.elementCount = document.body.getElementsByTagName("*").length;
+  }
+
+  /**
+   * Returns the included elements whose subtrees changed since the last snapshot (outermost only),
+   * or null if a full build is needed.
+   */
+  function findDirtyRoots(state) {
+    collectMutations(state, state.observer.takeRecords());
+    const viewport = currentViewport();
+    if (
+      state.overflow || state.opaque || state.viewportChanged ||
+      Object.keys(viewport).some(key => viewport[key] !== state.viewport[key])
+    ) {
+      return null;
+    }
+
+    const roots = new Set();
+    for (const node of state.dirty) {
+      // Removed nodes are covered by the childList mutation of their old parent
+      if (!node.isConnected) continue;
+      // Changes outside body (a stylesheet added to head, a class toggled on html) can restyle the whole page
+      if (!document.body.contains(node)) return null;
+      let element = node.nodeType === Node.ELEMENT_NODE ? node : node.parentElement;
+      while (element && !state.included.has(element)) {
+        element = element.parentElement;
+      }
+      if (!element || element === document.body) return null;
+      roots.add(element);
+    }
+
+    const outermost = [...roots].filter(element => ![...roots].some(other => other !== element && other.contains(element)));
+    if (outermost.length > MAX_PATCH_ROOTS) return null;
+    const changedElements = outermost.reduce((count, root) => count + root.getElementsByTagName("*").length + 1, 0);
+    if (changedElements > state.elementCount * MAX_PATCH_RATIO) return null;
+    return outermost;
+  }
+
+  function nodeId(node) {
+    if (!snapshot) return `${ID.current++}`;
+    snapshot.included.add(node);
+    let id = snapshot.ids.get(node);
+    if (id === undefined) {
+      id = `${snapshot.nextId++}`;
+      snapshot.ids.set(node, id);
+    }
+    return id;
+  }
+
+  function nextHighlightIndex(node, parentIframe) {
+    if (!snapshot) return highlightIndex++;
+    // Elements keep their index across patches so unchanged parts of the page keep their numbers
+    let index = snapshot.highlightIndexes.get(node);
+    if (index === undefined || snapshot.highlighted.has(index)) {
+      index = snapshot.nextHighlightIndex++;
+      snapshot.highlightIndexes.set(node, index);
+    }
+    snapshot.highlighted.set(index, [node, parentIframe]);
+    return index;
+  }
+
+  function buildIncrementalSnapshot() {
+    snapshot = window[SNAPSHOT_KEY];
+    if (!snapshot) {
+      snapshot = createSnapshotState();
+      window[SNAPSHOT_KEY] = snapshot;
+    }
+
+    const generation = `${snapshot.token}:${snapshot.sequence}`;
+    const roots = sinceGeneration === generation && snapshot.viewportExpansion === viewportExpansion
+      ? findDirtyRoots(snapshot)
+      : null;
+
+    let result;
+    if (roots === null) {
+      resetSnapshotState(snapshot);
+      result = { mode: "full", rootId: buildDomTree(document.body), map: DOM_HASH_MAP };
+    } else if (roots.length === 0) {
+      result = { mode: "unchanged" };
+    } else {
+      // Forget what the changed subtrees contained; rebuilding them re-adds whatever is still there
+      for (const root of roots) {
+        snapshot.included.delete(root);
+        for (const element of root.getElementsByTagName("*")) snapshot.included.delete(element);
+      }
+      for (const [index, [element]] of snapshot.highlighted) {
+        if (!element.isConnected || roots.some(root => root.contains(element))) snapshot.highlighted.delete(index);
+      }
+      const patches = roots.map(root => ({ target: snapshot.ids.get(root), rootId: buildDomTree(root) }));
+      result = { mode: "patch", patches, map: DOM_HASH_MAP };
+    }
+
+    if (doHighlightElements) {
+      for (const [index, [element, parentIframe]] of snapshot.highlighted) {
+        if (focusHighlightIndex >= 0 && focusHighlightIndex !== index) continue;
+        highlightElement(element, index, parentIframe);
+      }
+    }
+
+    snapshot.dirty.clear();
+    snapshot.overflow = false;
+    snapshot.viewportChanged = false;
+    snapshot.viewport = currentViewport();
+    snapshot.sequence++;
+    result.generation = `${snapshot.token}:${snapshot.sequence}`;
+    return result;
+  }
 
   /**
    * Highlights an element in the DOM and returns the index of the next element.
@@ -891,7 +1071,7 @@
         if (domElement) nodeData.children.push(domElement);
       }
 
-      const id = `${ID.current++}`;
+      const id = nodeId(node);
       DOM_HASH_MAP[id] = nodeData;
       if (debugMode) PERF_METRICS.nodeMetrics.processedNodes++;
       return id;
@@ -918,7 +1098,7 @@
         return null;
       }
 
-      const id = `${ID.current++}`;
+      const id = nodeId(node);
       DOM_HASH_MAP[id] = {
         type: "TEXT_NODE",
         text: textContent,
@@ -983,9 +1163,10 @@
           nodeData.isInteractive = isInteractiveElement(node);
           if (nodeData.isInteractive) {
             nodeData.isInViewport = true;
-            nodeData.highlightIndex = highlightIndex++;
+            nodeData.highlightIndex = nextHighlightIndex(node, parentIframe);
 
-            if (doHighlightElements) {
+            // Incremental snapshots draw all highlights once the tree is patched
+            if (doHighlightElements && !snapshot) {
               if (focusHighlightIndex >= 0) {
                 if (focusHighlightIndex === nodeData.highlightIndex) {
                   highlightElement(node, nodeData.highlightIndex, parentIframe);
@@ -1005,6 +1186,7 @@
 
       // Handle iframes
       if (tagName === "iframe") {
+        if (snapshot) snapshot.opaque = true;
         try {
           const iframeDoc = node.contentDocument || node.contentWindow?.document;
           if (iframeDoc) {
@@ -1035,6 +1217,7 @@
         // Handle shadow DOM
         if (node.shadowRoot) {
           nodeData.shadowRoot = true;
+          if (snapshot) snapshot.opaque = true;
           for (const child of node.shadowRoot.childNodes) {
             const domElement = buildDomTree(child, parentIframe);
             if (domElement) nodeData.children.push(domElement);
@@ -1054,7 +1237,7 @@
       return null;
     }
 
-    const id = `${ID.current++}`;
+    const id = nodeId(node);
     DOM_HASH_MAP[id] = nodeData;
     if (debugMode) PERF_METRICS.nodeMetrics.processedNodes++;
     return id;
@@ -1070,7 +1253,23 @@
   isTextNodeVisible = measureTime(isTextNodeVisible);
   getEffectiveScroll = measureTime(getEffectiveScroll);
 
-  const rootId = buildDomTree(document.body);
+  // Clear highlights left by the previous call, so callers do not need a separate round-trip for it
+  document.getElementById(HIGHLIGHT_CONTAINER_ID)?.remove();
+  for (const element of document.querySelectorAll(`[${HIGHLIGHT_ATTRIBUTE}^="playwright-highlight-"]`)) {
+    element.removeAttribute(HIGHLIGHT_ATTRIBUTE);
+  }
+
+  const result = incremental ?
+    buildIncrementalSnapshot() :
+    { rootId: buildDomTree(document.body), map: DOM_HASH_MAP };
+
+  // Page details the browser state needs anyway, returned here to save their own round-trips
+  result.pageInfo = {
+    title: document.title,
+    scrollY: window.scrollY,
+    viewportHeight: window.innerHeight,
+    scrollHeight: document.documentElement.scrollHeight,
+  };
 
   // Clear the cache before starting
   DOM_CACHE.clearCache();
@@ -1125,7 +1324,6 @@
     }
   }
 
-  return debugMode ?
-    { rootId, map: DOM_HASH_MAP, perfMetrics: PERF_METRICS } :
-    { rootId, map: DOM_HASH_MAP };
+  if (debugMode) result.perfMetrics = PERF_METRICS;
+  return result;
 };
@@ -2,7 +2,7 @@ import hashlib
 from typing import Optional
 
 from browser_use.dom.history_tree_processor.view import DOMHistoryElement, HashedDomElement
-from browser_use.dom.views import DOMElementNode
+from browser_use.dom.views import DOMElementNode, DOMHashIndex
 
 
 class HistoryTreeProcessor:
@@ -32,9 +32,14 @@ class HistoryTreeProcessor:
 		)
 
 	@staticmethod
-	def find_history_element_in_tree(dom_history_element: DOMHistoryElement, tree: DOMElementNode) -> Optional[DOMElementNode]:
+	def find_history_element_in_tree(
+		dom_history_element: DOMHistoryElement, tree: DOMElementNode, hash_index: Optional[DOMHashIndex] = None
+	) -> Optional[DOMElementNode]:
 		hashed_dom_history_element = HistoryTreeProcessor._hash_dom_history_element(dom_history_element)
 
+		if hash_index is not None:
+			return hash_index.elements.get(hashed_dom_history_element)
+
 		def process_node(node: DOMElementNode):
 			if node.highlight_index is not None:
 				hashed_node = HistoryTreeProcessor._hash_dom_element(node)
@@ -49,6 +54,40 @@ class HistoryTreeProcessor:
 
 		return process_node(tree)
 
+	@staticmethod
+	def build_hash_index(tree: DOMElementNode) -> DOMHashIndex:
+		"""Hash every highlighted element of the tree in one top-down pass"""
+		hash_index = DOMHashIndex()
+		HistoryTreeProcessor.add_to_hash_index(hash_index, tree)
+		return hash_index
+
+	@staticmethod
+	def add_to_hash_index(hash_index: DOMHashIndex, dom_element: DOMElementNode) -> None:
+		"""
+		Add the highlighted elements of dom_element's subtree to hash_index and cache each hash on its element.
+
+		Branch paths are extended from the parent's path on the way down instead of walking to the root for every
+		element. The first element in document order wins when two hash the same, as in find_history_element_in_tree.
+		"""
+		stack = [(dom_element, '/'.join(HistoryTreeProcessor._get_parent_branch_path(dom_element)))]
+		while stack:
+			element, branch_path = stack.pop()
+			if element.highlight_index is not None:
+				hashed_element = HashedDomElement(
+					hashlib.sha256(branch_path.encode()).hexdigest(),
+					HistoryTreeProcessor._attributes_hash(element.attributes),
+					HistoryTreeProcessor._xpath_hash(element.xpath),
+				)
+				element._hash = hashed_element
+				hash_index.elements.setdefault(hashed_element, element)
+				hash_index.branch_path_hashes.add(hashed_element.branch_path_hash)
+
+			for child in reversed(element.children):
+				if isinstance(child, DOMElementNode):
+					# The root is not part of the branch path, so its children start it without a separator
+					child_path = f'{branch_path}/{child.tag_name}' if element.parent is not None else child.tag_name
+					stack.append((child, child_path))
+
 	@staticmethod
 	def compare_history_element_and_dom_element(dom_history_element: DOMHistoryElement, dom_element: DOMElementNode) -> bool:
 		hashed_dom_history_element = HistoryTreeProcessor._hash_dom_history_element(dom_history_element)
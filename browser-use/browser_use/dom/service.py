@@ -1,17 +1,20 @@
-import gc
 import json
 import logging
+import sys
 from dataclasses import dataclass
 from importlib import resources
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Iterator, Optional
 from urllib.parse import urlparse
 
 if TYPE_CHECKING:
 	from playwright.async_api import Page
 
+from browser_use.dom.history_tree_processor.service import HistoryTreeProcessor
 from browser_use.dom.views import (
 	DOMBaseNode,
 	DOMElementNode,
+	DOMHashIndex,
+	DOMSnapshot,
 	DOMState,
 	DOMTextNode,
 	SelectorMap,
@@ -28,9 +31,13 @@ class ViewportInfo:
 
 
 class DomService:
-	def __init__(self, page: 'Page'):
+	def __init__(self, page: 'Page', snapshot: Optional[DOMSnapshot] = None):
 		self.page = page
 		self.xpath_cache = {}
+		# Last incremental build; get_clickable_elements(incremental=True) patches it and stores the result here
+		self.snapshot = snapshot
+		# title, scrollY, viewportHeight and scrollHeight of the page, returned by the last buildDomTree.js call
+		self.page_info: dict = {}
 
 		self.js_code = resources.files('browser_use.dom').joinpath('buildDomTree.js').read_text()
 
@@ -41,9 +48,16 @@ class DomService:
 		highlight_elements: bool = True,
 		focus_element: int = -1,
 		viewport_expansion: int = 0,
+		incremental: bool = False,
 	) -> DOMState:
-		element_tree, selector_map = await self._build_dom_tree(highlight_elements, focus_element, viewport_expansion)
-		return DOMState(element_tree=element_tree, selector_map=selector_map)
+		"""
+		With incremental=True, buildDomTree.js only rebuilds the parts of the page that changed since self.snapshot
+		and the cached tree is patched in place, so states returned earlier share (and may see) the patched nodes.
+		"""
+		element_tree, selector_map, hash_index = await self._build_dom_tree(
+			highlight_elements, focus_element, viewport_expansion, incremental
+		)
+		return DOMState(element_tree=element_tree, selector_map=selector_map, hash_index=hash_index)
 
 	@time_execution_async('--get_cross_origin_iframes')
 	async def get_cross_origin_iframes(self) -> list[str]:
@@ -69,11 +83,13 @@ class DomService:
 		highlight_elements: bool,
 		focus_element: int,
 		viewport_expansion: int,
-	) -> tuple[DOMElementNode, SelectorMap]:
+		incremental: bool = False,
+	) -> tuple[DOMElementNode, SelectorMap, DOMHashIndex]:
 		if await self.page.evaluate('1+1') != 2:
 			raise ValueError('The page cannot evaluate javascript code properly')
 
 		if self.page.url == 'about:blank':
+			self.snapshot = None
 			# short-circuit if the page is a new empty tab for speed, no need to inject buildDomTree.js
 			return (
 				DOMElementNode(
@@ -85,6 +101,7 @@ class DomService:
 					parent=None,
 				),
 				{},
+				DOMHashIndex(),
 			)
 
 		# NOTE: We execute JS code in the browser to extract important DOM information.
@@ -96,6 +113,8 @@ class DomService:
 			'focusHighlightIndex': focus_element,
 			'viewportExpansion': viewport_expansion,
 			'debugMode': debug_mode,
+			'incremental': incremental,
+			'sinceGeneration': self._patchable_generation() if incremental else None,
 		}
 
 		try:
@@ -103,6 +122,7 @@ class DomService:
 		except Exception as e:
 			logger.error('Error evaluating JavaScript: %s', e)
 			raise
+		self.page_info = eval_page.get('pageInfo', {})
 
 		# Only log performance metrics in debug mode
 		if debug_mode and 'perfMetrics' in eval_page:
@@ -112,16 +132,32 @@ class DomService:
 				json.dumps(eval_page['perfMetrics'], indent=2),
 			)
 
-		return await self._construct_dom_tree(eval_page)
+		if not incremental:
+			return await self._construct_dom_tree(eval_page)
+
+		patched = await self._apply_snapshot(eval_page)
+		if patched is not None:
+			return patched
+
+		# The page sent a patch for a tree we do not have; ask for a full build instead
+		args['sinceGeneration'] = None
+		eval_page = await self.page.evaluate(self.js_code, args)
+		return await self._apply_snapshot(eval_page)
 
 	@time_execution_async('--construct_dom_tree')
 	async def _construct_dom_tree(
 		self,
 		eval_page: dict,
-	) -> tuple[DOMElementNode, SelectorMap]:
-		js_node_map = eval_page['map']
-		js_root_id = eval_page['rootId']
+	) -> tuple[DOMElementNode, SelectorMap, DOMHashIndex]:
+		node_map, selector_map = self._parse_node_map(eval_page['map'])
+		html_to_dict = node_map[str(eval_page['rootId'])]
+
+		if html_to_dict is None or not isinstance(html_to_dict, DOMElementNode):
+			raise ValueError('Failed to parse HTML to dictionary')
+
+		return html_to_dict, selector_map, HistoryTreeProcessor.build_hash_index(html_to_dict)
 
+	def _parse_node_map(self, js_node_map: dict) -> tuple[dict[str, DOMBaseNode], SelectorMap]:
 		selector_map = {}
 		node_map = {}
 
@@ -147,18 +183,102 @@ class DomService:
 					child_node.parent = node
 					node.children.append(child_node)
 
-		html_to_dict = node_map[str(js_root_id)]
-
-		del node_map
-		del js_node_map
-		del js_root_id
-
-		gc.collect()
-
-		if html_to_dict is None or not isinstance(html_to_dict, DOMElementNode):
-			raise ValueError('Failed to parse HTML to dictionary')
-
-		return html_to_dict, selector_map
+		return node_map, selector_map
+
+	def _patchable_generation(self) -> Optional[str]:
+		"""Generation to patch from, or None to request a full build"""
+		if self.snapshot is None:
+			return None
+		# Patched-away nodes pile up in node_map until the next full build, so start over once they dominate
+		if self.snapshot.stale_nodes > len(self.snapshot.node_map) - self.snapshot.stale_nodes:
+			return None
+		return self.snapshot.generation
+
+	@time_execution_async('--apply_dom_snapshot')
+	async def _apply_snapshot(self, eval_page: dict) -> Optional[tuple[DOMElementNode, SelectorMap, DOMHashIndex]]:
+		"""Update self.snapshot from an incremental buildDomTree.js result; None if the patch does not fit the cached tree"""
+		mode = eval_page['mode']
+		logger.debug('Incremental DOM snapshot: %s (%d patches)', mode, len(eval_page.get('patches', [])))
+
+		if mode == 'full':
+			node_map, selector_map = self._parse_node_map(eval_page['map'])
+			element_tree = node_map[str(eval_page['rootId'])]
+			if not isinstance(element_tree, DOMElementNode):
+				raise ValueError('Failed to parse HTML to dictionary')
+			hash_index = HistoryTreeProcessor.build_hash_index(element_tree)
+			self.snapshot = DOMSnapshot(
+				generation=eval_page['generation'],
+				element_tree=element_tree,
+				selector_map=selector_map,
+				node_map=node_map,
+				hash_index=hash_index,
+			)
+			return element_tree, selector_map, hash_index
+
+		snapshot = self.snapshot
+		if snapshot is None:
+			return None
+
+		if mode == 'unchanged':
+			snapshot.generation = eval_page['generation']
+			return snapshot.element_tree, snapshot.selector_map, snapshot.hash_index
+
+		targets = [snapshot.node_map.get(patch['target']) for patch in eval_page['patches']]
+		if any(target is None or not self._is_attached(target, snapshot.element_tree) for target in targets):
+			self.snapshot = None
+			return None
+
+		new_nodes, new_selector_map = self._parse_node_map(eval_page['map'])
+		selector_map = dict(snapshot.selector_map)
+		hash_index = DOMHashIndex(elements=dict(snapshot.hash_index.elements))
+
+		# Drop everything the old subtrees contributed before adding the rebuilt ones, since highlight indices are reused
+		live_nodes = len(snapshot.node_map) - snapshot.stale_nodes
+		for target in targets:
+			for node in self._iter_subtree(target):
+				live_nodes -= 1
+				if isinstance(node, DOMElementNode) and node.highlight_index is not None:
+					selector_map.pop(node.highlight_index, None)
+					if hash_index.elements.get(node.hash) is node:
+						del hash_index.elements[node.hash]
+
+		for patch, target in zip(eval_page['patches'], targets):
+			parent = target.parent
+			position = next(i for i, child in enumerate(parent.children) if child is target)
+			new_node = new_nodes.get(str(patch['rootId'])) if patch['rootId'] is not None else None
+			if new_node is None:
+				del parent.children[position]
+			else:
+				new_node.parent = parent
+				parent.children[position] = new_node
+				HistoryTreeProcessor.add_to_hash_index(hash_index, new_node)
+		hash_index.branch_path_hashes = {hashed.branch_path_hash for hashed in hash_index.elements}
+
+		snapshot.node_map.update(new_nodes)
+		snapshot.stale_nodes = len(snapshot.node_map) - live_nodes - len(new_nodes)
+		selector_map.update(new_selector_map)
+		snapshot.selector_map = selector_map
+		snapshot.hash_index = hash_index
+		snapshot.generation = eval_page['generation']
+		return snapshot.element_tree, selector_map, hash_index
+
+	@staticmethod
+	def _is_attached(node: DOMBaseNode, root: DOMElementNode) -> bool:
+		# Patched-away subtrees keep their parent pointers, so check that every step is still a child of its parent
+		while node.parent is not None:
+			if not any(child is node for child in node.parent.children):
+				return False
+			node = node.parent
+		return node is root
+
+	@staticmethod
+	def _iter_subtree(node: DOMBaseNode) -> Iterator[DOMBaseNode]:
+		stack = [node]
+		while stack:
+			current = stack.pop()
+			yield current
+			if isinstance(current, DOMElementNode):
+				stack.extend(current.children)
 
 	def _parse_node(
 		self,
@@ -187,7 +307,8 @@ class DomService:
 			)
 
 		element_node = DOMElementNode(
-			tag_name=node_data['tagName'],
+			# Tag names repeat across thousands of nodes; interning shares one string instead of one per node
+			tag_name=sys.intern(node_data['tagName']),
 			xpath=node_data['xpath'],
 			attributes=node_data.get('attributes', {}),
 			children=[],
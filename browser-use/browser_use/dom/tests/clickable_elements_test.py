@@ -0,0 +1,198 @@
+"""
+Checks clickable_elements_to_string against the previous recursive implementation and benchmarks both on large trees.
+
+Run with: pytest browser_use/dom/tests/clickable_elements_test.py -s
+"""
+
+import sys
+import threading
+import time
+
+from browser_use.dom.views import DOMBaseNode, DOMElementNode, DOMTextNode
+
+
+def recursive_clickable_elements_to_string(root: DOMElementNode, include_attributes: list[str] | None = None) -> str:
+	"""The previous implementation: collects text per highlighted element and walks to the root for every text node"""
+	formatted_text = []
+
+	def process_node(node: DOMBaseNode, depth: int) -> None:
+		if isinstance(node, DOMElementNode):
+			if node.highlight_index is not None:
+				attributes_str = ''
+				text = node.get_all_text_till_next_clickable_element()
+				if include_attributes:
+					attributes = list(
+						dict.fromkeys(
+							str(value)
+							for key, value in node.attributes.items()
+							if key in include_attributes and value != node.tag_name
+						)
+					)
+					if text in attributes:
+						attributes.remove(text)
+					attributes_str = ';'.join(attributes)
+				line = f'[{node.highlight_index}]<{node.tag_name} '
+				if attributes_str:
+					line += f'{attributes_str}'
+				if text:
+					if attributes_str:
+						line += f'>{text}'
+					else:
+						line += f'{text}'
+				line += '/>'
+				formatted_text.append(line)
+
+			for child in node.children:
+				process_node(child, depth + 1)
+
+		elif isinstance(node, DOMTextNode):
+			if not node.has_parent_with_highlight_index() and node.is_visible:
+				formatted_text.append(f'{node.text}')
+
+	process_node(root, 0)
+	return '\n'.join(formatted_text)
+
+
+def build_tree(depth: int, fanout: int) -> DOMElementNode:
+	"""Balanced tree with every third element highlighted, nested highlights and some invisible text"""
+	counter = 0
+
+	def add_element(parent: DOMElementNode | None, level: int, xpath: str) -> DOMElementNode:
+		nonlocal counter
+		counter += 1
+		node = DOMElementNode(
+			tag_name='button' if counter % 3 == 0 else 'div',
+			xpath=xpath,
+			attributes={'class': f'item-{counter % 7}', 'aria-label': 'button' if counter % 5 == 0 else f'label {counter}'},
+			children=[],
+			is_visible=True,
+			parent=parent,
+			highlight_index=counter if counter % 3 == 0 else None,
+		)
+		node.children.append(DOMTextNode(text=f'text {counter}', is_visible=counter % 4 != 0, parent=node))
+		if level < depth:
+			for i in range(fanout):
+				node.children.append(add_element(node, level + 1, f'{xpath}/div[{i + 1}]'))
+		node.children.append(DOMTextNode(text=f'tail {counter}', is_visible=True, parent=node))
+		return node
+
+	return add_element(None, 0, 'html/body')
+
+
+def build_chain(length: int) -> DOMElementNode:
+	"""A single path of nested elements, deeper than the default recursion limit"""
+	root = DOMElementNode(tag_name='body', xpath='/body', attributes={}, children=[], is_visible=True, parent=None)
+	current = root
+	for i in range(length):
+		child = DOMElementNode(
+			tag_name='span',
+			xpath=f'{current.xpath}/span',
+			attributes={},
+			children=[],
+			is_visible=True,
+			parent=current,
+			highlight_index=i if i % 100 == 0 else None,
+		)
+		current.children.append(child)
+		current.children.append(DOMTextNode(text=f'level {i}', is_visible=True, parent=current))
+		current = child
+	return root
+
+
+def build_deep_tree(depth: int) -> DOMElementNode:
+	"""A nested chain deeper than the recursion limit, with a highlighted side branch and text at every level"""
+	root = DOMElementNode(tag_name='body', xpath='/body', attributes={}, children=[], is_visible=True, parent=None)
+	current = root
+	for i in range(depth):
+		side = DOMElementNode(
+			tag_name='button',
+			xpath=f'{current.xpath}/button',
+			attributes={'aria-label': f'side {i}'},
+			children=[],
+			is_visible=True,
+			parent=current,
+			highlight_index=depth + i if i % 3 == 0 else None,
+		)
+		side.children.append(DOMTextNode(text=f'side text {i}', is_visible=i % 5 != 0, parent=side))
+		child = DOMElementNode(
+			tag_name='div',
+			xpath=f'{current.xpath}/div',
+			attributes={'class': f'level-{i % 4}'},
+			children=[],
+			is_visible=True,
+			parent=current,
+			highlight_index=i if i % 7 == 0 else None,
+		)
+		current.children.extend([DOMTextNode(text=f'before {i}', is_visible=True, parent=current), side, child])
+		current.children.append(DOMTextNode(text=f'after {i}', is_visible=True, parent=current))
+		current = child
+	return root
+
+
+def run_with_deep_recursion(func, *args):
+	"""Run a recursive function on a deep tree: raise the recursion limit and use a thread with a large stack"""
+	result = []
+	old_limit, old_stack_size = sys.getrecursionlimit(), threading.stack_size()
+	sys.setrecursionlimit(100_000)
+	threading.stack_size(512 * 1024 * 1024)
+	try:
+		thread = threading.Thread(target=lambda: result.append(func(*args)))
+		thread.start()
+		thread.join()
+	finally:
+		threading.stack_size(old_stack_size)
+		sys.setrecursionlimit(old_limit)
+	return result[0]
+
+
+def test_matches_recursive_implementation():
+	tree = build_tree(depth=4, fanout=4)
+	for include_attributes in (None, ['class', 'aria-label'], ['aria-label']):
+		assert tree.clickable_elements_to_string(include_attributes) == recursive_clickable_elements_to_string(
+			tree, include_attributes
+		)
+
+	# Starting below a highlighted element: text outside nested highlights belongs to that ancestor and is left out
+	subtree = next(child for child in tree.children if isinstance(child, DOMElementNode) and child.highlight_index is None)
+	assert subtree.parent is not None and subtree.parent.highlight_index is None
+	highlighted = next(
+		child for child in subtree.children if isinstance(child, DOMElementNode) and child.highlight_index is not None
+	)
+	inner = next(child for child in highlighted.children if isinstance(child, DOMElementNode))
+	for start in (subtree, highlighted, inner):
+		assert start.clickable_elements_to_string(['class']) == recursive_clickable_elements_to_string(start, ['class'])
+
+
+def test_deep_tree_does_not_recurse():
+	output = build_chain(5000).clickable_elements_to_string()
+	# Text follows the nested span in document order, so the deepest level comes first
+	assert output.startswith('[0]<span level 100\nlevel 99\n')
+	assert output.count('/>') == 50
+	assert output.endswith('level 4901/>\nlevel 0')
+
+
+def test_deep_tree_matches_recursive_implementation():
+	depth = 2 * sys.getrecursionlimit()
+	tree = build_deep_tree(depth)
+	include_attributes = ['class', 'aria-label']
+
+	output = tree.clickable_elements_to_string(include_attributes)
+
+	assert output == run_with_deep_recursion(recursive_clickable_elements_to_string, tree, include_attributes)
+	assert output.count('/>') == len(range(0, depth, 3)) + len(range(0, depth, 7))
+
+
+def test_benchmark_against_recursive_implementation():
+	tree = build_tree(depth=6, fanout=5)
+	include_attributes = ['class', 'aria-label']
+
+	start = time.perf_counter()
+	expected = recursive_clickable_elements_to_string(tree, include_attributes)
+	recursive_time = time.perf_counter() - start
+
+	start = time.perf_counter()
+	output = tree.clickable_elements_to_string(include_attributes)
+	single_pass_time = time.perf_counter() - start
+
+	print(f'\nRecursive: {recursive_time:.3f}s, single pass: {single_pass_time:.3f}s ({recursive_time / single_pass_time:.1f}x)')
+	assert output == expected
@@ -0,0 +1,88 @@
+"""
+The per-snapshot hash index must agree with hashing each element from scratch.
+"""
+
+import time
+
+from browser_use.dom.history_tree_processor.service import HistoryTreeProcessor
+from browser_use.dom.history_tree_processor.view import DOMHistoryElement
+from browser_use.dom.views import DOMElementNode, DOMTextNode
+
+
+def build_tree(depth: int, fanout: int) -> DOMElementNode:
+	counter = 0
+
+	def add_element(parent: DOMElementNode | None, level: int, tag_name: str, xpath: str) -> DOMElementNode:
+		nonlocal counter
+		counter += 1
+		node = DOMElementNode(
+			tag_name=tag_name,
+			xpath=xpath,
+			attributes={'id': f'el-{counter}'},
+			children=[DOMTextNode(text=f'text {counter}', is_visible=True, parent=None)],
+			is_visible=True,
+			parent=parent,
+			highlight_index=counter if counter % 2 == 0 else None,
+		)
+		node.children[0].parent = node
+		if level < depth:
+			for i in range(fanout):
+				tag = ('div', 'ul', 'li', 'a')[i % 4]
+				node.children.append(add_element(node, level + 1, tag, f'{xpath}/{tag}[{i + 1}]'))
+		return node
+
+	return add_element(None, 0, 'body', '/body')
+
+
+def highlighted_elements(tree: DOMElementNode) -> list[DOMElementNode]:
+	found = []
+	stack = [tree]
+	while stack:
+		node = stack.pop()
+		if node.highlight_index is not None:
+			found.append(node)
+		stack.extend(child for child in node.children if isinstance(child, DOMElementNode))
+	return found
+
+
+def test_hash_index_matches_per_element_hashes():
+	tree = build_tree(depth=4, fanout=5)
+	elements = highlighted_elements(tree)
+	hash_index = HistoryTreeProcessor.build_hash_index(tree)
+
+	assert len(hash_index.elements) == len(elements)
+	for element in elements:
+		expected = HistoryTreeProcessor._hash_dom_element(element)
+		assert element.hash == expected
+		assert hash_index.elements[expected] is element
+	assert hash_index.branch_path_hashes == {element.hash.branch_path_hash for element in elements}
+
+
+def test_find_history_element_uses_index():
+	tree = build_tree(depth=4, fanout=4)
+	history_elements = [
+		(
+			element,
+			DOMHistoryElement(
+				element.tag_name,
+				element.xpath,
+				element.highlight_index,
+				HistoryTreeProcessor._get_parent_branch_path(element),
+				element.attributes,
+			),
+		)
+		for element in highlighted_elements(tree)
+	]
+
+	start = time.perf_counter()
+	hash_index = HistoryTreeProcessor.build_hash_index(tree)
+	for element, history_element in history_elements:
+		assert HistoryTreeProcessor.find_history_element_in_tree(history_element, tree, hash_index) is element
+	index_time = time.perf_counter() - start
+
+	start = time.perf_counter()
+	for element, history_element in history_elements:
+		assert HistoryTreeProcessor.find_history_element_in_tree(history_element, tree) is element
+	walk_time = time.perf_counter() - start
+
+	print(f'\n{len(history_elements)} lookups: index {index_time:.4f}s (including build), tree walk {walk_time:.4f}s')
@@ -0,0 +1,150 @@
+"""
+Patching the cached DOM tree from incremental buildDomTree.js results, without a browser.
+"""
+
+from browser_use.browser.browser import Browser, BrowserConfig
+from browser_use.dom.service import DomService
+from browser_use.dom.views import DOMElementNode, DOMTextNode
+
+
+class FakePage:
+	"""Replays buildDomTree.js results; records the args of each call"""
+
+	url = 'https://example.com'
+
+	def __init__(self, results: list[dict]):
+		self.results = results
+		self.calls: list[dict] = []
+
+	async def evaluate(self, script, args=None):
+		if args is None:
+			return 2  # '1+1' sanity check
+		self.calls.append(dict(args))
+		return self.results.pop(0)
+
+
+def element(tag: str, xpath: str, children: list[str], highlight_index: int | None = None) -> dict:
+	node = {'tagName': tag, 'xpath': xpath, 'attributes': {}, 'isVisible': True, 'children': children}
+	if highlight_index is not None:
+		node.update(isInteractive=True, isTopElement=True, highlightIndex=highlight_index)
+	return node
+
+
+def text(value: str) -> dict:
+	return {'type': 'TEXT_NODE', 'text': value, 'isVisible': True}
+
+
+FULL = {
+	'mode': 'full',
+	'generation': 'g:1',
+	'rootId': '5',
+	'map': {
+		'0': text('Menu'),
+		'1': element('button', 'body/div/button', ['0'], highlight_index=0),
+		'2': element('div', 'body/div', ['1']),
+		'3': text('Footer'),
+		'4': element('a', 'body/a', ['3'], highlight_index=1),
+		'5': element('body', '/body', ['2', '4']),
+	},
+}
+
+
+async def test_incremental_patch_replaces_changed_subtree():
+	page = FakePage(
+		[
+			FULL,
+			{'mode': 'unchanged', 'generation': 'g:2'},
+			{
+				'mode': 'patch',
+				'generation': 'g:3',
+				'patches': [{'target': '2', 'rootId': '2'}],
+				'map': {
+					'0': text('Menu'),
+					'1': element('button', 'body/div/button', ['0'], highlight_index=0),
+					'6': text('Settings'),
+					'7': element('a', 'body/div/a', ['6'], highlight_index=2),
+					'2': element('div', 'body/div', ['1', '7']),
+				},
+			},
+		]
+	)
+	dom_service = DomService(page)
+
+	first = await dom_service.get_clickable_elements(incremental=True)
+	assert sorted(first.selector_map) == [0, 1]
+	assert page.calls[0]['sinceGeneration'] is None
+
+	second = await dom_service.get_clickable_elements(incremental=True)
+	assert page.calls[1]['sinceGeneration'] == 'g:1'
+	assert second.element_tree is first.element_tree
+
+	third = await dom_service.get_clickable_elements(incremental=True)
+	assert page.calls[2]['sinceGeneration'] == 'g:2'
+	assert sorted(third.selector_map) == [0, 1, 2]
+	# The untouched link is the same node, the patched div is new and attached to the same body
+	assert third.selector_map[1] is first.selector_map[1]
+	assert third.selector_map[2].parent.parent is third.element_tree
+	assert third.element_tree.children[0] is not first.selector_map[0].parent
+	# The selector map of the earlier state is left alone
+	assert sorted(first.selector_map) == [0, 1]
+	assert isinstance(third.selector_map[2].children[0], DOMTextNode)
+	# The hash index follows the patch: the new link is indexed, the replaced button is not
+	assert third.hash_index.elements[third.selector_map[2].hash] is third.selector_map[2]
+	assert first.selector_map[0] not in third.hash_index.elements.values()
+	assert first.hash_index.elements[first.selector_map[0].hash] is first.selector_map[0]
+	# Rebuilt nodes reuse their ids, so nothing stale is left behind in node_map
+	assert dom_service.snapshot.stale_nodes == 0
+
+
+async def test_incremental_patch_for_unknown_node_falls_back_to_full_build():
+	page = FakePage(
+		[
+			FULL,
+			{'mode': 'patch', 'generation': 'g:2', 'patches': [{'target': '99', 'rootId': '99'}], 'map': {}},
+			dict(FULL, generation='h:1'),
+		]
+	)
+	dom_service = DomService(page)
+
+	await dom_service.get_clickable_elements(incremental=True)
+	state = await dom_service.get_clickable_elements(incremental=True)
+
+	assert page.calls[2]['sinceGeneration'] is None
+	assert isinstance(state.element_tree, DOMElementNode)
+	assert dom_service.snapshot.generation == 'h:1'
+
+
+async def test_incremental_build_sees_changes_outside_body():
+	browser = Browser(config=BrowserConfig(headless=True))
+	try:
+		async with await browser.new_context() as context:
+			page = await context.get_current_page()
+			await page.set_content(
+				'<html><head></head><body><div><button>Menu</button></div><a href="#">Footer</a></body></html>'
+			)
+			dom_service = DomService(page)
+
+			first = await dom_service.get_clickable_elements(highlight_elements=False, incremental=True)
+			assert sorted(element.tag_name for element in first.selector_map.values()) == ['a', 'button']
+
+			# Only head changes, but the stylesheet hides the button: this must not be reported as unchanged
+			await page.evaluate("""() => {
+				const style = document.createElement('style');
+				style.textContent = 'button { display: none; }';
+				document.head.appendChild(style);
+			}""")
+			second = await dom_service.get_clickable_elements(highlight_elements=False, incremental=True)
+			assert [element.tag_name for element in second.selector_map.values()] == ['a']
+
+			# The same for a class toggled on <html>
+			await page.evaluate("""() => {
+				const style = document.createElement('style');
+				style.textContent = 'html.modal-open a { display: none; }';
+				document.head.appendChild(style);
+			}""")
+			await dom_service.get_clickable_elements(highlight_elements=False, incremental=True)
+			await page.evaluate("() => document.documentElement.classList.add('modal-open')")
+			third = await dom_service.get_clickable_elements(highlight_elements=False, incremental=True)
+			assert third.selector_map == {}
+	finally:
+		await browser.close()
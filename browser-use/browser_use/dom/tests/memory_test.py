@@ -0,0 +1,162 @@
+"""
+Memory benchmark for building the DOM tree from a large synthetic buildDomTree.js result.
+
+Run with: pytest browser_use/dom/tests/memory_test.py -s
+"""
+
+import gc
+import time
+import tracemalloc
+from dataclasses import dataclass, field, fields
+from typing import Optional
+
+from browser_use.dom.service import DomService
+from browser_use.dom.views import DOMElementNode, DOMTextNode
+
+TAGS = ['div', 'span', 'a', 'button', 'li', 'p', 'input']
+
+
+def build_eval_page(depth: int = 5, fanout: int = 7) -> dict:
+	"""Build a result shaped like buildDomTree.js output: a balanced tree with a text node under every leaf element."""
+	js_node_map = {}
+	next_id = 0
+	highlight_index = 0
+
+	def add_element(level: int, xpath: str) -> str:
+		nonlocal next_id, highlight_index
+		children_ids = []
+		if level < depth:
+			for i in range(fanout):
+				children_ids.append(add_element(level + 1, f'{xpath}/div[{i + 1}]'))
+		else:
+			text_id = str(next_id)
+			next_id += 1
+			js_node_map[text_id] = {'type': 'TEXT_NODE', 'text': f'Item {text_id}', 'isVisible': True}
+			children_ids.append(text_id)
+
+		node_id = str(next_id)
+		next_id += 1
+		node_data = {
+			'tagName': TAGS[next_id % len(TAGS)],
+			'xpath': xpath,
+			'attributes': {'class': f'item-{next_id % 50}', 'id': f'el-{node_id}'},
+			'isVisible': True,
+			'isTopElement': True,
+			'isInViewport': level < 3,
+			'children': children_ids,
+		}
+		if next_id % 3 == 0:
+			node_data['isInteractive'] = True
+			node_data['highlightIndex'] = highlight_index
+			highlight_index += 1
+		js_node_map[node_id] = node_data
+		return node_id
+
+	root_id = add_element(0, 'html')
+	return {'map': js_node_map, 'rootId': root_id}
+
+
+async def test_construct_dom_tree_memory():
+	eval_page = build_eval_page()
+	node_count = len(eval_page['map'])
+	dom_service = DomService.__new__(DomService)  # _construct_dom_tree does not touch the page
+
+	gc.collect()
+	tracemalloc.start()
+	start = time.time()
+	element_tree, selector_map, hash_index = await dom_service._construct_dom_tree(eval_page)
+	elapsed = time.time() - start
+	current, peak = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+
+	print(f'\nNodes: {node_count}, clickable: {len(selector_map)}')
+	print(f'Construct time: {elapsed:.3f}s')
+	print(f'Retained: {current / 1024 / 1024:.2f} MB ({current / node_count:.0f} B/node), peak: {peak / 1024 / 1024:.2f} MB')
+
+	assert node_count > 20_000
+	assert isinstance(element_tree, DOMElementNode)
+	assert len(selector_map) > 0
+
+	leaf = selector_map[0]
+	while leaf.children and isinstance(leaf.children[0], DOMElementNode):
+		leaf = leaf.children[0]
+	text_node = leaf.children[0]
+	assert isinstance(text_node, DOMTextNode)
+
+	# Slotted nodes carry no per-instance __dict__
+	assert not hasattr(element_tree, '__dict__')
+	assert not hasattr(text_node, '__dict__')
+
+	# Retained memory covers the nodes, their attribute dicts, xpaths, the selector map and the hash index
+	# (about 270 B/node with Python 3.11)
+	assert current / node_count < 400
+
+	# Every highlighted element is indexed, and its hash is cached on the node
+	assert len(hash_index.elements) == len(selector_map)
+	assert leaf.hash is leaf.hash
+
+
+# Same fields as the DOM nodes, without slots: the layout the nodes had before they were slotted
+@dataclass
+class UnslottedTextNode:
+	is_visible: bool
+	parent: Optional['UnslottedElementNode']
+	text: str
+	type: str = 'TEXT_NODE'
+
+
+@dataclass
+class UnslottedElementNode:
+	is_visible: bool
+	parent: Optional['UnslottedElementNode']
+	tag_name: str
+	xpath: str
+	attributes: dict
+	children: list
+	is_interactive: bool = False
+	is_top_element: bool = False
+	is_in_viewport: bool = False
+	shadow_root: bool = False
+	highlight_index: Optional[int] = None
+	viewport_coordinates: Optional[dict] = None
+	page_coordinates: Optional[dict] = None
+	viewport_info: Optional[dict] = None
+	_hash: Optional[object] = field(default=None, init=False, repr=False, compare=False)
+
+
+def measure_nodes(element_cls, text_cls, eval_page: dict) -> int:
+	"""Retained bytes of the node objects alone for every node in eval_page; attribute values are shared"""
+	js_node_map = eval_page['map']
+	gc.collect()
+	tracemalloc.start()
+	nodes = []
+	for node_data in js_node_map.values():
+		if node_data.get('type') == 'TEXT_NODE':
+			nodes.append(text_cls(is_visible=True, parent=None, text=node_data['text']))
+		else:
+			nodes.append(
+				element_cls(
+					is_visible=True,
+					parent=None,
+					tag_name=node_data['tagName'],
+					xpath=node_data['xpath'],
+					attributes=node_data['attributes'],
+					children=node_data['children'],
+					highlight_index=node_data.get('highlightIndex'),
+				)
+			)
+	current, _ = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	return current
+
+
+def test_slotted_nodes_against_unslotted_baseline():
+	assert [f.name for f in fields(UnslottedElementNode)] == [f.name for f in fields(DOMElementNode)]
+
+	eval_page = build_eval_page()
+	node_count = len(eval_page['map'])
+	slotted = measure_nodes(DOMElementNode, DOMTextNode, eval_page)
+	unslotted = measure_nodes(UnslottedElementNode, UnslottedTextNode, eval_page)
+
+	print(f'\nNode objects: slotted {slotted / node_count:.0f} B/node, unslotted {unslotted / node_count:.0f} B/node')
+	assert slotted < 0.85 * unslotted
@@ -1,5 +1,4 @@
-from dataclasses import dataclass
-from functools import cached_property
+from dataclasses import dataclass, field
 from typing import TYPE_CHECKING, Dict, List, Optional
 
 from browser_use.dom.history_tree_processor.view import CoordinateSet, HashedDomElement, ViewportInfo
@@ -10,14 +9,16 @@ if TYPE_CHECKING:
 	from .views import DOMElementNode
 
 
-@dataclass(frozen=False)
+# Nodes are slotted: a page can produce tens of thousands of them per state, so they carry no
+# per-instance __dict__. Attributes can no longer be added ad hoc.
+@dataclass(frozen=False, slots=True)
 class DOMBaseNode:
 	is_visible: bool
 	# Use None as default and set parent later to avoid circular reference issues
 	parent: Optional['DOMElementNode']
 
 
-@dataclass(frozen=False)
+@dataclass(frozen=False, slots=True)
 class DOMTextNode(DOMBaseNode):
 	text: str
 	type: str = 'TEXT_NODE'
@@ -43,7 +44,7 @@ class DOMTextNode(DOMBaseNode):
 		return self.parent.is_top_element
 
 
-@dataclass(frozen=False)
+@dataclass(frozen=False, slots=True)
 class DOMElementNode(DOMBaseNode):
 	"""
 	xpath: the xpath of the element from the last root node (shadow root or iframe OR document if no shadow root or iframe).
@@ -62,6 +63,8 @@ class DOMElementNode(DOMBaseNode):
 	viewport_coordinates: Optional[CoordinateSet] = None
 	page_coordinates: Optional[CoordinateSet] = None
 	viewport_info: Optional[ViewportInfo] = None
+	# Backing slot for `hash` (cached_property needs a __dict__)
+	_hash: Optional[HashedDomElement] = field(default=None, init=False, repr=False, compare=False)
 
 	def __repr__(self) -> str:
 		tag_str = f'<{self.tag_name}'
@@ -89,13 +92,15 @@ class DOMElementNode(DOMBaseNode):
 
 		return tag_str
 
-	@cached_property
+	@property
 	def hash(self) -> HashedDomElement:
-		from browser_use.dom.history_tree_processor.service import (
-			HistoryTreeProcessor,
-		)
+		if self._hash is None:
+			from browser_use.dom.history_tree_processor.service import (
+				HistoryTreeProcessor,
+			)
 
-		return HistoryTreeProcessor._hash_dom_element(self)
+			self._hash = HistoryTreeProcessor._hash_dom_element(self)
+		return self._hash
 
 	def get_all_text_till_next_clickable_element(self, max_depth: int = -1) -> str:
 		text_parts = []
@@ -105,7 +110,7 @@ class DOMElementNode(DOMBaseNode):
 				return
 
 			# Skip this branch if we hit a highlighted element (except for the current node)
-			if isinstance(node, DOMElementNode) and node != self and node.highlight_index is not None:
+			if isinstance(node, DOMElementNode) and node is not self and node.highlight_index is not None:
 				return
 
 			if isinstance(node, DOMTextNode):
@@ -120,48 +125,68 @@ class DOMElementNode(DOMBaseNode):
 	@time_execution_sync('--clickable_elements_to_string')
 	def clickable_elements_to_string(self, include_attributes: list[str] | None = None) -> str:
 		"""Convert the processed DOM content to HTML."""
-		formatted_text = []
+		# Single iterative pass: every text node belongs to its nearest highlighted ancestor, whose line is
+		# filled in once its subtree is done. Text without such an ancestor is written as is (if visible).
+		# Text under a highlighted ancestor above this node is never written.
+		owner_text: Optional[list[str]] = None
+		ancestor = self.parent
+		while ancestor is not None:
+			if ancestor.highlight_index is not None:
+				owner_text = []
+				break
+			ancestor = ancestor.parent
+
+		formatted_text: list[str] = []
+		# (node, text parts of its nearest highlighted ancestor) to visit, or (line slot, element, its text parts) to finish
+		stack: list[tuple] = [(self, owner_text)]
+		while stack:
+			item = stack.pop()
+
+			if len(item) == 3:
+				slot, node, text_parts = item
+				text = '\n'.join(text_parts).strip()
+				attributes_str = ''
+				if include_attributes:
+					attributes = list(
+						dict.fromkeys(
+							str(value)
+							for key, value in node.attributes.items()
+							if key in include_attributes and value != node.tag_name
+						)
+					)
+					if text in attributes:
+						attributes.remove(text)
+					attributes_str = ';'.join(attributes)
+				line = f'[{node.highlight_index}]<{node.tag_name} '
+				if attributes_str:
+					line += f'{attributes_str}'
+				if text:
+					if attributes_str:
+						line += f'>{text}'
+					else:
+						line += f'{text}'
+				line += '/>'
+				formatted_text[slot] = line
+				continue
+
+			node, text_parts = item
+			if isinstance(node, DOMTextNode):
+				if text_parts is not None:
+					text_parts.append(node.text)
+				elif node.is_visible:  # and node.is_parent_top_element()
+					formatted_text.append(node.text)
+				continue
 
-		def process_node(node: DOMBaseNode, depth: int) -> None:
 			if isinstance(node, DOMElementNode):
-				# Add element with highlight_index
+				# Add element with highlight_index; its line is completed after its children
 				if node.highlight_index is not None:
-					attributes_str = ''
-					text = node.get_all_text_till_next_clickable_element()
-					if include_attributes:
-						attributes = list(
-							set(
-								[
-									str(value)
-									for key, value in node.attributes.items()
-									if key in include_attributes and value != node.tag_name
-								]
-							)
-						)
-						if text in attributes:
-							attributes.remove(text)
-						attributes_str = ';'.join(attributes)
-					line = f'[{node.highlight_index}]<{node.tag_name} '
-					if attributes_str:
-						line += f'{attributes_str}'
-					if text:
-						if attributes_str:
-							line += f'>{text}'
-						else:
-							line += f'{text}'
-					line += '/>'
-					formatted_text.append(line)
+					text_parts = []
+					stack.append((len(formatted_text), node, text_parts))
+					formatted_text.append('')
 
 				# Process children regardless
-				for child in node.children:
-					process_node(child, depth + 1)
-
-			elif isinstance(node, DOMTextNode):
-				# Add text only if it doesn't have a highlighted parent
-				if not node.has_parent_with_highlight_index() and node.is_visible:  # and node.is_parent_top_element()
-					formatted_text.append(f'{node.text}')
+				stack.extend((child, text_parts) for child in reversed(node.children))
 
-		process_node(self, 0)
 		return '\n'.join(formatted_text)
 
 	def get_file_upload_element(self, check_siblings: bool = True) -> Optional['DOMElementNode']:
@@ -190,7 +215,33 @@ class DOMElementNode(DOMBaseNode):
 SelectorMap = dict[int, DOMElementNode]
 
 
+@dataclass
+class DOMHashIndex:
+	"""Hashes of the highlighted elements of one DOM tree, see HistoryTreeProcessor.build_hash_index"""
+
+	elements: dict[HashedDomElement, DOMElementNode] = field(default_factory=dict)
+	branch_path_hashes: set[str] = field(default_factory=set)
+
+
 @dataclass
 class DOMState:
 	element_tree: DOMElementNode
 	selector_map: SelectorMap
+	hash_index: Optional[DOMHashIndex] = field(default=None, kw_only=True)
+
+
+@dataclass
+class DOMSnapshot:
+	"""
+	Tree from the last incremental build, kept so the next build only has to patch the subtrees that changed.
+
+	node_map is keyed by the persistent node ids buildDomTree.js assigns and may still hold nodes that were
+	patched away; stale_nodes counts them.
+	"""
+
+	generation: str
+	element_tree: DOMElementNode
+	selector_map: SelectorMap
+	node_map: dict[str, DOMBaseNode]
+	hash_index: DOMHashIndex
+	stale_nodes: int = 0
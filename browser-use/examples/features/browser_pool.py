@@ -0,0 +1,47 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import asyncio
+
+from langchain_openai import ChatOpenAI
+
+from browser_use import Agent, BrowserConfig, BrowserPool, BrowserPoolConfig
+
+llm = ChatOpenAI(model='gpt-4o')
+
+tasks = [
+	'Search Google for weather in Tokyo',
+	'Check Reddit front page title',
+	'Look up Bitcoin price on Coinbase',
+	'Find NASA image of the day',
+	'Check top story on CNN',
+	'Search latest SpaceX launch date',
+	'Look up population of Paris',
+	'Find current time in Sydney',
+]
+
+
+async def main():
+	# Two warm browsers with two contexts each: at most four agents run at once, the others wait for a free context.
+	# Each context is cleared and reused for up to three tasks; leave max_tasks_per_context at 1 to give every task a new one.
+	config = BrowserPoolConfig(
+		browsers=2,
+		contexts_per_browser=2,
+		max_tasks_per_context=3,
+		browser_config=BrowserConfig(headless=True),
+	)
+
+	async with BrowserPool(config) as pool:
+
+		async def run(task: str):
+			async with pool.lease() as context:
+				agent = Agent(task=task, llm=llm, browser=context.browser, browser_context=context)
+				return await agent.run()
+
+		await asyncio.gather(*(run(task) for task in tasks))
+		print(pool.get_metrics())
+
+
+if __name__ == '__main__':
+	asyncio.run(main())